@@ -1,11 +1,34 @@
 """Anthropic Claude client adapter with mock fallback."""
 import json
-from typing import Optional
+import time
+from typing import AsyncIterator, Optional
 import httpx
 from app.config import settings
 from app.util.logging import log_info, log_warning
+from app.util.http import http_pool
 from app.util.ids import generate_id
+from app.util.errors import UpstreamUnavailableError
+from app.util.metrics import metrics_registry
+from app.util.resilience import Resilience, is_retryable
 from app.models.domain import AgentType
+from app.services.intent import intent_classifier
+
+
+# Usage counters reported by the Messages API
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens"
+)
+
+
+class MockResponse(dict):
+    """A mock response returned in place of Claude's; callers must not cache it."""
+
+
+class MockText(str):
+    """A chunk of a streamed mock response; callers must not cache the result."""
 
 
 class AnthropicClient:
@@ -13,97 +36,262 @@ class AnthropicClient:
     
     def __init__(self):
         self.api_key = settings.anthropic_api_key
-        self.base_url = "https://api.anthropic.com/v1"
+        self.base_url = settings.anthropic_base_url
         self.model = "claude-3-5-sonnet-20241022"
-        
-    async def complete_json(self, prompt: str, system_prompt: str) -> dict:
+        self.requests = 0
+        self.cache_hits = 0
+        self.usage = dict.fromkeys(USAGE_FIELDS, 0)
+        metrics_registry.register("anthropic_usage", self.usage_stats)
+        self._resilience = Resilience("anthropic")
+    
+    async def complete_json(
+        self,
+        prompt: str,
+        system_prompt: str,
+        context: Optional[str] = None,
+        cache: bool = False
+    ) -> dict:
         """Get a JSON response from Claude.
         
         Args:
             prompt: User prompt
             system_prompt: System instructions
-            
+            context: Large stable context (e.g. serialized memory) sent
+                after the system instructions
+            cache: Mark the system prompt and context as cacheable
+        
         Returns:
-            dict: Parsed JSON response
+            dict: Parsed JSON response, or a ``MockResponse`` if Claude
+                could not be used
         """
         if not self.api_key:
             log_warning("No Anthropic API key found, using mock response")
             return self._mock_response(prompt)
         
+        body = self._message_body(prompt, system_prompt, context, cache)
+        
+        async def send() -> httpx.Response:
+            response = await http_pool.client(self.base_url).post(
+                f"{self.base_url}/messages",
+                headers=self._headers(),
+                json=body
+            )
+            response.raise_for_status()
+            return response
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/messages",
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": 1024,
-                        "system": system_prompt,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ]
-                    },
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                content = data["content"][0]["text"]
-                
-                # Parse JSON from response
-                return json.loads(content)
-                
+            response = await self._resilience.call(send)
+            
+            data = response.json()
+            self._record_usage(data.get("usage", {}))
+            content = data["content"][0]["text"]
+            
+            # Parse JSON from response
+            return json.loads(content)
+        
+        except UpstreamUnavailableError as e:
+            log_warning(f"{e.message}, using mock")
+            return self._mock_response(prompt)
         except Exception as e:
             log_warning(f"Anthropic API call failed: {e}, using mock")
             return self._mock_response(prompt)
     
-    def _mock_response(self, prompt: str) -> dict:
+    async def stream_text(
+        self,
+        prompt: str,
+        system_prompt: str,
+        context: Optional[str] = None,
+        cache: bool = False
+    ) -> AsyncIterator[str]:
+        """Stream Claude's response text as it is generated.
+        
+        Consumes the server-sent event stream of ``/v1/messages`` and
+        yields each text delta. Without an API key, while the circuit is
+        open, or if the request fails before any text arrives, the mock
+        response is streamed instead. A stream cannot be replayed, so it
+        shares the circuit breaker but is not retried or hedged.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System instructions
+        
+        Yields:
+            str: Text deltas in order (``MockText`` chunks for the mock)
+        
+        Raises:
+            httpx.HTTPError: If the stream breaks after text was yielded
+        """
+        if not self.api_key:
+            log_warning("No Anthropic API key found, streaming mock response")
+            async for chunk in self._mock_stream(prompt):
+                yield chunk
+            return
+        
+        if not self._resilience.allow():
+            log_warning("anthropic circuit is open, streaming mock response")
+            async for chunk in self._mock_stream(prompt):
+                yield chunk
+            return
+        
+        streamed = False
+        recorded = False
+        started = time.monotonic()
+        try:
+            async with http_pool.client(self.base_url).stream(
+                "POST",
+                f"{self.base_url}/messages",
+                headers=self._headers(),
+                json={
+                    **self._message_body(prompt, system_prompt, context, cache),
+                    "stream": True
+                }
+            ) as response:
+                response.raise_for_status()
+                self._resilience.record_success(time.monotonic() - started)
+                recorded = True
+                usage = {}
+                try:
+                    async for event, data in self._sse_events(response):
+                        if event == "error":
+                            raise httpx.HTTPError(f"Stream error: {data}")
+                        if event == "message_start":
+                            usage.update(data.get("message", {}).get("usage", {}))
+                        elif event == "message_delta":
+                            usage.update(data.get("usage", {}))
+                        elif event == "content_block_delta" and data["delta"].get("type") == "text_delta":
+                            streamed = True
+                            yield data["delta"]["text"]
+                        elif event == "message_stop":
+                            break
+                finally:
+                    # Also when the caller stops reading early
+                    self._record_usage(usage)
+        
+        except Exception as e:
+            if not recorded:
+                recorded = True
+                if is_retryable(e):
+                    self._resilience.record_failure()
+                else:
+                    # The upstream answered; the request itself is wrong
+                    self._resilience.record_success()
+            if streamed:
+                raise
+            log_warning(f"Anthropic streaming call failed: {e}, using mock")
+            async for chunk in self._mock_stream(prompt):
+                yield chunk
+        finally:
+            if not recorded:
+                # Cancelled, or the caller stopped reading, before a response
+                self._resilience.release()
+    
+    def usage_stats(self) -> dict:
+        """Return token usage, including prompt cache reads and writes."""
+        prompt_tokens = (
+            self.usage["input_tokens"]
+            + self.usage["cache_creation_input_tokens"]
+            + self.usage["cache_read_input_tokens"]
+        )
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            **self.usage,
+            "cache_read_ratio": self.usage["cache_read_input_tokens"] / prompt_tokens if prompt_tokens else 0.0
+        }
+    
+    def _headers(self) -> dict[str, str]:
+        return {
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json"
+        }
+    
+    def _message_body(
+        self,
+        prompt: str,
+        system_prompt: str,
+        context: Optional[str],
+        cache: bool
+    ) -> dict:
+        """Build a Messages API request.
+        
+        With ``cache`` the system prompt and the context each get a cache
+        breakpoint: the system prompt prefix is shared by every request,
+        while the context prefix is reused by requests with the same
+        context. Prefixes shorter than the model's minimum cacheable
+        length are simply processed uncached.
+        """
+        system = [{"type": "text", "text": system_prompt}]
+        if context:
+            system.append({"type": "text", "text": context})
+        if cache:
+            for block in system:
+                block["cache_control"] = {"type": "ephemeral"}
+        
+        return {
+            "model": self.model,
+            "max_tokens": 1024,
+            "system": system,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ]
+        }
+    
+    def _record_usage(self, usage: dict) -> None:
+        """Accumulate token usage from a response."""
+        self.requests += 1
+        for field in USAGE_FIELDS:
+            self.usage[field] += usage.get(field) or 0
+        if usage.get("cache_read_input_tokens"):
+            self.cache_hits += 1
+    
+    async def _sse_events(self, response: httpx.Response) -> AsyncIterator[tuple[str, dict]]:
+        """Parse a server-sent event stream into (event, data) pairs."""
+        event = None
+        data_lines: list[str] = []
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[5:].strip())
+            elif not line and data_lines:
+                yield event or "message", json.loads("\n".join(data_lines))
+                event = None
+                data_lines = []
+    
+    async def _mock_stream(self, prompt: str, chunk_size: int = 64) -> AsyncIterator[str]:
+        """Stream the mock response in small chunks."""
+        text = json.dumps(self._mock_response(prompt))
+        for i in range(0, len(text), chunk_size):
+            yield MockText(text[i:i + chunk_size])
+    
+    def _mock_response(self, prompt: str) -> MockResponse:
         """Generate a mock response for demo purposes."""
         log_info("Generating mock Claude response")
         
-        # Parse query to make reasonable subtasks
-        query_lower = prompt.lower()
-        
-        if "midterm" in query_lower or "exam" in query_lower or "study" in query_lower:
-            rationale = "Breaking down exam preparation into study sessions, meal planning for energy, and calendar blocking for focus time."
-            study_desc = "Create 3 focused study blocks per day (90min each) covering CS fundamentals, algorithms, and practice problems"
-            meal_desc = "Schedule healthy meals and snacks to maintain energy during study sessions"
-            calendar_desc = "Block study time in calendar, ensuring breaks and avoiding conflicts with existing commitments"
-        elif "project" in query_lower or "code" in query_lower:
-            rationale = "Organizing project work into coding sessions, nutrition planning, and time blocking."
-            study_desc = "Allocate dedicated coding blocks for project implementation and testing"
-            meal_desc = "Plan meals around deep work sessions to optimize productivity"
-            calendar_desc = "Reserve uninterrupted time slots for coding and review"
+        # Plan the best-matching fast-path intent, so the two never drift
+        intent = intent_classifier.classify(prompt).intent
+        if intent is not None:
+            rationale, descriptions = intent.rationale, intent.descriptions
         else:
             rationale = "Structuring the task into actionable work blocks, nutrition planning, and calendar management."
-            study_desc = "Break task into focused work sessions with clear objectives"
-            meal_desc = "Ensure proper nutrition and breaks during work periods"
-            calendar_desc = "Schedule time blocks and protect focus time from interruptions"
+            descriptions = {
+                AgentType.STUDY_AGENT: "Break task into focused work sessions with clear objectives",
+                AgentType.MEAL_AGENT: "Ensure proper nutrition and breaks during work periods",
+                AgentType.CALENDAR_AGENT: "Schedule time blocks and protect focus time from interruptions"
+            }
         
-        return {
+        return MockResponse({
             "rationale": rationale,
             "subtasks": [
                 {
                     "id": generate_id(),
-                    "agent": AgentType.STUDY_AGENT.value,
-                    "description": study_desc
-                },
-                {
-                    "id": generate_id(),
-                    "agent": AgentType.MEAL_AGENT.value,
-                    "description": meal_desc
-                },
-                {
-                    "id": generate_id(),
-                    "agent": AgentType.CALENDAR_AGENT.value,
-                    "description": calendar_desc
+                    "agent": agent.value,
+                    "description": description
                 }
+                for agent, description in descriptions.items()
             ]
-        }
+        })
 
 
 # Global client instance
@@ -1,19 +1,102 @@
 """Elasticsearch logger adapter (optional)."""
+import asyncio
+import json
+import time
 from typing import Any, Optional
 from datetime import datetime
-import httpx
 from app.config import settings
-from app.util.logging import log_warning
+from app.util.http import http_pool
+from app.util.logging import log_info, log_warning
+from app.util.metrics import metrics_registry, SampleWindow
+from app.util.resilience import is_retryable
+from app.util.spool import SegmentSpool
 
 
 class ElasticLogger:
-    """Optional Elasticsearch logger for centralized logging."""
+    """Optional Elasticsearch logger for centralized logging.
+    
+    ``log_event`` only puts the document on a bounded in-memory queue.
+    A background shipper sends queued documents to the ``_bulk`` API as
+    NDJSON, flushing when a batch is full or the flush interval passes.
+    When the queue is full, events are dropped (``drop`` policy) or the
+    caller waits for room (``block`` policy). The shipper starts with
+    the app, or on first use; shutdown drains the queue.
+    
+    With a spool path set, batches that fail with a transient error go
+    to an on-disk ``SegmentSpool`` instead of being dropped. While the
+    spool holds anything, new batches are appended behind it and the
+    spool is replayed oldest-first with backoff, so events reach
+    Elasticsearch in the order they were logged (and so in order per
+    trace). Disk I/O runs in a worker thread. If the spool itself fails
+    (disk full, permissions), the batch is dropped and counted, and the
+    shipper keeps going.
+    """
     
     def __init__(self):
         self.url = settings.elastic_url
         self.index = settings.elastic_index
         self.enabled = bool(self.url)
+        self.batch_size = max(settings.elastic_batch_size, 1)
+        self.flush_interval = settings.elastic_flush_interval_seconds
+        self.block_when_full = settings.elastic_overflow_policy == "block"
+        self._action = json.dumps({"index": {"_index": self.index}})
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._shipper: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+        self._spool: Optional[SegmentSpool] = None
+        if self.enabled and settings.elastic_spool_path:
+            self._spool = SegmentSpool(
+                settings.elastic_spool_path,
+                settings.elastic_spool_max_bytes,
+                settings.elastic_spool_segment_bytes
+            )
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+        self.flush_times = SampleWindow()
+        self.queued = 0
+        self.shipped = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.errors = 0
+        metrics_registry.register("elastic_logger", self.stats)
+    
+    def start(self) -> None:
+        """Start the shipper on the running event loop (idempotent)."""
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        
+        self._loop = loop
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=max(settings.elastic_queue_max_size, 1))
+        self._batch_ready = asyncio.Event()
+        self._shipper = asyncio.create_task(self._ship())
+        log_info("Started Elasticsearch log shipper")
+    
+    async def shutdown(self) -> None:
+        """Flush queued events, then stop the shipper."""
+        if self._shipper is None:
+            return
         
+        self._stopping = True
+        self._batch_ready.set()
+        try:
+            await asyncio.wait_for(self._queue.join(), settings.elastic_drain_timeout_seconds)
+        except asyncio.TimeoutError:
+            log_warning(f"Dropped {self._queue.qsize()} log events still queued at shutdown")
+        self._shipper.cancel()
+        await asyncio.gather(self._shipper, return_exceptions=True)
+        self._shipper = None
+        self._loop = None
+        log_info("Stopped Elasticsearch log shipper")
+    
     async def log_event(
         self,
         level: str,
@@ -21,7 +104,7 @@ class ElasticLogger:
         trace_id: Optional[str] = None,
         **kwargs: Any
     ) -> None:
-        """Send a log event to Elasticsearch.
+        """Queue a log event for Elasticsearch.
         
         Args:
             level: Log level
@@ -32,27 +115,177 @@ class ElasticLogger:
         if not self.enabled:
             return
         
-        try:
-            doc = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "level": level,
-                "message": message,
-                "trace_id": trace_id,
-                **kwargs
-            }
+        self.start()
+        doc = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "level": level,
+            "message": message,
+            "trace_id": trace_id,
+            **kwargs
+        }
+        
+        if self.block_when_full:
+            await self._queue.put(doc)
+        else:
+            try:
+                self._queue.put_nowait(doc)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                return
+        
+        self.queued += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+    
+    def stats(self) -> dict:
+        """Return shipping counters for the metrics endpoint."""
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queued": self.queued,
+            "shipped": self.shipped,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "errors": self.errors,
+            "spool_bytes": self._spool.size_bytes if self._spool else 0,
+            "spool_segments": self._spool.segments if self._spool else 0,
+            "spool_dropped_segments": self._spool.dropped_segments if self._spool else 0,
+            "flush_seconds": self.flush_times.summary()
+        }
+    
+    async def _ship(self) -> None:
+        """Collect queued events into batches and send them."""
+        queue = self._queue
+        while True:
+            if self._spool_pending():
+                # Keep retrying the spool even when nothing new is logged
+                try:
+                    first = await asyncio.wait_for(queue.get(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    try:
+                        await self._replay()
+                    except Exception as e:
+                        self._ship_error(e)
+                    continue
+            else:
+                first = await queue.get()
+            
+            batch = [first]
+            if queue.qsize() < self.batch_size - 1 and not self._stopping:
+                # Wait for a full batch, but no longer than the flush interval
+                self._batch_ready.clear()
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
             
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    f"{self.url}/{self.index}/_doc",
-                    json=doc,
-                    timeout=5.0
-                )
-                
+            try:
+                await self._flush([json.dumps(doc, default=str) for doc in batch])
+            except Exception as e:
+                self.failed += len(batch)
+                self._ship_error(e, len(batch))
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    async def _flush(self, lines: list[str]) -> None:
+        """Send one batch of encoded documents, spooling it if the upstream is down."""
+        if self._spool_pending():
+            await self._to_spool(lines)
+            await self._replay()
+            return
+        
+        if await self._post(lines) is False and self._spool is not None:
+            await self._to_spool(lines)
+            self._schedule_retry()
+    
+    async def _post(self, lines: list[str]) -> Optional[bool]:
+        """Send encoded documents to the bulk API.
+        
+        Returns:
+            True if delivered, False on a transient failure worth retrying,
+            None if the upstream refused the request outright
+        """
+        body = "".join(f"{self._action}\n{line}\n" for line in lines)
+        started = time.monotonic()
+        try:
+            response = await http_pool.client(self.url).post(
+                f"{self.url}/_bulk",
+                content=body,
+                headers={"content-type": "application/x-ndjson"},
+                timeout=5.0
+            )
+            response.raise_for_status()
+            result = response.json()
         except Exception as e:
             # Fail silently - don't let logging errors break the app
-            log_warning(f"Failed to log to Elasticsearch: {e}")
+            retryable = is_retryable(e)
+            if not (retryable and self._spool is not None):
+                self.failed += len(lines)
+            log_warning(f"Failed to ship {len(lines)} log events to Elasticsearch: {e}")
+            return False if retryable else None
+        finally:
+            self.flush_times.record(time.monotonic() - started)
+        
+        rejected = 0
+        if result.get("errors"):
+            rejected = sum(
+                1 for item in result.get("items", [])
+                if next(iter(item.values()), {}).get("error")
+            )
+            log_warning(f"Elasticsearch rejected {rejected} of {len(lines)} log events")
+        self.batches += 1
+        self.shipped += len(lines) - rejected
+        self.failed += rejected
+        return True
+    
+    async def _replay(self) -> None:
+        """Send spooled events oldest-first until the spool is empty or a send fails."""
+        if time.monotonic() < self._retry_at:
+            return
+        
+        while self._spool.pending:
+            segment_id, lines = await asyncio.to_thread(self._spool.head)
+            for start in range(0, len(lines), self.batch_size):
+                chunk = lines[start:start + self.batch_size]
+                if await self._post(chunk) is False:
+                    # Keep the rest of the segment for the next attempt
+                    await asyncio.to_thread(self._spool.replace, segment_id, lines[start:])
+                    self._schedule_retry()
+                    return
+                self.replayed += len(chunk)
+            await asyncio.to_thread(self._spool.remove, segment_id)
+        
+        self._retry_delay = 0.0
+        log_info("Replayed spooled log events to Elasticsearch")
+    
+    async def _to_spool(self, lines: list[str]) -> None:
+        await asyncio.to_thread(self._spool.append, lines)
+        self.spooled += len(lines)
+    
+    def _ship_error(self, error: Exception, dropped: int = 0) -> None:
+        """Count an unexpected shipping error and back off the spool."""
+        self.errors += 1
+        log_warning(f"Elasticsearch shipping error ({error!r}), dropped {dropped} log events")
+        if self._spool is not None:
+            self._schedule_retry()
+    
+    def _spool_pending(self) -> bool:
+        return self._spool is not None and self._spool.pending
+    
+    def _schedule_retry(self) -> None:
+        """Back off exponentially between replay attempts."""
+        self._retry_delay = min(
+            max(self._retry_delay * 2, self.flush_interval),
+            settings.elastic_retry_max_seconds
+        )
+        self._retry_at = time.monotonic() + self._retry_delay
 
 
 # Global logger instance
 elastic_logger = ElasticLogger()
-
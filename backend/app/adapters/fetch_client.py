@@ -1,9 +1,12 @@
 """Fetch AI client adapter with mock fallback."""
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import httpx
 from app.config import settings
+from app.util.cache import TTLCache
 from app.util.logging import log_info, log_warning
 from app.util.ids import generate_id
+from app.util.metrics import metrics_registry
+from app.util.singleflight import request_key
 from app.models.domain import Subtask, EventBlock, MemoryPrefs, AgentType
 
 
@@ -14,6 +17,13 @@ class FetchClient:
         self.api_key = settings.fetch_api_key
         self.agentverse_url = settings.fetch_agentverse_url
         self.asi_one_url = settings.fetch_asi_one_url
+        # Proposals by (agent, description, prefs), tagged with the user ID
+        self._cache = TTLCache(
+            max_entries=settings.proposal_cache_max_entries,
+            ttl_seconds=settings.proposal_cache_ttl_seconds,
+            max_bytes=settings.proposal_cache_max_bytes
+        )
+        metrics_registry.register("proposal_cache", self._cache.stats)
         
     async def propose_plan(
         self,
@@ -22,6 +32,10 @@ class FetchClient:
     ) -> list[EventBlock]:
         """Have an agent propose event blocks for a subtask.
         
+        Proposals are cached per agent, normalized description and
+        preferences. A cached proposal is moved to the current planning
+        day and given fresh block IDs.
+        
         Args:
             subtask: The subtask to plan
             memory: User memory and preferences
@@ -29,6 +43,36 @@ class FetchClient:
         Returns:
             list[EventBlock]: Proposed event blocks
         """
+        key = request_key(
+            subtask.agent.value,
+            " ".join(subtask.description.lower().split()),
+            memory.model_dump()
+        )
+        planning_day = self._planning_day()
+        
+        cached = self._cache.get(key)
+        if cached is not None:
+            cached_day, blocks = cached
+            log_info(f"Proposal cache hit for {subtask.agent.value}")
+            return self._rebase(blocks, (planning_day - cached_day).days)
+        
+        blocks = await self._propose(subtask, memory)
+        size = sum(len(block.model_dump_json()) for block in blocks)
+        self._cache.set(key, (planning_day, blocks), size=size, tag=memory.user_id)
+        return [block.model_copy() for block in blocks]
+    
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop cached proposals made with a user's preferences."""
+        removed = self._cache.invalidate_tag(user_id)
+        if removed:
+            log_info(f"Invalidated {removed} cached proposals for user {user_id}")
+    
+    async def _propose(
+        self,
+        subtask: Subtask,
+        memory: MemoryPrefs
+    ) -> list[EventBlock]:
+        """Ask the agent (or mock) for proposals, bypassing the cache."""
         if not self.api_key:
             log_warning(f"No Fetch API key, using mock for {subtask.agent}")
             return self._mock_propose(subtask, memory)
@@ -43,6 +87,22 @@ class FetchClient:
             log_warning(f"Fetch API call failed: {e}, using mock")
             return self._mock_propose(subtask, memory)
     
+    def _planning_day(self) -> date:
+        """The first day being planned (proposals start tomorrow)."""
+        return (datetime.now() + timedelta(days=1)).date()
+    
+    def _rebase(self, blocks: list[EventBlock], days: int) -> list[EventBlock]:
+        """Copy cached blocks shifted by whole days, with fresh IDs."""
+        shift = timedelta(days=days)
+        rebased = []
+        for block in blocks:
+            update = {"id": generate_id("evt_")}
+            if days:
+                update["start_iso"] = (datetime.fromisoformat(block.start_iso) + shift).isoformat()
+                update["end_iso"] = (datetime.fromisoformat(block.end_iso) + shift).isoformat()
+            rebased.append(block.model_copy(update=update))
+        return rebased
+    
     def _mock_propose(self, subtask: Subtask, memory: MemoryPrefs) -> list[EventBlock]:
         """Generate mock event blocks based on agent type."""
         log_info(f"Mock agent {subtask.agent} proposing blocks")
@@ -2,6 +2,7 @@
 from typing import Optional
 import httpx
 from app.config import settings
+from app.adapters.fetch_client import fetch_client
 from app.util.logging import log_info, log_warning
 from app.models.domain import MemoryPrefs
 
@@ -41,12 +42,16 @@ class LettaClient:
     async def upsert_prefs(self, prefs: MemoryPrefs) -> MemoryPrefs:
         """Save user preferences to Letta.
         
+        Proposals cached for the user's old preferences are invalidated.
+        
         Args:
             prefs: Preferences to save
             
         Returns:
             MemoryPrefs: Saved preferences
         """
+        fetch_client.invalidate_user(prefs.user_id)
+        
         if not self.api_key:
             log_warning("No Letta API key, using in-memory storage")
             return self._save_to_memory(prefs)
@@ -12,6 +12,11 @@ class Settings(BaseSettings):
     
     # External APIs (all optional - fallback to mocks)
     anthropic_api_key: Optional[str] = None
+    anthropic_base_url: str = "https://api.anthropic.com/v1"
+    planner_prompt_cache: bool = True
+    planner_fast_path_threshold: float = 0.7  # above 1 disables the fast path
+    planner_speculation_threshold: float = 0.3  # above 1 disables speculation
+    planner_speculation_match: float = 0.3  # description overlap to keep a guessed agent
     
     fetch_api_key: Optional[str] = None
     fetch_agentverse_url: str = "https://api.fetch.ai/agentverse"
@@ -23,9 +28,72 @@ class Settings(BaseSettings):
     composio_api_key: Optional[str] = None
     composio_base_url: str = "https://api.composio.dev"
     
+    # Shared HTTP client pool (per upstream host)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http_timeout_seconds: float = 30.0
+    http_connect_timeout_seconds: float = 5.0
+    http2: bool = False  # needs the h2 package
+    
+    # Upstream resilience (retries, circuit breaker, hedging)
+    upstream_max_retries: int = 2
+    upstream_backoff_base_seconds: float = 0.2
+    upstream_backoff_max_seconds: float = 5.0
+    upstream_hedge: bool = False
+    upstream_hedge_min_samples: int = 20
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+    
+    # Agent orchestration
+    agent_max_concurrency: int = 4
+    agent_timeout_seconds: float = 30.0
+    agent_failure_policy: str = "drop"  # drop | retry | fail
+    agent_max_retries: int = 2
+    
+    # Background jobs
+    job_workers: int = 4
+    job_queue_max_size: int = 100
+    job_history_size: int = 1000
+    
+    # Agent proposal cache
+    proposal_cache_max_entries: int = 1024
+    proposal_cache_ttl_seconds: float = 3600.0
+    proposal_cache_max_bytes: int = 16 * 1024 * 1024
+    
+    # Plan cache (set plan_cache_path to keep it across restarts)
+    plan_cache_max_entries: int = 1024
+    plan_cache_ttl_seconds: float = 86400.0
+    plan_cache_max_bytes: int = 4 * 1024 * 1024
+    plan_cache_path: Optional[str] = None
+    
+    # WebSocket delivery
+    ws_queue_max_size: int = 256
+    ws_overflow_policy: str = "drop_oldest"  # drop_oldest | drop_newest | coalesce | disconnect
+    ws_batch_max_ms: int = 1000
+    ws_large_frame_bytes: int = 16384
+    event_replay_max_bytes: int = 8 * 1024 * 1024
+    event_replay_max_events_per_key: int = 500
+    
+    # Timeline
+    timeline_state_max_users: int = 1000
+    
     # Observability
+    log_level: str = "INFO"
+    log_background: bool = False
+    log_queue_max_size: int = 10000
+    log_json_encoder: str = "json"  # json | orjson
     elastic_url: Optional[str] = None
     elastic_index: str = "taskweave-logs"
+    elastic_queue_max_size: int = 10000
+    elastic_batch_size: int = 500
+    elastic_flush_interval_seconds: float = 1.0
+    elastic_overflow_policy: str = "drop"  # drop | block
+    elastic_drain_timeout_seconds: float = 5.0
+    elastic_spool_path: Optional[str] = None
+    elastic_spool_max_bytes: int = 256 * 1024 * 1024
+    elastic_spool_segment_bytes: int = 4 * 1024 * 1024
+    elastic_retry_max_seconds: float = 60.0
     
     model_config = SettingsConfigDict(
         env_file=".env",
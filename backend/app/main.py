@@ -4,7 +4,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.router import health, llm, agents, memory, tools, websocket
+from app.adapters.elastic_logger import elastic_logger
+from app.router import health, llm, agents, memory, tools, websocket, metrics, jobs
+from app.services.jobs import job_service
+from app.util.http import http_pool
 from app.util.logging import log_info
 
 
@@ -12,7 +15,12 @@ from app.util.logging import log_info
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     log_info("TaskWeave backend starting up")
+    job_service.start()
+    elastic_logger.start()
     yield
+    await job_service.shutdown()
+    await elastic_logger.shutdown()
+    await http_pool.close()
     log_info("TaskWeave backend shutting down")
 
 
@@ -40,6 +48,8 @@ app.include_router(agents.router, tags=["agents"])
 app.include_router(memory.router, tags=["memory"])
 app.include_router(tools.router, tags=["tools"])
 app.include_router(websocket.router, tags=["websocket"])
+app.include_router(metrics.router, tags=["metrics"])
+app.include_router(jobs.router, tags=["jobs"])
 
 
 @app.get("/")
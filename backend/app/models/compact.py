@@ -0,0 +1,103 @@
+"""Compact integer representation of event blocks for timeline hot paths."""
+from datetime import datetime, timedelta, tzinfo
+from typing import Optional
+from app.models.domain import EventBlock
+
+
+SECONDS_PER_DAY = 86400
+
+
+class CompactBlock:
+    """Parsed event block with times as integer wall-clock seconds.
+    
+    Times count seconds from 0001-01-01 on the block's own wall clock, so
+    ``start % SECONDS_PER_DAY`` is the local time of day. The original
+    ``EventBlock`` is kept and only rebuilt if the block is moved.
+    """
+    
+    __slots__ = ("start", "end", "raw_start", "source_agent", "block", "tz", "order")
+    
+    def __init__(
+        self,
+        start: int,
+        end: int,
+        source_agent: str,
+        block: EventBlock,
+        tz: Optional[tzinfo] = None,
+        order: int = 0
+    ):
+        self.start = start
+        self.end = end
+        self.raw_start = start
+        self.source_agent = source_agent
+        self.block = block
+        self.tz = tz
+        self.order = order
+    
+    @property
+    def duration(self) -> int:
+        """Block length in seconds (never negative)."""
+        return max(self.end - self.start, 0)
+    
+    @property
+    def time_of_day(self) -> int:
+        """Seconds since local midnight of the proposed block start."""
+        return self.raw_start % SECONDS_PER_DAY
+    
+    @property
+    def moved(self) -> bool:
+        """Whether the block was placed away from its proposed start."""
+        return self.start != self.raw_start
+    
+    @property
+    def sort_key(self) -> tuple[int, str, int]:
+        """Merge order: proposed start, then agent, then input order."""
+        return (self.raw_start, self.source_agent, self.order)
+    
+    def shift_to(self, start: int) -> None:
+        """Move the block to a new start, keeping its duration."""
+        duration = self.duration
+        self.start = start
+        self.end = start + duration
+
+
+def to_seconds(value: datetime) -> int:
+    """Convert a datetime to whole seconds on its own wall clock."""
+    return (
+        value.toordinal() * SECONDS_PER_DAY
+        + value.hour * 3600
+        + value.minute * 60
+        + value.second
+    )
+
+
+def from_seconds(seconds: int, tz: Optional[tzinfo] = None) -> datetime:
+    """Inverse of ``to_seconds``."""
+    day, offset = divmod(seconds, SECONDS_PER_DAY)
+    return datetime.fromordinal(day).replace(tzinfo=tz) + timedelta(seconds=offset)
+
+
+def to_compact(block: EventBlock, order: int = 0) -> CompactBlock:
+    """Parse a block's ISO timestamps once into a compact record."""
+    start_dt = datetime.fromisoformat(block.start_iso)
+    end_dt = datetime.fromisoformat(block.end_iso)
+    return CompactBlock(
+        to_seconds(start_dt),
+        to_seconds(end_dt),
+        block.source_agent,
+        block,
+        start_dt.tzinfo,
+        order
+    )
+
+
+def from_compact(record: CompactBlock) -> EventBlock:
+    """Return the event block for a record, rebuilding it only if moved."""
+    block = record.block
+    if not record.moved:
+        return block
+    
+    return block.model_copy(update={
+        "start_iso": from_seconds(record.start, record.tz).isoformat(),
+        "end_iso": from_seconds(record.end, record.tz).isoformat()
+    })
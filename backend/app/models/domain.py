@@ -17,6 +17,27 @@ class EventStatus(str, Enum):
     APPLIED = "applied"
 
 
+class FailurePolicy(str, Enum):
+    """What to do when an agent fails or times out during a run."""
+    DROP = "drop"
+    RETRY = "retry"
+    FAIL = "fail"
+
+
+class JobStatus(str, Enum):
+    """Lifecycle of a background agent run."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobPriority(str, Enum):
+    """Worker pool lane for a background agent run."""
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+
 class Subtask(BaseModel):
     """A subtask assigned to an agent."""
     id: str = Field(description="Unique subtask ID")
@@ -49,3 +70,25 @@ class Timeline(BaseModel):
     user_id: str = Field(description="User ID")
     blocks: list[EventBlock] = Field(default_factory=list, description="Event blocks in chronological order")
 
+
+class TimelineDelta(BaseModel):
+    """Changes to a user's merged timeline after an incremental re-merge."""
+    user_id: str = Field(description="User ID")
+    changed: list[EventBlock] = Field(default_factory=list, description="Blocks added or moved")
+    removed_ids: list[str] = Field(default_factory=list, description="IDs of blocks removed")
+
+
+class Job(BaseModel):
+    """A background agent run."""
+    id: str = Field(description="Job ID")
+    user_id: str = Field(description="User ID")
+    trace_id: str = Field(description="Request trace ID")
+    subtasks: list[Subtask] = Field(description="Subtasks to execute")
+    priority: JobPriority = Field(default=JobPriority.INTERACTIVE, description="Worker pool lane")
+    stream: bool = Field(default=False, description="Publish the timeline as each agent finishes")
+    status: JobStatus = Field(default=JobStatus.QUEUED, description="Current status")
+    created_at: str = Field(description="Submission time in ISO 8601 format")
+    started_at: Optional[str] = Field(default=None, description="Start time in ISO 8601 format")
+    finished_at: Optional[str] = Field(default=None, description="Finish time in ISO 8601 format")
+    timeline: Optional[list[EventBlock]] = Field(default=None, description="Merged timeline on success")
+    error: Optional[str] = Field(default=None, description="Error message on failure")
@@ -1,7 +1,7 @@
 """Data Transfer Objects for API requests and responses."""
-from typing import Optional
+from typing import Any, Optional
 from pydantic import BaseModel, Field
-from app.models.domain import Subtask, EventBlock, MemoryPrefs
+from app.models.domain import Subtask, EventBlock, MemoryPrefs, Job, JobStatus
 
 
 class PlanRequest(BaseModel):
@@ -9,6 +9,10 @@ class PlanRequest(BaseModel):
     user_id: str = Field(description="User ID")
     query: str = Field(description="Natural language query")
     dry_run: bool = Field(default=True, description="Dry-run mode")
+    stream: bool = Field(
+        default=False,
+        description="Publish each subtask as soon as the planner produces it"
+    )
 
 
 class PlanResponse(BaseModel):
@@ -18,6 +22,20 @@ class PlanResponse(BaseModel):
     trace_id: str = Field(description="Request trace ID")
 
 
+class PlanRunRequest(BaseModel):
+    """Request to plan a task and run its agents in one call."""
+    user_id: str = Field(description="User ID")
+    query: str = Field(description="Natural language query")
+
+
+class PlanRunResponse(BaseModel):
+    """Response from planning and running agents."""
+    subtasks: list[Subtask] = Field(description="Executed subtasks")
+    rationale: str = Field(description="Reasoning behind the plan")
+    timeline: list[EventBlock] = Field(description="Merged timeline")
+    trace_id: str = Field(description="Request trace ID")
+
+
 class AgentSpawnRequest(BaseModel):
     """Request to spawn agents."""
     user_id: str = Field(description="User ID")
@@ -36,6 +54,10 @@ class AgentRunRequest(BaseModel):
     user_id: str = Field(description="User ID")
     subtasks: list[Subtask] = Field(description="Subtasks to execute")
     trace_id: str = Field(description="Request trace ID")
+    stream: bool = Field(
+        default=False,
+        description="Publish the timeline as each agent finishes"
+    )
 
 
 class AgentRunResponse(BaseModel):
@@ -44,6 +66,32 @@ class AgentRunResponse(BaseModel):
     trace_id: str = Field(description="Request trace ID")
 
 
+class JobSubmitResponse(BaseModel):
+    """Response from queuing a background agent run."""
+    job_id: str = Field(description="Job ID")
+    status: JobStatus = Field(description="Job status")
+    trace_id: str = Field(description="Request trace ID")
+
+
+class JobStatusResponse(BaseModel):
+    """Status of a background agent run."""
+    job: Job = Field(description="Job details")
+
+
+class AgentReplanRequest(BaseModel):
+    """Request to re-run one agent against the stored timeline."""
+    user_id: str = Field(description="User ID")
+    subtask: Subtask = Field(description="Subtask for the agent to re-propose")
+    trace_id: str = Field(description="Request trace ID")
+
+
+class AgentReplanResponse(BaseModel):
+    """Response from an incremental re-plan."""
+    changed: list[EventBlock] = Field(description="Blocks added or moved")
+    removed_ids: list[str] = Field(description="IDs of blocks removed")
+    trace_id: str = Field(description="Request trace ID")
+
+
 class MemoryUpsertRequest(BaseModel):
     """Request to update memory."""
     prefs: MemoryPrefs = Field(description="User preferences")
@@ -75,8 +123,17 @@ class ApplyCalendarResponse(BaseModel):
     trace_id: str = Field(description="Request trace ID")
 
 
+class MetricsResponse(BaseModel):
+    """In-process metrics."""
+    metrics: dict[str, dict[str, Any]] = Field(description="Stats per component")
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
     status: str = Field(description="Service status")
     version: str = Field(default="0.1.0", description="API version")
+    breakers: dict[str, str] = Field(
+        default_factory=dict,
+        description="Circuit breaker state per upstream API"
+    )
 
@@ -1,7 +1,7 @@
 """WebSocket event models."""
 from enum import Enum
 from typing import Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class EventType(str, Enum):
@@ -9,16 +9,48 @@ class EventType(str, Enum):
     AGENT_LOG = "AGENT_LOG"
     TIMELINE_UPDATE = "TIMELINE_UPDATE"
     ERROR = "ERROR"
+    PLAN_SUBTASK = "PLAN_SUBTASK"
     PLAN_COMPLETE = "PLAN_COMPLETE"
     AGENTS_SPAWNED = "AGENTS_SPAWNED"
     AGENTS_COMPLETE = "AGENTS_COMPLETE"
+    JOB_STATUS = "JOB_STATUS"
 
 
 class ServerEvent(BaseModel):
-    """Server-to-client WebSocket event."""
+    """Server-to-client WebSocket event.
+    
+    Events are not modified once published, so the wire encoding is
+    built once by ``encoded`` and shared by every connection. Other
+    frame formats cache their encodings in ``_frames`` the same way.
+    """
     type: EventType = Field(description="Event type")
     payload: Any = Field(description="Event payload")
     trace_id: Optional[str] = Field(default=None, description="Request trace ID")
+    user_id: Optional[str] = Field(default=None, description="User the event belongs to")
+    seq: Optional[int] = Field(default=None, description="Position in the stream of published events")
+    
+    _json: Optional[str] = PrivateAttr(default=None)
+    _frames: dict[str, Any] = PrivateAttr(default_factory=dict)
+    
+    def encoded(self) -> str:
+        """Return the JSON text frame for this event, serializing it on first use."""
+        # Private attributes are not instance attributes: reading
+        # ``self._json`` goes through pydantic's slow ``__getattr__``
+        private = self.__pydantic_private__
+        text = private["_json"]
+        if text is None:
+            text = private["_json"] = self.model_dump_json()
+        return text
+    
+    def frame_cache(self) -> dict[str, Any]:
+        """Return the cache for frame formats other than ``encoded``."""
+        return self.__pydantic_private__["_frames"]
+    
+    def model_copy(self, *, update: Optional[dict[str, Any]] = None, deep: bool = False) -> "ServerEvent":
+        copy = super().model_copy(update=update, deep=deep)
+        copy._json = None
+        copy._frames = {}
+        return copy
 
 
 class AgentLogPayload(BaseModel):
@@ -32,6 +64,27 @@ class TimelineUpdatePayload(BaseModel):
     """Payload for TIMELINE_UPDATE events."""
     user_id: str = Field(description="User ID")
     blocks: list[Any] = Field(description="Updated event blocks")
+    removed_ids: list[str] = Field(default_factory=list, description="IDs of removed blocks")
+    incremental: bool = Field(
+        default=False,
+        description="Whether blocks holds only changes to the previous timeline"
+    )
+    seq: Optional[int] = Field(default=None, description="Update number within a streamed run")
+    final: bool = Field(default=False, description="Whether this is the consolidated final update")
+
+
+class PlanSubtaskPayload(BaseModel):
+    """Payload for PLAN_SUBTASK events."""
+    subtask: Any = Field(description="Planned subtask")
+    index: int = Field(description="Position of the subtask in the plan")
+    rationale: Optional[str] = Field(default=None, description="Plan rationale, once known")
+
+
+class JobStatusPayload(BaseModel):
+    """Payload for JOB_STATUS events."""
+    job_id: str = Field(description="Job ID")
+    status: str = Field(description="Job status")
+    error: Optional[str] = Field(default=None, description="Error message on failure")
 
 
 class ErrorPayload(BaseModel):
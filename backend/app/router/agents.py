@@ -1,14 +1,21 @@
 """Agent coordination endpoints."""
-from fastapi import APIRouter
+from typing import Union
+from fastapi import APIRouter, HTTPException, Query, Response
 from app.models.dto import (
     AgentSpawnRequest,
     AgentSpawnResponse,
     AgentRunRequest,
-    AgentRunResponse
+    AgentRunResponse,
+    AgentReplanRequest,
+    AgentReplanResponse,
+    JobSubmitResponse
 )
+from app.models.domain import EventBlock, JobPriority
 from app.services.orchestrator import orchestrator_service
+from app.services.jobs import job_service
 from app.services.event_bus import event_bus
-from app.models.events import ServerEvent, EventType, TimelineUpdatePayload
+from app.models.events import ServerEvent, EventType
+from app.util.errors import JobError
 from app.util.ids import generate_trace_id
 from app.util.logging import log_info
 
@@ -37,48 +44,106 @@ async def spawn_agents(request: AgentSpawnRequest):
     await event_bus.publish(ServerEvent(
         type=EventType.AGENTS_SPAWNED,
         payload={"agent_ids": agent_ids},
-        trace_id=trace_id
+        trace_id=trace_id,
+        user_id=request.user_id
     ))
     
     return AgentSpawnResponse(agent_ids=agent_ids, trace_id=trace_id)
 
 
-@router.post("/api/agents/run", response_model=AgentRunResponse)
-async def run_agents(request: AgentRunRequest):
+@router.post("/api/agents/run", response_model=Union[AgentRunResponse, JobSubmitResponse])
+async def run_agents(
+    request: AgentRunRequest,
+    response: Response,
+    run_async: bool = Query(False, alias="async", description="Run as a background job"),
+    priority: JobPriority = Query(JobPriority.INTERACTIVE, description="Job lane when async")
+):
     """Coordinate agents to produce a merged timeline.
     
+    With ``?async=true`` the run is queued on the background worker pool
+    and a job ID is returned immediately (202); poll ``/api/jobs/{job_id}``
+    or follow JOB_STATUS events on ``/ws/events``.
+    
     Args:
         request: AgentRunRequest with subtasks
+        response: Response, used to set 202 for queued jobs
+        run_async: Queue the run instead of waiting for it
+        priority: Worker pool lane for queued runs
         
     Returns:
-        AgentRunResponse with merged timeline
+        AgentRunResponse with merged timeline, or JobSubmitResponse
     """
     trace_id = request.trace_id or generate_trace_id()
     log_info(f"Running {len(request.subtasks)} agents", trace_id=trace_id)
     
-    # Execute subtasks and get merged timeline
-    timeline = await orchestrator_service.execute_subtasks(
+    if run_async:
+        try:
+            job = await job_service.submit(
+                request.user_id,
+                request.subtasks,
+                trace_id,
+                priority=priority,
+                stream=request.stream
+            )
+        except JobError as e:
+            raise HTTPException(status_code=503, detail=e.message)
+        
+        response.status_code = 202
+        return JobSubmitResponse(job_id=job.id, status=job.status, trace_id=trace_id)
+    
+    if request.stream:
+        # Timeline updates are published as agents finish; keep the last one
+        async for update in orchestrator_service.stream_subtasks(
+            request.user_id,
+            request.subtasks,
+            trace_id
+        ):
+            final_update = update
+        timeline = [EventBlock.model_validate(block) for block in final_update.blocks]
+    else:
+        # Execute subtasks and get merged timeline
+        timeline = await orchestrator_service.execute_subtasks(
+            request.user_id,
+            request.subtasks,
+            trace_id
+        )
+    
+    # Emit timeline update and agents complete events
+    await orchestrator_service.publish_result(
         request.user_id,
-        request.subtasks,
-        trace_id
+        timeline,
+        trace_id,
+        include_timeline=not request.stream
     )
     
-    # Emit timeline update event
-    await event_bus.publish(ServerEvent(
-        type=EventType.TIMELINE_UPDATE,
-        payload=TimelineUpdatePayload(
-            user_id=request.user_id,
-            blocks=[block.model_dump() for block in timeline]
-        ).model_dump(),
-        trace_id=trace_id
-    ))
+    return AgentRunResponse(timeline=timeline, trace_id=trace_id)
+
+
+@router.post("/api/agents/replan", response_model=AgentReplanResponse)
+async def replan_agent(request: AgentReplanRequest):
+    """Re-run one agent and re-merge only what its proposals change.
     
-    # Emit agents complete event
-    await event_bus.publish(ServerEvent(
-        type=EventType.AGENTS_COMPLETE,
-        payload={"block_count": len(timeline)},
-        trace_id=trace_id
-    ))
+    Requires a timeline from a previous /api/agents/run for the user;
+    otherwise the agent's blocks start a new timeline.
     
-    return AgentRunResponse(timeline=timeline, trace_id=trace_id)
+    Args:
+        request: AgentReplanRequest with the subtask to re-run
+    
+    Returns:
+        AgentReplanResponse with changed blocks and removed IDs
+    """
+    trace_id = request.trace_id or generate_trace_id()
+    log_info(f"Re-planning {request.subtask.agent.value}", trace_id=trace_id)
+    
+    delta = await orchestrator_service.replan_agent(
+        request.user_id,
+        request.subtask,
+        trace_id
+    )
+    
+    return AgentReplanResponse(
+        changed=delta.changed,
+        removed_ids=delta.removed_ids,
+        trace_id=trace_id
+    )
 
@@ -1,12 +1,20 @@
 """Health check endpoint."""
 from fastapi import APIRouter
 from app.models.dto import HealthResponse
+from app.util.resilience import breaker_states
 
 router = APIRouter()
 
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint."""
-    return HealthResponse(status="ok", version="0.1.0")
+    """Health check endpoint.
+    
+    Reports "degraded" while any upstream circuit is not closed: open
+    (requests to it are being answered by fallbacks) or half-open
+    (waiting on a trial call).
+    """
+    breakers = breaker_states()
+    status = "ok" if all(state == "closed" for state in breakers.values()) else "degraded"
+    return HealthResponse(status=status, version="0.1.0", breakers=breakers)
 
@@ -0,0 +1,15 @@
+"""Background job endpoints."""
+from fastapi import APIRouter, HTTPException
+from app.models.dto import JobStatusResponse
+from app.services.jobs import job_service
+
+router = APIRouter()
+
+
+@router.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Return the status (and, once finished, the result) of a background run."""
+    job = job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return JobStatusResponse(job=job)
@@ -1,9 +1,10 @@
 """LLM planning endpoints."""
 from fastapi import APIRouter
-from app.models.dto import PlanRequest, PlanResponse
+from app.models.dto import PlanRequest, PlanResponse, PlanRunRequest, PlanRunResponse
 from app.services.planner import planner_service
+from app.services.orchestrator import orchestrator_service
 from app.services.event_bus import event_bus
-from app.models.events import ServerEvent, EventType
+from app.models.events import ServerEvent, EventType, PlanSubtaskPayload
 from app.util.ids import generate_trace_id
 from app.util.logging import log_info
 
@@ -14,8 +15,11 @@ router = APIRouter()
 async def plan_task(request: PlanRequest):
     """Parse user query into subtasks using Claude.
     
+    With ``stream`` set, each subtask is published as a PLAN_SUBTASK
+    event as soon as the planner produces it.
+    
     Args:
-        request: PlanRequest with user_id, query, dry_run
+        request: PlanRequest with user_id, query, dry_run, stream
         
     Returns:
         PlanResponse with subtasks and rationale
@@ -23,11 +27,29 @@ async def plan_task(request: PlanRequest):
     trace_id = generate_trace_id()
     log_info(f"Plan request from user {request.user_id}", trace_id=trace_id)
     
-    # Parse query with planner
-    subtasks, rationale = await planner_service.parse_query(
-        request.query,
-        request.user_id
-    )
+    if request.stream:
+        subtasks = []
+        async for subtask, rationale in planner_service.stream_query(
+            request.query,
+            request.user_id
+        ):
+            await event_bus.publish(ServerEvent(
+                type=EventType.PLAN_SUBTASK,
+                payload=PlanSubtaskPayload(
+                    subtask=subtask.model_dump(),
+                    index=len(subtasks),
+                    rationale=rationale
+                ).model_dump(),
+                trace_id=trace_id,
+                user_id=request.user_id
+            ))
+            subtasks.append(subtask)
+    else:
+        # Parse query with planner
+        subtasks, rationale = await planner_service.parse_query(
+            request.query,
+            request.user_id
+        )
     
     # Emit plan complete event
     await event_bus.publish(ServerEvent(
@@ -36,7 +58,8 @@ async def plan_task(request: PlanRequest):
             "subtasks": [s.model_dump() for s in subtasks],
             "rationale": rationale
         },
-        trace_id=trace_id
+        trace_id=trace_id,
+        user_id=request.user_id
     ))
     
     return PlanResponse(
@@ -45,3 +68,43 @@ async def plan_task(request: PlanRequest):
         trace_id=trace_id
     )
 
+
+@router.post("/api/plan/run", response_model=PlanRunResponse)
+async def plan_and_run(request: PlanRunRequest):
+    """Plan a query and run its agents in one call.
+    
+    Agents start speculatively on a local guess of the plan while Claude
+    plans; only agents whose subtasks differ from the final plan are redone.
+    
+    Args:
+        request: PlanRunRequest with user_id and query
+    
+    Returns:
+        PlanRunResponse with subtasks, rationale and merged timeline
+    """
+    trace_id = generate_trace_id()
+    log_info(f"Plan and run request from user {request.user_id}", trace_id=trace_id)
+    
+    subtasks, rationale, timeline = await orchestrator_service.plan_and_execute(
+        request.query,
+        request.user_id,
+        trace_id
+    )
+    
+    await event_bus.publish(ServerEvent(
+        type=EventType.PLAN_COMPLETE,
+        payload={
+            "subtasks": [s.model_dump() for s in subtasks],
+            "rationale": rationale
+        },
+        trace_id=trace_id,
+        user_id=request.user_id
+    ))
+    await orchestrator_service.publish_result(request.user_id, timeline, trace_id)
+    
+    return PlanRunResponse(
+        subtasks=subtasks,
+        rationale=rationale,
+        timeline=timeline,
+        trace_id=trace_id
+    )
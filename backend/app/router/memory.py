@@ -6,6 +6,7 @@ from app.models.dto import (
     MemoryGetResponse
 )
 from app.adapters.letta_client import letta_client
+from app.services.orchestrator import orchestrator_service
 from app.util.ids import generate_trace_id
 from app.util.logging import log_info
 
@@ -45,5 +46,8 @@ async def upsert_memory(request: MemoryUpsertRequest):
     
     saved_prefs = await letta_client.upsert_prefs(request.prefs)
     
+    # Re-resolve a stored timeline against the new sleep window
+    await orchestrator_service.apply_prefs(saved_prefs, trace_id)
+    
     return MemoryUpsertResponse(prefs=saved_prefs, trace_id=trace_id)
 
@@ -0,0 +1,12 @@
+"""Metrics endpoint."""
+from fastapi import APIRouter
+from app.models.dto import MetricsResponse
+from app.util.metrics import metrics_registry
+
+router = APIRouter()
+
+
+@router.get("/api/metrics", response_model=MetricsResponse)
+async def get_metrics():
+    """Return in-process counters (coalescing, caches, queues)."""
+    return MetricsResponse(metrics=metrics_registry.snapshot())
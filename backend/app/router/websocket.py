@@ -1,9 +1,11 @@
 """WebSocket endpoint for real-time events."""
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Set
+from typing import Optional, Set
 import json
+from app.config import settings
 from app.services.event_bus import event_bus
-from app.models.events import ServerEvent, EventType
+from app.services.event_frames import FrameEncoder
+from app.models.events import ServerEvent, EventType, ErrorPayload
 from app.util.logging import log_info
 
 router = APIRouter()
@@ -20,35 +22,135 @@ async def websocket_events(websocket: WebSocket):
     {
         "type": "AGENT_LOG" | "TIMELINE_UPDATE" | "ERROR" | ...,
         "payload": {...},
-        "trace_id": "..."
+        "trace_id": "...",
+        "user_id": "..."
     }
+    
+    What a client receives can be narrowed with the ``user_id``,
+    ``trace_id`` and ``types`` (comma-separated) query parameters, or
+    changed later by sending a subscribe message:
+    {"action": "subscribe", "user_id": "...", "trace_id": "...", "types": [...]}
+    Without filters a client receives every event.
+    
+    Each event carries a ``seq``. A reconnecting client passes the last
+    one it received as ``last_seq`` and first gets the events it missed
+    that are still buffered, then live events. If some missed events
+    were already evicted, an ERROR event says so before the replay.
+    
+    The frame format is negotiated with query parameters too:
+    ``encoding=msgpack`` sends binary MessagePack frames instead of JSON
+    text, ``batch_ms=N`` sends an array of the events published within
+    N ms per frame, and ``compress=deflate`` deflates frames of at least
+    ``WS_LARGE_FRAME_BYTES`` (events that large are never batched).
+    Binary frames start with a flag byte: 1 if the rest is deflated,
+    else 0.
     """
+    params = websocket.query_params
+    try:
+        event_types = parse_event_types(params.get("types"))
+        last_seq = int(params["last_seq"]) if params.get("last_seq") else None
+        batch_ms = min(max(int(params.get("batch_ms") or 0), 0), settings.ws_batch_max_ms)
+        compress = params.get("compress")
+        if compress not in (None, "deflate"):
+            raise ValueError(f"Unknown compression: {compress}")
+        encoder = FrameEncoder(
+            params.get("encoding", "json"),
+            batched=batch_ms > 0,
+            compress=compress is not None,
+            large_bytes=settings.ws_large_frame_bytes
+        )
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    
     await websocket.accept()
     active_connections.add(websocket)
     log_info("WebSocket client connected")
     
-    # Define event handler for this connection
-    async def send_event(event: ServerEvent) -> None:
-        """Send event to this WebSocket client."""
+    # Define event handlers for this connection
+    async def send_events(events: list[ServerEvent]) -> None:
+        """Send events to this WebSocket client, batched as negotiated."""
         try:
-            if websocket in active_connections:
-                await websocket.send_text(event.model_dump_json())
+            for frame in encoder.encode(events):
+                if websocket not in active_connections:
+                    break
+                if isinstance(frame, str):
+                    await websocket.send_text(frame)
+                else:
+                    await websocket.send_bytes(frame)
         except Exception as e:
             log_info(f"Error sending WebSocket event: {e}")
             if websocket in active_connections:
                 active_connections.remove(websocket)
     
-    # Subscribe to all event types
-    for event_type in EventType:
-        event_bus.subscribe(event_type, send_event)
+    async def send_event(event: ServerEvent) -> None:
+        """Send an event to this WebSocket client."""
+        await send_events([event])
+    
+    async def close_slow_client() -> None:
+        """Close a client that fell too far behind (disconnect policy)."""
+        active_connections.discard(websocket)
+        await websocket.close(code=1013)
+    
+    # Subscribe to the requested events; a slow client only fills its own queue
+    subscription = event_bus.attach(
+        send_events if batch_ms else send_event,
+        event_types=event_types,
+        max_queue_size=settings.ws_queue_max_size,
+        policy=settings.ws_overflow_policy,
+        on_disconnect=close_slow_client,
+        user_id=params.get("user_id"),
+        trace_id=params.get("trace_id"),
+        batch_seconds=batch_ms / 1000
+    )
+    
+    if last_seq is not None:
+        # Queued before any await, so replayed events precede live ones
+        missed, complete = event_bus.replay(
+            last_seq,
+            user_id=subscription.user_id,
+            trace_id=subscription.trace_id,
+            event_types=subscription.event_types
+        )
+        if not complete:
+            missed.insert(0, ServerEvent(
+                type=EventType.ERROR,
+                payload=ErrorPayload(
+                    message="Replay incomplete",
+                    details=f"Some events after seq {last_seq} are no longer buffered"
+                ).model_dump()
+            ))
+        # Outside the live queue's size limit, so nothing replayed is dropped
+        subscription.prefill(missed)
     
     try:
         # Keep connection alive and wait for disconnect
         while True:
             # Receive messages (clients may send pings to keep alive)
             data = await websocket.receive_text()
-            # Echo back or ignore
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(message, dict) or message.get("action") != "subscribe":
+                continue
             
+            try:
+                types = message.get("types") or None
+                if types is not None and not isinstance(types, str):
+                    types = ",".join(types)
+                event_bus.rescope(
+                    subscription,
+                    event_types=parse_event_types(types),
+                    user_id=message.get("user_id"),
+                    trace_id=message.get("trace_id")
+                )
+            except (TypeError, ValueError) as e:
+                await send_event(ServerEvent(
+                    type=EventType.ERROR,
+                    payload=ErrorPayload(message="Invalid subscription", details=str(e)).model_dump()
+                ))
+    
     except WebSocketDisconnect:
         log_info("WebSocket client disconnected")
     finally:
@@ -57,8 +159,22 @@ async def websocket_events(websocket: WebSocket):
             active_connections.remove(websocket)
         
         # Unsubscribe from all events
-        for event_type in EventType:
-            event_bus.unsubscribe(event_type, send_event)
+        event_bus.detach(subscription)
+
+
+def parse_event_types(value: Optional[str]) -> Optional[list[EventType]]:
+    """Parse a comma-separated list of event type names.
+    
+    Raises:
+        ValueError: If a name is not an EventType
+    """
+    if not value:
+        return None
+    names = [name.strip().upper() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in EventType.__members__]
+    if unknown:
+        raise ValueError(f"Unknown event types: {', '.join(unknown)}")
+    return [EventType[name] for name in names]
 
 
 async def broadcast_event(event: ServerEvent) -> None:
@@ -68,10 +184,11 @@ async def broadcast_event(event: ServerEvent) -> None:
         event: Event to broadcast
     """
     disconnected = set()
+    text = event.encoded()
     
-    for connection in active_connections:
+    for connection in list(active_connections):
         try:
-            await connection.send_text(event.model_dump_json())
+            await connection.send_text(text)
         except Exception:
             disconnected.add(connection)
     
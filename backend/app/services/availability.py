@@ -0,0 +1,87 @@
+"""Availability-aware placement index for timeline free-slot search."""
+from bisect import bisect_right
+from app.models.compact import SECONDS_PER_DAY
+from app.services.interval_index import IntervalIndex
+
+
+def daily_windows(
+    work_start: int,
+    work_end: int,
+    sleep_start: int,
+    sleep_end: int
+) -> list[tuple[int, int]]:
+    """Compute the allowed ``[start, end)`` windows of a day.
+    
+    Work hours minus the sleep window, all in seconds since midnight.
+    An overnight sleep window (e.g. 23:00 - 07:00) wraps around midnight,
+    and equal bounds mean the whole day is sleep.
+    
+    Returns:
+        list[tuple[int, int]]: Sorted, disjoint, non-empty windows
+    """
+    if sleep_start < sleep_end:
+        sleep = [(sleep_start, sleep_end)]
+    elif sleep_start > sleep_end:
+        sleep = [(0, sleep_end), (sleep_start, SECONDS_PER_DAY)]
+    else:
+        sleep = [(0, SECONDS_PER_DAY)]
+    
+    windows = []
+    cursor = work_start
+    for lo, hi in sleep:
+        if lo > cursor:
+            windows.append((cursor, min(lo, work_end)))
+        cursor = max(cursor, hi)
+    if cursor < work_end:
+        windows.append((cursor, work_end))
+    
+    return [(lo, hi) for lo, hi in windows if lo < hi]
+
+
+class AvailabilityIndex(IntervalIndex):
+    """Interval index that only hands out slots inside allowed daily windows.
+    
+    Free time is the run-length free-list of allowed windows (the same
+    every day) minus the coalesced busy runs of placed blocks, so
+    "first free run of length d at or after t" alternates two binary
+    searches: snap to the next window that can hold ``d``, then skip the
+    busy run in the way, until both agree.
+    """
+    
+    def __init__(self, windows: list[tuple[int, int]]):
+        super().__init__()
+        self.windows = windows
+        self._window_ends = [hi for _, hi in windows]
+        self.longest = max((hi - lo for lo, hi in windows), default=0)
+    
+    def fits(self, duration: int) -> bool:
+        """Check whether a block of ``duration`` fits in any allowed window."""
+        return max(duration, 1) <= self.longest
+    
+    def next_free(self, start: int, duration: int) -> int:
+        """Find the earliest allowed, unoccupied slot at or after ``start``.
+        
+        Raises:
+            ValueError: If ``duration`` is longer than every allowed window
+        """
+        if not self.fits(duration):
+            raise ValueError(f"No allowed window can hold {duration}s")
+        
+        candidate = start
+        while True:
+            candidate = self._next_allowed(candidate, max(duration, 1))
+            free = super().next_free(candidate, duration)
+            if free == candidate:
+                return candidate
+            candidate = free
+    
+    def _next_allowed(self, start: int, length: int) -> int:
+        """Earliest ``t >= start`` with ``[t, t + length)`` inside one window."""
+        day, time_of_day = divmod(start, SECONDS_PER_DAY)
+        while True:
+            for lo, hi in self.windows[bisect_right(self._window_ends, time_of_day):]:
+                slot = max(lo, time_of_day)
+                if hi - slot >= length:
+                    return day * SECONDS_PER_DAY + slot
+            day += 1
+            time_of_day = 0
@@ -1,19 +1,243 @@
 """In-process event bus for pub/sub messaging."""
-from typing import Callable, Awaitable
-from collections import defaultdict
+import asyncio
+import itertools
+import time
+from collections import defaultdict, deque
+from enum import Enum
+from typing import Callable, Awaitable, Hashable, Iterable, Optional
+from app.config import settings
 from app.models.events import ServerEvent, EventType
-from app.util.logging import log_info
+from app.services.event_replay import ReplayBuffer
+from app.util.logging import log_info, log_warning
+from app.util.metrics import metrics_registry
 
 
 EventHandler = Callable[[ServerEvent], Awaitable[None]]
 
 
+class OverflowPolicy(str, Enum):
+    """What a queued subscription does when its queue is full."""
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+def coalesce_key(event: ServerEvent) -> Optional[Hashable]:
+    """Key under which a newer event supersedes an older queued one.
+    
+    Only events that carry full state can replace each other: job
+    statuses per job, and non-incremental timelines per user.
+    """
+    payload = event.payload if isinstance(event.payload, dict) else {}
+    if event.type == EventType.JOB_STATUS:
+        return (event.type, payload.get("job_id"))
+    if event.type == EventType.TIMELINE_UPDATE and not payload.get("incremental"):
+        return (event.type, payload.get("user_id"))
+    return None
+
+
+class Subscription:
+    """A subscriber with its own bounded queue and drain task.
+    
+    The subscriber receives events of its types that match its scope: a
+    ``user_id`` and/or ``trace_id`` it is limited to (None matches any).
+    ``offer`` never waits: it queues the event, applying the overflow
+    policy when the queue is full, and the drain task delivers queued
+    events to the handler in order. A slow handler only delays itself.
+    
+    With ``batch_seconds`` set, the drain task waits that long after the
+    first queued event and passes the handler a list of everything
+    queued by then, so a burst of events is delivered in one call.
+    
+    Events given to ``prefill`` (a replay for a reconnecting client) go
+    to a separate backlog that is delivered before the queue and is not
+    subject to its size limit or overflow policy.
+    """
+    
+    def __init__(
+        self,
+        handler: EventHandler,
+        event_types: frozenset[EventType],
+        max_queue_size: int,
+        policy: OverflowPolicy,
+        on_disconnect: Optional[Callable[[], Awaitable[None]]] = None,
+        user_id: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        batch_seconds: float = 0.0
+    ):
+        self.handler = handler
+        self.event_types = event_types
+        self.user_id = user_id
+        self.trace_id = trace_id
+        self.max_queue_size = max(max_queue_size, 1)
+        self.policy = OverflowPolicy(policy)
+        self.on_disconnect = on_disconnect
+        self.batch_seconds = batch_seconds
+        self.closed = False
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.max_depth = 0
+        self._queue: deque[ServerEvent] = deque()
+        self._backlog: deque[ServerEvent] = deque()
+        self._ready = asyncio.Event()
+        self._closer: Optional[asyncio.Task] = None
+        self._task = asyncio.create_task(self._drain())
+    
+    @property
+    def depth(self) -> int:
+        return len(self._queue) + len(self._backlog)
+    
+    @property
+    def index_key(self) -> tuple[Optional[str], Optional[str]]:
+        """Most selective scope, used to index the subscription."""
+        if self.trace_id is not None:
+            return ("trace", self.trace_id)
+        if self.user_id is not None:
+            return ("user", self.user_id)
+        return (None, None)
+    
+    def matches(self, event: ServerEvent) -> bool:
+        """Check the scope not already implied by the index key."""
+        return (
+            (self.user_id is None or event.user_id == self.user_id)
+            and (self.trace_id is None or event.trace_id == self.trace_id)
+        )
+    
+    def offer(self, event: ServerEvent) -> bool:
+        """Queue an event without waiting.
+        
+        Returns:
+            bool: False if the subscriber was disconnected for falling behind
+        """
+        if self.closed:
+            return False
+        
+        queue = self._queue
+        if len(queue) >= self.max_queue_size:
+            if self.policy == OverflowPolicy.DISCONNECT:
+                self.dropped += 1
+                self._disconnect()
+                return False
+            if self.policy == OverflowPolicy.DROP_NEWEST:
+                self.dropped += 1
+                return True
+            if not (self.policy == OverflowPolicy.COALESCE and self._coalesce(event)):
+                queue.popleft()
+                self.dropped += 1
+        
+        queue.append(event)
+        if len(queue) > self.max_depth:
+            self.max_depth = len(queue)
+        self._ready.set()
+        return True
+    
+    def prefill(self, events: Iterable[ServerEvent]) -> None:
+        """Deliver events ahead of anything queued, without dropping any."""
+        if self.closed:
+            return
+        self._backlog.extend(events)
+        self._ready.set()
+    
+    def close(self) -> None:
+        """Stop delivering; queued events are discarded."""
+        self.closed = True
+        self._queue.clear()
+        self._backlog.clear()
+        self._task.cancel()
+    
+    def _coalesce(self, event: ServerEvent) -> bool:
+        """Remove a queued event the new one supersedes, if any."""
+        key = coalesce_key(event)
+        if key is None:
+            return False
+        for queued in self._queue:
+            if coalesce_key(queued) == key:
+                self._queue.remove(queued)
+                self.coalesced += 1
+                return True
+        return False
+    
+    def _disconnect(self) -> None:
+        log_warning(f"Disconnecting subscriber with {len(self._queue)} undelivered events")
+        self.close()
+        if self.on_disconnect is not None:
+            self._closer = asyncio.create_task(self.on_disconnect())
+    
+    async def _drain(self) -> None:
+        """Deliver queued events one at a time, or in batches."""
+        queue = self._queue
+        backlog = self._backlog
+        while True:
+            if not queue and not backlog:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            if self.batch_seconds > 0:
+                await self._drain_batch()
+                continue
+            event = backlog.popleft() if backlog else queue.popleft()
+            try:
+                await self.handler(event)
+                self.delivered += 1
+            except Exception as e:
+                log_info(f"Error in event handler: {e}")
+    
+    async def _drain_batch(self) -> None:
+        """Wait out the batch window, then deliver everything queued.
+        
+        A backlog is delivered first, at most ``max_queue_size`` events
+        per batch.
+        """
+        await asyncio.sleep(self.batch_seconds)
+        backlog = self._backlog
+        if backlog:
+            events = [backlog.popleft() for _ in range(min(len(backlog), self.max_queue_size))]
+        else:
+            events = list(self._queue)
+            self._queue.clear()
+        if not events:
+            return
+        try:
+            await self.handler(events)
+            self.delivered += len(events)
+            self.batches += 1
+        except Exception as e:
+            log_info(f"Error in event handler: {e}")
+
+
 class EventBus:
-    """Simple in-process event bus for WebSocket integration."""
+    """Simple in-process event bus for WebSocket integration.
+    
+    Handlers added with ``subscribe`` are awaited in turn by ``publish``.
+    Subscribers added with ``attach`` get a bounded queue and a drain
+    task instead, so ``publish`` only queues for them and returns.
+    
+    Queued subscribers are indexed by event type and by their most
+    selective scope (trace, else user, else none), so ``publish`` looks
+    at three index buckets and touches only subscribers that can match.
+    
+    ``publish`` stamps each event with a ``seq`` that increases across
+    the process (and across restarts, as it starts from the clock in
+    microseconds) and keeps it in a ``ReplayBuffer``, so a reconnecting
+    client can ask for what it missed with ``replay``.
+    """
     
     def __init__(self):
         self._handlers: dict[str, list[EventHandler]] = defaultdict(list)
-        
+        self._index: dict[tuple, set[Subscription]] = defaultdict(set)
+        self._attached: set[Subscription] = set()
+        self._detached = {"delivered": 0, "dropped": 0, "coalesced": 0, "batches": 0}
+        self.disconnected = 0
+        self._seq = itertools.count(time.time_ns() // 1000)
+        self.replay_buffer = ReplayBuffer(
+            settings.event_replay_max_bytes,
+            settings.event_replay_max_events_per_key
+        )
+        metrics_registry.register("event_bus", self.stats)
+    
     def subscribe(self, event_type: EventType, handler: EventHandler) -> None:
         """Subscribe a handler to an event type.
         
@@ -23,7 +247,7 @@ class EventBus:
         """
         self._handlers[event_type.value].append(handler)
         log_info(f"Subscribed handler to {event_type.value}")
-        
+    
     def unsubscribe(self, event_type: EventType, handler: EventHandler) -> None:
         """Unsubscribe a handler from an event type.
         
@@ -35,12 +259,102 @@ class EventBus:
             self._handlers[event_type.value].remove(handler)
             log_info(f"Unsubscribed handler from {event_type.value}")
     
+    def attach(
+        self,
+        handler: EventHandler,
+        event_types: Optional[Iterable[EventType]] = None,
+        max_queue_size: int = 256,
+        policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        on_disconnect: Optional[Callable[[], Awaitable[None]]] = None,
+        user_id: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        batch_seconds: float = 0.0
+    ) -> Subscription:
+        """Add a queued subscriber.
+        
+        Args:
+            handler: Async function receiving events in order
+            event_types: Types to receive (default: all)
+            max_queue_size: Events held before the overflow policy applies
+            policy: Overflow policy
+            on_disconnect: Called if the ``disconnect`` policy drops the subscriber
+            user_id: Only events for this user (default: any)
+            trace_id: Only events for this trace (default: any)
+            batch_seconds: Deliver lists of events queued within this window
+                (default: one event per call)
+        
+        Returns:
+            Subscription: Pass to ``detach`` to remove it
+        """
+        subscription = Subscription(
+            handler,
+            frozenset(event_types or EventType),
+            max_queue_size,
+            policy,
+            on_disconnect,
+            user_id,
+            trace_id,
+            batch_seconds
+        )
+        self._attached.add(subscription)
+        self._add_to_index(subscription)
+        return subscription
+    
+    def rescope(
+        self,
+        subscription: Subscription,
+        event_types: Optional[Iterable[EventType]] = None,
+        user_id: Optional[str] = None,
+        trace_id: Optional[str] = None
+    ) -> None:
+        """Change what a queued subscriber receives, keeping its queue."""
+        if subscription not in self._attached:
+            return
+        
+        self._remove_from_index(subscription)
+        subscription.event_types = frozenset(event_types or EventType)
+        subscription.user_id = user_id
+        subscription.trace_id = trace_id
+        self._add_to_index(subscription)
+    
+    def detach(self, subscription: Subscription) -> None:
+        """Remove a queued subscriber and stop its drain task (idempotent)."""
+        if subscription not in self._attached:
+            return
+        
+        self._attached.discard(subscription)
+        self._remove_from_index(subscription)
+        subscription.close()
+        for name in self._detached:
+            self._detached[name] += getattr(subscription, name)
+    
     async def publish(self, event: ServerEvent) -> None:
         """Publish an event to all subscribers.
         
         Args:
             event: Event to publish
         """
+        event.seq = next(self._seq)
+        # Drop any encoding made before the seq was set
+        event._json = None
+        event.frame_cache().clear()
+        self.replay_buffer.add(event)
+        
+        keys = [(event.type, None, None)]
+        if event.user_id is not None:
+            keys.append((event.type, "user", event.user_id))
+        if event.trace_id is not None:
+            keys.append((event.type, "trace", event.trace_id))
+        
+        for key in keys:
+            subscriptions = self._index.get(key)
+            if not subscriptions:
+                continue
+            for subscription in list(subscriptions):
+                if subscription.matches(event) and not subscription.offer(event):
+                    self.disconnected += 1
+                    self.detach(subscription)
+        
         handlers = self._handlers.get(event.type.value, [])
         
         for handler in handlers:
@@ -48,8 +362,57 @@ class EventBus:
                 await handler(event)
             except Exception as e:
                 log_info(f"Error in event handler: {e}")
+    
+    def replay(
+        self,
+        last_seq: int,
+        user_id: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        event_types: Optional[Iterable[EventType]] = None
+    ) -> tuple[list[ServerEvent], bool]:
+        """Return buffered events published after ``last_seq`` in a scope.
+        
+        Args:
+            last_seq: Seq of the last event the client received
+            user_id: Only events for this user (default: any)
+            trace_id: Only events for this trace (default: any)
+            event_types: Types to return (default: all)
+        
+        Returns:
+            tuple: (events in publish order, False if some were evicted)
+        """
+        return self.replay_buffer.replay(last_seq, user_id, trace_id, event_types)
+    
+    def stats(self) -> dict:
+        """Return delivery counters and queue depths for the metrics endpoint."""
+        subscriptions = self._attached
+        totals = dict(self._detached)
+        for subscription in subscriptions:
+            for name in totals:
+                totals[name] += getattr(subscription, name)
+        return {
+            "handlers": sum(len(handlers) for handlers in self._handlers.values()),
+            "subscriptions": len(subscriptions),
+            "queue_depth": sum(subscription.depth for subscription in subscriptions),
+            "max_queue_depth": max((subscription.max_depth for subscription in subscriptions), default=0),
+            "disconnected": self.disconnected,
+            **totals,
+            "replay": self.replay_buffer.stats()
+        }
+    
+    def _add_to_index(self, subscription: Subscription) -> None:
+        for event_type in subscription.event_types:
+            self._index[(event_type, *subscription.index_key)].add(subscription)
+    
+    def _remove_from_index(self, subscription: Subscription) -> None:
+        for event_type in subscription.event_types:
+            key = (event_type, *subscription.index_key)
+            subscriptions = self._index.get(key)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._index[key]
 
 
 # Global event bus instance
 event_bus = EventBus()
-
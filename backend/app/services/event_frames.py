@@ -0,0 +1,139 @@
+"""WebSocket frame encodings for server events."""
+import zlib
+from typing import Union
+from app.models.events import ServerEvent
+from app.util.metrics import metrics_registry
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+ENCODINGS = ("json", "msgpack")
+
+# First byte of every binary frame
+FLAG_PLAIN = b"\x00"
+FLAG_DEFLATE = b"\x01"
+
+frame_stats = {"frames": 0, "events": 0, "bytes": 0, "compressed": 0}
+
+
+def is_available(encoding: str) -> bool:
+    """Check whether an encoding can be used in this install."""
+    return encoding == "json" or (encoding == "msgpack" and msgpack is not None)
+
+
+def _msgpack_array_header(length: int) -> bytes:
+    if length < 16:
+        return bytes([0x90 | length])
+    if length < 0x10000:
+        return b"\xdc" + length.to_bytes(2, "big")
+    return b"\xdd" + length.to_bytes(4, "big")
+
+
+class FrameEncoder:
+    """Turns events into frames in the format a connection negotiated.
+    
+    ``json`` frames are text frames, ``msgpack`` frames are binary. A
+    batching connection gets an array of events per frame, otherwise
+    one event per frame. Events of at least ``large_bytes`` as JSON (in
+    practice full timeline updates) always get a frame of their own,
+    which with ``compress`` is deflated and sent as binary; binary
+    frames start with a flag byte saying whether the rest is deflated.
+    
+    Single-event frames and msgpack encodings are cached on the event,
+    so fanning one event out to many connections encodes and compresses
+    it once; only batches of small events are built per connection.
+    """
+    
+    def __init__(
+        self,
+        encoding: str = "json",
+        batched: bool = False,
+        compress: bool = False,
+        large_bytes: int = 16384
+    ):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding}")
+        if not is_available(encoding):
+            raise ValueError(f"Encoding {encoding} is not available on this server")
+        self.encoding = encoding
+        self.batched = batched
+        self.compress = compress
+        self.large_bytes = large_bytes
+        self._key = f"{encoding}:{int(batched)}:{int(compress)}:{large_bytes}"
+    
+    def encode(self, events: list[ServerEvent]) -> list[Union[str, bytes]]:
+        """Build the frames for events, in order: one per event unless batching."""
+        if not self.batched:
+            frames = [self._single(event) for event in events]
+        else:
+            frames = []
+            small = []
+            for event in events:
+                if len(event.encoded()) >= self.large_bytes:
+                    if small:
+                        frames.append(self._batch(small))
+                        small = []
+                    frames.append(self._single(event))
+                else:
+                    small.append(event)
+            if small:
+                frames.append(self._batch(small))
+        
+        frame_stats["frames"] += len(frames)
+        frame_stats["events"] += len(events)
+        for frame in frames:
+            frame_stats["bytes"] += len(frame)
+            if frame[:1] == FLAG_DEFLATE:
+                frame_stats["compressed"] += 1
+        return frames
+    
+    def _batch(self, events: list[ServerEvent]) -> Union[str, bytes]:
+        if len(events) == 1:
+            return self._single(events[0])
+        return self._compress(self._body(events))
+    
+    def _single(self, event: ServerEvent) -> Union[str, bytes]:
+        key = self._key
+        cache = event.frame_cache()
+        frame = cache.get(key)
+        if frame is None:
+            frame = cache[key] = self._compress(self._body([event]))
+        return frame
+    
+    def _body(self, events: list[ServerEvent]) -> Union[str, bytes]:
+        if self.encoding == "json":
+            if not self.batched:
+                return events[0].encoded()
+            return "[" + ",".join(event.encoded() for event in events) + "]"
+        
+        packed = [self._packed(event) for event in events]
+        if not self.batched:
+            return packed[0]
+        return _msgpack_array_header(len(packed)) + b"".join(packed)
+    
+    def _packed(self, event: ServerEvent) -> bytes:
+        cache = event.frame_cache()
+        packed = cache.get("msgpack")
+        if packed is None:
+            packed = cache["msgpack"] = msgpack.packb(event.model_dump(mode="json"))
+        return packed
+    
+    def _compress(self, body: Union[str, bytes]) -> Union[str, bytes]:
+        if self.compress:
+            data = body.encode() if isinstance(body, str) else body
+            if len(data) >= self.large_bytes:
+                return FLAG_DEFLATE + zlib.compress(data)
+        if isinstance(body, str):
+            return body
+        return FLAG_PLAIN + body
+
+
+def frame_encoder_stats() -> dict:
+    """Return frame counters for the metrics endpoint."""
+    return dict(frame_stats)
+
+
+metrics_registry.register("ws_frames", frame_encoder_stats)
@@ -0,0 +1,116 @@
+"""Bounded buffer of recent events for clients that reconnect."""
+from collections import deque
+from typing import Iterable, Optional
+from app.models.events import ServerEvent, EventType
+
+
+class ReplayBuffer:
+    """Recent events by trace and by user, within a memory budget.
+    
+    Every published event is kept once in a log ordered by ``seq``; per
+    trace and per user rings hold references into it. Size is measured
+    as the event's encoded frame, which is cached on the event and
+    shared with every WebSocket send. When the log exceeds
+    ``max_bytes``, the oldest events are evicted from the log and from
+    their rings; each ring also keeps at most ``max_events_per_key``.
+    Rings remember the newest ``seq`` they lost, so a replay can tell
+    the client when events it missed are gone.
+    """
+    
+    def __init__(self, max_bytes: int, max_events_per_key: int):
+        self.max_bytes = max_bytes
+        self.max_events_per_key = max(max_events_per_key, 1)
+        self.size_bytes = 0
+        self.evicted = 0
+        self._log: deque[tuple[ServerEvent, int]] = deque()
+        self._rings: dict[tuple[str, str], deque[ServerEvent]] = {}
+        # Newest seq dropped per ring; the (None, None) key is the whole log
+        self._lost: dict[tuple, int] = {}
+    
+    def add(self, event: ServerEvent) -> None:
+        """Record a published event (its ``seq`` must be set)."""
+        size = len(event.encoded())
+        self._log.append((event, size))
+        self.size_bytes += size
+        for key in self._keys(event):
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = deque()
+                # Earlier events for this key may have left with the log
+                self._lost[key] = self._lost.get((None, None), 0)
+            ring.append(event)
+            if len(ring) > self.max_events_per_key:
+                self._lost[key] = ring.popleft().seq
+        
+        while self.size_bytes > self.max_bytes and self._log:
+            self._evict()
+    
+    def replay(
+        self,
+        last_seq: int,
+        user_id: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        event_types: Optional[Iterable[EventType]] = None
+    ) -> tuple[list[ServerEvent], bool]:
+        """Return buffered events after ``last_seq`` matching a scope.
+        
+        Returns:
+            tuple: (events in seq order, whether none of the missed
+                events had been evicted)
+        """
+        if trace_id is not None:
+            key = ("trace", trace_id)
+        elif user_id is not None:
+            key = ("user", user_id)
+        else:
+            key = (None, None)
+        if key == (None, None):
+            source = (event for event, _ in reversed(self._log))
+        else:
+            source = reversed(self._rings.get(key, ()))
+        
+        types = frozenset(event_types) if event_types else None
+        missed = []
+        for event in source:
+            if event.seq <= last_seq:
+                break
+            if (
+                (types is None or event.type in types)
+                and (user_id is None or event.user_id == user_id)
+                and (trace_id is None or event.trace_id == trace_id)
+            ):
+                missed.append(event)
+        missed.reverse()
+        lost = self._lost.get(key, self._lost.get((None, None), 0))
+        return missed, lost <= last_seq
+    
+    def stats(self) -> dict:
+        return {
+            "events": len(self._log),
+            "bytes": self.size_bytes,
+            "rings": len(self._rings),
+            "evicted": self.evicted
+        }
+    
+    def _evict(self) -> None:
+        """Drop the oldest event from the log and from its rings."""
+        event, size = self._log.popleft()
+        self.size_bytes -= size
+        self.evicted += 1
+        self._lost[(None, None)] = event.seq
+        for key in self._keys(event):
+            ring = self._rings.get(key)
+            if ring and ring[0] is event:
+                ring.popleft()
+                self._lost[key] = event.seq
+            if ring is not None and not ring:
+                del self._rings[key]
+                self._lost.pop(key, None)
+    
+    def _keys(self, event: ServerEvent) -> list[tuple[str, str]]:
+        keys = []
+        if event.trace_id is not None:
+            keys.append(("trace", event.trace_id))
+        if event.user_id is not None:
+            keys.append(("user", event.user_id))
+        return keys
@@ -0,0 +1,152 @@
+"""Rule-based intent classifier for the planner fast path."""
+import math
+import re
+from typing import Optional
+from app.models.domain import AgentType
+
+
+class Intent:
+    """A common query shape with a fixed three-agent plan."""
+    
+    def __init__(
+        self,
+        name: str,
+        keywords: dict[str, float],
+        rationale: str,
+        descriptions: dict[AgentType, str]
+    ):
+        self.name = name
+        self.keywords = keywords
+        self.rationale = rationale
+        self.descriptions = descriptions
+
+
+class IntentMatch:
+    """Classifier result: best intent (if any) and confidence in [0, 1]."""
+    
+    __slots__ = ("intent", "confidence")
+    
+    def __init__(self, intent: Optional[Intent], confidence: float):
+        self.intent = intent
+        self.confidence = confidence
+
+
+INTENTS = [
+    Intent(
+        name="exam_prep",
+        keywords={
+            "midterm": 2.0, "midterms": 2.0, "exam": 2.0, "exams": 2.0,
+            "final": 1.0, "finals": 1.5, "quiz": 1.5, "test": 1.0, "tests": 1.0,
+            "study": 1.0, "studying": 1.0, "revise": 1.5, "revision": 1.5
+        },
+        rationale="Breaking down exam preparation into study sessions, meal planning for energy, and calendar blocking for focus time.",
+        descriptions={
+            AgentType.STUDY_AGENT: "Create 3 focused study blocks per day (90min each) covering CS fundamentals, algorithms, and practice problems",
+            AgentType.MEAL_AGENT: "Schedule healthy meals and snacks to maintain energy during study sessions",
+            AgentType.CALENDAR_AGENT: "Block study time in calendar, ensuring breaks and avoiding conflicts with existing commitments"
+        }
+    ),
+    Intent(
+        name="project_work",
+        keywords={
+            "project": 2.0, "projects": 2.0, "code": 1.5, "coding": 1.5,
+            "hackathon": 2.0, "implement": 1.0, "implementation": 1.0, "debug": 1.0
+        },
+        rationale="Organizing project work into coding sessions, nutrition planning, and time blocking.",
+        descriptions={
+            AgentType.STUDY_AGENT: "Allocate dedicated coding blocks for project implementation and testing",
+            AgentType.MEAL_AGENT: "Plan meals around deep work sessions to optimize productivity",
+            AgentType.CALENDAR_AGENT: "Reserve uninterrupted time slots for coding and review"
+        }
+    )
+]
+
+# Words that carry no intent of their own and do not lower coverage
+FILLER_WORDS = frozenset("""
+a an the my me i i'm im to for of and or with on in at this next coming
+help please can you could would need want get plan planning organize
+schedule prepare prep week weeks day days weekend month tomorrow today
+some time all cs class classes course courses upcoming
+""".split())
+
+
+class IntentClassifier:
+    """Keyword classifier compiled to a word -> (intent, weight) table.
+    
+    A query is tokenized once and each word is a single dict lookup, so
+    classification takes microseconds. Each intent scores the summed
+    weights of its distinct keywords found in the query. Confidence
+    multiplies three factors in [0, 1]:
+    
+    - strength, ``1 - exp(-score)``: more and stronger keywords
+    - margin over the runner-up intent: the query is not ambiguous
+    - coverage: share of words that are keywords or filler, so long or
+      unusual queries are left to the LLM
+    """
+    
+    def __init__(self, intents: list[Intent] = INTENTS):
+        self.intents = intents
+        self._weights: dict[str, list[tuple[int, float]]] = {}
+        for index, intent in enumerate(intents):
+            for keyword, weight in intent.keywords.items():
+                self._weights.setdefault(keyword, []).append((index, weight))
+        self._words = re.compile(r"[a-z']+")
+    
+    def classify(self, query: str) -> IntentMatch:
+        """Score a query against every intent."""
+        words = self._words.findall(query.lower())
+        if not words:
+            return IntentMatch(None, 0.0)
+        
+        scores = [0.0] * len(self.intents)
+        seen = set()
+        known = 0
+        for word in words:
+            weights = self._weights.get(word)
+            if weights is not None:
+                known += 1
+                if word not in seen:
+                    seen.add(word)
+                    for index, weight in weights:
+                        scores[index] += weight
+            elif word in FILLER_WORDS:
+                known += 1
+        
+        ranked = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+        best = scores[ranked[0]]
+        if best == 0:
+            return IntentMatch(None, 0.0)
+        
+        runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+        strength = 1 - math.exp(-best)
+        margin = (best - runner_up) / best
+        coverage = known / len(words)
+        return IntentMatch(self.intents[ranked[0]], strength * margin * coverage)
+
+
+def description_overlap(first: str, second: str) -> float:
+    """Score how much two subtask descriptions are about the same thing.
+    
+    Compares the non-filler words of at least three letters, cut to
+    their first four letters so "meal" and "meals" or "week" and
+    "weekly" match, and returns the share of the shorter description's
+    words found in the other: 0 for nothing in common, 1 when one
+    covers the other.
+    
+    Returns:
+        float: Overlap in [0, 1]
+    """
+    def stems(text: str) -> set[str]:
+        return {
+            word[:4] for word in re.findall(r"[a-z']+", text.lower())
+            if len(word) >= 3 and word not in FILLER_WORDS
+        }
+    
+    first_stems, second_stems = stems(first), stems(second)
+    if not first_stems or not second_stems:
+        return 0.0
+    return len(first_stems & second_stems) / min(len(first_stems), len(second_stems))
+
+
+# Global classifier instance
+intent_classifier = IntentClassifier()
@@ -0,0 +1,222 @@
+"""Background job queue and worker pool for agent runs."""
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from app.config import settings
+from app.models.domain import Subtask, EventBlock, Job, JobStatus, JobPriority
+from app.models.events import ServerEvent, EventType, JobStatusPayload
+from app.services.orchestrator import orchestrator_service
+from app.services.event_bus import event_bus
+from app.util.errors import JobError
+from app.util.ids import generate_id
+from app.util.logging import log_info, log_warning
+from app.util.metrics import metrics_registry, SampleWindow
+
+
+# Lower runs first; interactive jobs always go ahead of batch jobs
+LANE_ORDER = {JobPriority.INTERACTIVE: 0, JobPriority.BATCH: 1}
+
+
+class JobService:
+    """Bounded worker pool running agent jobs off the request path.
+    
+    Jobs wait in a bounded priority queue with one lane per priority and
+    are picked up by a fixed number of workers. Workers start with the
+    app, or on first submit if the app lifespan has not started them.
+    """
+    
+    def __init__(self):
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: list[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._order = itertools.count()
+        self._enqueued_at: dict[str, float] = {}
+        self._depth = {lane: 0 for lane in JobPriority}
+        self.wait_times = SampleWindow()
+        self.run_times = SampleWindow()
+        self.submitted = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+        metrics_registry.register("jobs", self.stats)
+    
+    def start(self) -> None:
+        """Start the worker pool on the running event loop (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        
+        self._loop = loop
+        self._queue = asyncio.PriorityQueue(maxsize=max(settings.job_queue_max_size, 1))
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(max(settings.job_workers, 1))
+        ]
+        self._depth = {lane: 0 for lane in JobPriority}
+        log_info(f"Started {len(self._workers)} job workers")
+    
+    async def shutdown(self) -> None:
+        """Stop the workers; queued jobs are abandoned."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
+        log_info("Stopped job workers")
+    
+    async def submit(
+        self,
+        user_id: str,
+        subtasks: list[Subtask],
+        trace_id: str,
+        priority: JobPriority = JobPriority.INTERACTIVE,
+        stream: bool = False
+    ) -> Job:
+        """Queue an agent run.
+        
+        Args:
+            user_id: User ID
+            subtasks: Subtasks to execute
+            trace_id: Request trace ID
+            priority: Worker pool lane
+            stream: Publish the timeline as each agent finishes
+        
+        Returns:
+            Job: The queued job
+        
+        Raises:
+            JobError: If the queue is full
+        """
+        self.start()
+        if self._queue.full():
+            self.rejected += 1
+            log_warning("Job queue full, rejecting run", trace_id=trace_id)
+            raise JobError("Job queue is full, try again later", trace_id)
+        
+        job = Job(
+            id=generate_id("job_"),
+            user_id=user_id,
+            trace_id=trace_id,
+            subtasks=subtasks,
+            priority=priority,
+            stream=stream,
+            created_at=datetime.utcnow().isoformat()
+        )
+        self._remember(job)
+        self._enqueued_at[job.id] = time.monotonic()
+        self._queue.put_nowait((LANE_ORDER[priority], next(self._order), job.id))
+        self._depth[priority] += 1
+        self.submitted += 1
+        
+        log_info(f"Queued job {job.id} ({priority.value})", trace_id=trace_id)
+        await self._emit_status(job)
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by ID, if still known."""
+        return self._jobs.get(job_id)
+    
+    def stats(self) -> dict:
+        """Return queue and timing stats for the metrics endpoint."""
+        return {
+            "workers": len(self._workers),
+            "queue_depth": {lane.value: depth for lane, depth in self._depth.items()},
+            "running": sum(1 for job in self._jobs.values() if job.status == JobStatus.RUNNING),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "wait_seconds": self.wait_times.summary(),
+            "run_seconds": self.run_times.summary()
+        }
+    
+    async def _worker(self) -> None:
+        """Run queued jobs one at a time, highest priority first."""
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self._run(self._jobs[job_id])
+            finally:
+                self._queue.task_done()
+    
+    async def _run(self, job: Job) -> None:
+        """Execute one job and record its outcome."""
+        self._depth[job.priority] -= 1
+        self.wait_times.record(time.monotonic() - self._enqueued_at.pop(job.id))
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.utcnow().isoformat()
+        await self._emit_status(job)
+        
+        started = time.monotonic()
+        try:
+            timeline = await self._execute(job)
+            await orchestrator_service.publish_result(
+                job.user_id,
+                timeline,
+                job.trace_id,
+                include_timeline=not job.stream
+            )
+            job.timeline = timeline
+            job.status = JobStatus.SUCCEEDED
+            self.succeeded += 1
+        except Exception as e:
+            log_warning(f"Job {job.id} failed: {e}", trace_id=job.trace_id)
+            job.error = str(e)
+            job.status = JobStatus.FAILED
+            self.failed += 1
+        finally:
+            self.run_times.record(time.monotonic() - started)
+            job.finished_at = datetime.utcnow().isoformat()
+        
+        await self._emit_status(job)
+    
+    async def _execute(self, job: Job) -> list[EventBlock]:
+        """Run the job's subtasks, streaming updates if requested."""
+        if not job.stream:
+            return await orchestrator_service.execute_subtasks(
+                job.user_id,
+                job.subtasks,
+                job.trace_id
+            )
+        
+        async for update in orchestrator_service.stream_subtasks(
+            job.user_id,
+            job.subtasks,
+            job.trace_id
+        ):
+            final_update = update
+        return [EventBlock.model_validate(block) for block in final_update.blocks]
+    
+    def _remember(self, job: Job) -> None:
+        """Track a job, forgetting the oldest finished ones beyond the history size."""
+        self._jobs[job.id] = job
+        excess = len(self._jobs) - settings.job_history_size
+        if excess <= 0:
+            return
+        
+        finished = [
+            job_id for job_id, known in self._jobs.items()
+            if known.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+        ]
+        for job_id in finished[:excess]:
+            del self._jobs[job_id]
+    
+    async def _emit_status(self, job: Job) -> None:
+        """Emit a job status event to the event bus."""
+        await event_bus.publish(ServerEvent(
+            type=EventType.JOB_STATUS,
+            payload=JobStatusPayload(
+                job_id=job.id,
+                status=job.status.value,
+                error=job.error
+            ).model_dump(),
+            trace_id=job.trace_id,
+            user_id=job.user_id
+        ))
+
+
+# Global job service instance
+job_service = JobService()
@@ -1,67 +1,134 @@
 """Orchestrator service for coordinating agents."""
+import asyncio
+from typing import AsyncIterator, Optional
+from app.config import settings
 from app.adapters.fetch_client import fetch_client
 from app.adapters.letta_client import letta_client
-from app.models.domain import Subtask, EventBlock
+from app.models.domain import Subtask, AgentType, EventBlock, MemoryPrefs, TimelineDelta, FailurePolicy
+from app.services.intent import description_overlap
+from app.services.planner import planner_service
 from app.services.timeline import timeline_service
 from app.services.event_bus import event_bus
-from app.models.events import ServerEvent, EventType, AgentLogPayload
-from app.util.logging import log_info
+from app.models.events import ServerEvent, EventType, AgentLogPayload, TimelineUpdatePayload
+from app.util.logging import log_info, log_warning
 from app.util.errors import OrchestratorError
+from app.util.metrics import metrics_registry
+from app.util.singleflight import SingleFlight, request_key
 
 
 class OrchestratorService:
     """Service for coordinating multi-agent execution."""
     
+    def __init__(self):
+        # Identical concurrent runs share one set of agent calls
+        self._flights = SingleFlight()
+        metrics_registry.register("orchestrator_singleflight", self._flights.stats)
+        # Trace IDs of every caller joined to a run in flight, by run key
+        self._joined: dict[str, set[str]] = {}
+        
+        # Agents started from a guessed plan, and how many of them were kept
+        self.speculated = 0
+        self.speculation_kept = 0
+        self.speculation_redone = 0
+        metrics_registry.register("speculation", self.speculation_stats)
+    
     async def execute_subtasks(
         self,
         user_id: str,
         subtasks: list[Subtask],
-        trace_id: str
+        trace_id: str,
+        failure_policy: Optional[FailurePolicy] = None
     ) -> list[EventBlock]:
         """Execute subtasks across agents and merge results.
         
+        Agents run concurrently, at most ``AGENT_MAX_CONCURRENCY`` at a
+        time, each bounded by ``AGENT_TIMEOUT_SECONDS``. Concurrent calls
+        for the same user and subtasks share one run, whose AGENT_LOG
+        events are published under the trace ID of every caller joined
+        to it so far.
+        
         Args:
             user_id: User ID
             subtasks: List of subtasks to execute
             trace_id: Request trace ID
-            
+            failure_policy: What to do when an agent fails or times out
+                (defaults to ``AGENT_FAILURE_POLICY``)
+        
         Returns:
             list[EventBlock]: Merged timeline
-            
+        
         Raises:
             OrchestratorError: If orchestration fails
         """
+        policy = failure_policy or FailurePolicy(settings.agent_failure_policy)
+        key = request_key(
+            "run",
+            user_id,
+            [(subtask.agent.value, " ".join(subtask.description.split())) for subtask in subtasks],
+            policy.value
+        )
+        
+        traces = self._joined.setdefault(key, set())
+        traces.add(trace_id)
+        
+        async def run() -> list[EventBlock]:
+            try:
+                return await self._execute_subtasks(user_id, subtasks, trace_id, policy, traces)
+            finally:
+                self._joined.pop(key, None)
+        
+        try:
+            timeline, shared = await self._flights.do(key, run)
+        except OrchestratorError as e:
+            # Report a shared failure under this caller's trace
+            if e.trace_id != trace_id:
+                raise OrchestratorError(e.message, trace_id) from e
+            raise
+        
+        if shared:
+            log_info("Coalesced with an identical run in flight", trace_id=trace_id)
+        
+        return [block.model_copy() for block in timeline]
+    
+    async def _execute_subtasks(
+        self,
+        user_id: str,
+        subtasks: list[Subtask],
+        trace_id: str,
+        policy: FailurePolicy,
+        traces: Optional[set[str]] = None
+    ) -> list[EventBlock]:
+        """Run agents for subtasks and merge their blocks.
+        
+        Agent logs go out under every trace in ``traces`` if given.
+        """
         log_info(f"Orchestrating {len(subtasks)} subtasks", trace_id=trace_id)
         
         try:
             # Get user memory
             memory = await letta_client.get_prefs(user_id)
             
-            # Collect all proposed blocks from agents
-            all_blocks: list[EventBlock] = []
-            
-            for subtask in subtasks:
-                # Log agent start
-                await self._emit_agent_log(
-                    subtask.agent.value,
-                    f"Starting: {subtask.description[:80]}...",
-                    trace_id
-                )
-                
-                # Get agent's proposed blocks
-                blocks = await fetch_client.propose_plan(subtask, memory)
-                
-                all_blocks.extend(blocks)
-                
-                # Log agent completion
-                await self._emit_agent_log(
-                    subtask.agent.value,
-                    f"Proposed {len(blocks)} blocks",
-                    trace_id
+            # Run agents concurrently, bounded by the semaphore
+            semaphore = asyncio.Semaphore(max(settings.agent_max_concurrency, 1))
+            tasks = [
+                asyncio.create_task(
+                    self._run_agent(subtask, memory, trace_id, semaphore, policy, traces)
                 )
+                for subtask in subtasks
+            ]
+            try:
+                results = await asyncio.gather(*tasks)
+            except BaseException:
+                # Fail fast: don't leave other agents running
+                for task in tasks:
+                    task.cancel()
+                raise
+            
+            # Collect all proposed blocks in subtask order for a stable merge
+            all_blocks: list[EventBlock] = [block for blocks in results for block in blocks]
             
-            # Merge timeline with conflict resolution
-            merged_timeline = timeline_service.merge_blocks(all_blocks, memory)
+            # Merge timeline with conflict resolution, keeping it for re-plans
+            merged_timeline = timeline_service.rebuild_timeline(user_id, all_blocks, memory)
             
             log_info(
                 f"Orchestration complete: {len(all_blocks)} raw → "
@@ -70,28 +137,488 @@ class OrchestratorService:
             )
             
             return merged_timeline
+        
+        except Exception as e:
+            log_info(f"Orchestration error: {e}", trace_id=trace_id)
+            raise OrchestratorError(f"Failed to execute subtasks: {e}", trace_id)
+    
+    async def plan_and_execute(
+        self,
+        query: str,
+        user_id: str,
+        trace_id: str,
+        failure_policy: Optional[FailurePolicy] = None
+    ) -> tuple[list[Subtask], str, list[EventBlock]]:
+        """Plan a query and run its agents, overlapping the two.
+        
+        Agents start right away on the planner's local guess while the
+        real plan is computed. Once it arrives, each planned subtask keeps
+        the guessed agent of the same type whose description is closest,
+        if at least ``PLANNER_SPECULATION_MATCH`` of the words overlap (the
+        planner rarely repeats the template's wording); kept agents plan
+        from the guessed description. Guesses left over are cancelled and
+        subtasks without one are started.
+        
+        Args:
+            query: Natural language query
+            user_id: User ID
+            trace_id: Request trace ID
+            failure_policy: What to do when an agent fails or times out
+                (defaults to ``AGENT_FAILURE_POLICY``)
+        
+        Returns:
+            tuple: (subtasks, rationale, merged timeline)
+        
+        Raises:
+            PlannerError: If planning fails
+            OrchestratorError: If orchestration fails
+        """
+        policy = failure_policy or FailurePolicy(settings.agent_failure_policy)
+        memory = await letta_client.get_prefs(user_id)
+        semaphore = asyncio.Semaphore(max(settings.agent_max_concurrency, 1))
+        
+        def start(subtask: Subtask) -> asyncio.Task:
+            return asyncio.create_task(self._run_agent(subtask, memory, trace_id, semaphore, policy))
+        
+        guessed = planner_service.speculate(query) or []
+        speculative: dict[AgentType, list[tuple[Subtask, asyncio.Task]]] = {}
+        for subtask in guessed:
+            speculative.setdefault(subtask.agent, []).append((subtask, start(subtask)))
+        if guessed:
+            log_info(f"Speculatively started {len(guessed)} agents", trace_id=trace_id)
+        
+        try:
+            subtasks, rationale = await planner_service.parse_query(query, user_id)
+        except BaseException:
+            await self._cancel([task for guesses in speculative.values() for _, task in guesses])
+            raise
+        
+        tasks = []
+        for subtask in subtasks:
+            task = self._claim_guess(speculative.get(subtask.agent), subtask)
+            tasks.append(task or start(subtask))
+        
+        discarded = [task for guesses in speculative.values() for _, task in guesses]
+        await self._cancel(discarded)
+        kept = len(guessed) - len(discarded)
+        self.speculated += len(guessed)
+        self.speculation_kept += kept
+        self.speculation_redone += len(subtasks) - kept
+        if guessed:
+            log_info(
+                f"Speculation kept {kept}/{len(guessed)} agents, "
+                f"started {len(subtasks) - kept} for the final plan",
+                trace_id=trace_id
+            )
+        
+        try:
+            try:
+                results = await asyncio.gather(*tasks)
+            except BaseException:
+                await self._cancel(tasks)
+                raise
             
+            all_blocks = [block for blocks in results for block in blocks]
+            timeline = timeline_service.rebuild_timeline(user_id, all_blocks, memory)
+        
         except Exception as e:
             log_info(f"Orchestration error: {e}", trace_id=trace_id)
             raise OrchestratorError(f"Failed to execute subtasks: {e}", trace_id)
+        
+        return subtasks, rationale, timeline
     
-    async def _emit_agent_log(
+    def speculation_stats(self) -> dict:
+        """Return speculative execution counters for the metrics endpoint."""
+        return {
+            "speculated": self.speculated,
+            "kept": self.speculation_kept,
+            "redone": self.speculation_redone,
+            "keep_rate": self.speculation_kept / self.speculated if self.speculated else 0.0
+        }
+    
+    async def stream_subtasks(
         self,
-        agent: str,
-        message: str,
+        user_id: str,
+        subtasks: list[Subtask],
+        trace_id: str,
+        failure_policy: Optional[FailurePolicy] = None
+    ) -> AsyncIterator[TimelineUpdatePayload]:
+        """Execute subtasks, merging and publishing each agent's blocks as it returns.
+        
+        Agents run as in ``execute_subtasks``. Whenever one finishes, its
+        blocks are merged incrementally into a timeline owned by this run
+        and an incremental TIMELINE_UPDATE with the next ``seq`` is
+        published and yielded. A final consolidated update carries the
+        whole timeline, which then becomes the user's stored timeline.
+        Concurrent runs for one user therefore never mix their blocks;
+        the last to finish is kept.
+        
+        Args:
+            user_id: User ID
+            subtasks: List of subtasks to execute
+            trace_id: Request trace ID
+            failure_policy: What to do when an agent fails or times out
+                (defaults to ``AGENT_FAILURE_POLICY``)
+        
+        Yields:
+            TimelineUpdatePayload: Incremental updates, then the final timeline
+        
+        Raises:
+            OrchestratorError: If orchestration fails
+        """
+        log_info(f"Streaming {len(subtasks)} subtasks", trace_id=trace_id)
+        policy = failure_policy or FailurePolicy(settings.agent_failure_policy)
+        tasks: dict[asyncio.Task, int] = {}
+        
+        try:
+            memory = await letta_client.get_prefs(user_id)
+            run_timeline = timeline_service.new_timeline(user_id, memory)
+            
+            semaphore = asyncio.Semaphore(max(settings.agent_max_concurrency, 1))
+            for index, subtask in enumerate(subtasks):
+                task = asyncio.create_task(
+                    self._run_agent(subtask, memory, trace_id, semaphore, policy)
+                )
+                tasks[task] = index
+            
+            proposals: dict[int, list[EventBlock]] = {}
+            pending = set(tasks)
+            seq = 0
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=tasks.get):
+                    index = tasks[task]
+                    proposals[index] = task.result()
+                    
+                    # An agent's blocks from all of its finished subtasks, in subtask order
+                    agent = subtasks[index].agent.value
+                    agent_blocks = [
+                        block
+                        for i in sorted(proposals) if subtasks[i].agent.value == agent
+                        for block in proposals[i]
+                    ]
+                    delta = timeline_service.update_agent_blocks(
+                        user_id,
+                        agent,
+                        agent_blocks,
+                        memory,
+                        timeline=run_timeline
+                    )
+                    
+                    seq += 1
+                    payload = self._delta_payload(delta, seq)
+                    await self._emit_timeline_update(payload, trace_id)
+                    yield payload
+            
+            timeline_service.commit_timeline(run_timeline)
+            timeline = run_timeline.blocks()
+            seq += 1
+            payload = TimelineUpdatePayload(
+                user_id=user_id,
+                blocks=[block.model_dump() for block in timeline],
+                seq=seq,
+                final=True
+            )
+            await self._emit_timeline_update(payload, trace_id)
+            
+            log_info(
+                f"Streaming complete: {len(timeline)} merged blocks in {seq} updates",
+                trace_id=trace_id
+            )
+            yield payload
+        
+        except Exception as e:
+            log_info(f"Orchestration error: {e}", trace_id=trace_id)
+            raise OrchestratorError(f"Failed to execute subtasks: {e}", trace_id)
+        
+        finally:
+            # Stop agents still running if the run failed or the consumer left
+            for task in tasks:
+                task.cancel()
+    
+    async def replan_agent(
+        self,
+        user_id: str,
+        subtask: Subtask,
+        trace_id: str
+    ) -> TimelineDelta:
+        """Re-run one agent and re-merge only the blocks its proposals affect.
+        
+        The agent's previous proposals are replaced in the user's stored
+        timeline and only changed blocks are published.
+        
+        Args:
+            user_id: User ID
+            subtask: Subtask for the agent to re-propose
+            trace_id: Request trace ID
+        
+        Returns:
+            TimelineDelta: Blocks added or moved and IDs removed
+        
+        Raises:
+            OrchestratorError: If the re-plan fails
+        """
+        log_info(f"Re-planning {subtask.agent.value}", trace_id=trace_id)
+        
+        # Dropping a failed agent here would wipe its current blocks
+        policy = FailurePolicy(settings.agent_failure_policy)
+        if policy == FailurePolicy.DROP:
+            policy = FailurePolicy.FAIL
+        
+        try:
+            memory = await letta_client.get_prefs(user_id)
+            
+            blocks = await self._run_agent(
+                subtask,
+                memory,
+                trace_id,
+                asyncio.Semaphore(1),
+                policy
+            )
+            
+            delta = timeline_service.update_agent_blocks(
+                user_id,
+                subtask.agent.value,
+                blocks,
+                memory
+            )
+            await self._emit_timeline_delta(delta, trace_id)
+            
+            return delta
+        
+        except Exception as e:
+            log_info(f"Re-plan error: {e}", trace_id=trace_id)
+            raise OrchestratorError(f"Failed to re-plan subtask: {e}", trace_id)
+    
+    async def apply_prefs(
+        self,
+        prefs: MemoryPrefs,
         trace_id: str
+    ) -> Optional[TimelineDelta]:
+        """Re-merge a user's stored timeline after a preferences change.
+        
+        Args:
+            prefs: Updated user preferences
+            trace_id: Request trace ID
+        
+        Returns:
+            Optional[TimelineDelta]: Changes, or None if the user has no timeline
+        """
+        delta = timeline_service.update_memory(prefs)
+        if delta is not None:
+            await self._emit_timeline_delta(delta, trace_id)
+        return delta
+    
+    async def publish_result(
+        self,
+        user_id: str,
+        timeline: list[EventBlock],
+        trace_id: str,
+        include_timeline: bool = True
     ) -> None:
-        """Emit an agent log event to the event bus."""
+        """Emit the outcome of a finished run.
+        
+        Args:
+            user_id: User ID
+            timeline: Merged timeline
+            trace_id: Request trace ID
+            include_timeline: Also emit the full TIMELINE_UPDATE (streamed
+                runs have already sent their final update)
+        """
+        if include_timeline:
+            await self._emit_timeline_update(
+                TimelineUpdatePayload(
+                    user_id=user_id,
+                    blocks=[block.model_dump() for block in timeline]
+                ),
+                trace_id
+            )
+        
+        await event_bus.publish(ServerEvent(
+            type=EventType.AGENTS_COMPLETE,
+            payload={"block_count": len(timeline)},
+            trace_id=trace_id,
+            user_id=user_id
+        ))
+    
+    async def _emit_timeline_delta(
+        self,
+        delta: TimelineDelta,
+        trace_id: str
+    ) -> None:
+        """Emit only the changed part of a timeline to the event bus."""
+        if not delta.changed and not delta.removed_ids:
+            return
+        
+        await self._emit_timeline_update(self._delta_payload(delta), trace_id)
+    
+    def _delta_payload(
+        self,
+        delta: TimelineDelta,
+        seq: Optional[int] = None
+    ) -> TimelineUpdatePayload:
+        """Build an incremental TIMELINE_UPDATE payload from a delta."""
+        return TimelineUpdatePayload(
+            user_id=delta.user_id,
+            blocks=[block.model_dump() for block in delta.changed],
+            removed_ids=delta.removed_ids,
+            incremental=True,
+            seq=seq
+        )
+    
+    async def _emit_timeline_update(
+        self,
+        payload: TimelineUpdatePayload,
+        trace_id: str
+    ) -> None:
+        """Emit a timeline update event to the event bus."""
         event = ServerEvent(
-            type=EventType.AGENT_LOG,
-            payload=AgentLogPayload(
-                agent=agent,
-                message=message,
-                level="INFO"
-            ).model_dump(),
-            trace_id=trace_id
+            type=EventType.TIMELINE_UPDATE,
+            payload=payload.model_dump(),
+            trace_id=trace_id,
+            user_id=payload.user_id
         )
         await event_bus.publish(event)
+    
+    async def _run_agent(
+        self,
+        subtask: Subtask,
+        memory: MemoryPrefs,
+        trace_id: str,
+        semaphore: asyncio.Semaphore,
+        policy: FailurePolicy,
+        traces: Optional[set[str]] = None
+    ) -> list[EventBlock]:
+        """Run one agent with a timeout, applying the failure policy.
+        
+        Args:
+            subtask: Subtask for the agent
+            memory: User preferences
+            trace_id: Request trace ID
+            semaphore: Concurrency limit shared by the run
+            policy: What to do when the agent fails or times out
+            traces: Traces to publish agent logs under (defaults to
+                ``trace_id``)
+        
+        Returns:
+            list[EventBlock]: Proposed blocks (empty if the agent was dropped)
+        
+        Raises:
+            OrchestratorError: If the agent failed under the ``fail`` policy
+                or ran out of retries under the ``retry`` policy
+        """
+        agent = subtask.agent.value
+        attempts = 1 + max(settings.agent_max_retries, 0) if policy == FailurePolicy.RETRY else 1
+        
+        async with semaphore:
+            # Log agent start
+            await self._emit_agent_log(
+                agent,
+                f"Starting: {subtask.description[:80]}...",
+                trace_id,
+                user_id=memory.user_id,
+                traces=traces
+            )
+            
+            for attempt in range(1, attempts + 1):
+                try:
+                    # Get agent's proposed blocks
+                    blocks = await asyncio.wait_for(
+                        fetch_client.propose_plan(subtask, memory),
+                        timeout=settings.agent_timeout_seconds
+                    )
+                except Exception as e:
+                    reason = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+                    log_warning(f"Agent {agent} attempt {attempt} failed: {reason}", trace_id=trace_id)
+                    
+                    if attempt < attempts:
+                        await self._emit_agent_log(
+                            agent,
+                            f"Attempt {attempt} failed ({reason}), retrying",
+                            trace_id,
+                            level="WARNING",
+                            user_id=memory.user_id,
+                            traces=traces
+                        )
+                        continue
+                    
+                    if policy == FailurePolicy.DROP:
+                        await self._emit_agent_log(
+                            agent,
+                            f"Failed ({reason}), dropping its blocks",
+                            trace_id,
+                            level="ERROR",
+                            user_id=memory.user_id,
+                            traces=traces
+                        )
+                        return []
+                    
+                    await self._emit_agent_log(
+                        agent,
+                        f"Failed ({reason})",
+                        trace_id,
+                        level="ERROR",
+                        user_id=memory.user_id,
+                        traces=traces
+                    )
+                    raise OrchestratorError(f"Agent {agent} failed: {reason}", trace_id)
+                
+                # Log agent completion
+                await self._emit_agent_log(
+                    agent,
+                    f"Proposed {len(blocks)} blocks",
+                    trace_id,
+                    user_id=memory.user_id,
+                    traces=traces
+                )
+                return blocks
+    
+    def _claim_guess(
+        self,
+        guesses: Optional[list[tuple[Subtask, asyncio.Task]]],
+        subtask: Subtask
+    ) -> Optional[asyncio.Task]:
+        """Take the started guess closest to a planned subtask, if close enough."""
+        if not guesses:
+            return None
+        scores = [description_overlap(guess.description, subtask.description) for guess, _ in guesses]
+        best = max(range(len(guesses)), key=scores.__getitem__)
+        if scores[best] < settings.planner_speculation_match:
+            return None
+        return guesses.pop(best)[1]
+    
+    async def _cancel(self, tasks: list[asyncio.Task]) -> None:
+        """Cancel agent tasks and wait for them, discarding their outcome."""
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _emit_agent_log(
+        self,
+        agent: str,
+        message: str,
+        trace_id: str,
+        level: str = "INFO",
+        user_id: Optional[str] = None,
+        traces: Optional[set[str]] = None
+    ) -> None:
+        """Emit an agent log event to the event bus.
+        
+        A coalesced run's events go out under each joined caller's trace.
+        """
+        payload = AgentLogPayload(
+            agent=agent,
+            message=message,
+            level=level
+        ).model_dump()
+        for trace in list(traces or (trace_id,)):
+            event = ServerEvent(
+                type=EventType.AGENT_LOG,
+                payload=payload,
+                trace_id=trace,
+                user_id=user_id
+            )
+            await event_bus.publish(event)
 
 
 # Global orchestrator instance
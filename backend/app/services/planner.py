@@ -1,8 +1,19 @@
 """Planning service using Claude to parse user intent."""
-from app.adapters.anthropic_client import anthropic_client
+import json
+from contextlib import aclosing
+from typing import AsyncIterator, Optional
+from app.adapters.anthropic_client import anthropic_client, MockResponse, MockText
+from app.adapters.letta_client import letta_client
+from app.config import settings
 from app.models.domain import Subtask
+from app.services.intent import Intent, intent_classifier
+from app.util.cache import TTLCache, SqliteStore
+from app.util.ids import generate_id
 from app.util.logging import log_info
 from app.util.errors import PlannerError
+from app.util.metrics import metrics_registry, SampleWindow
+from app.util.json_stream import StreamingObjectParser
+from app.util.singleflight import SingleFlight, request_key
 
 
 SYSTEM_PROMPT = """You are a planner that converts a user's task into exactly three subtasks, each mapped to one of: 'study_agent', 'meal_agent', 'calendar_agent'. Return strict JSON only with keys: 'rationale' and 'subtasks'. 'subtasks' must contain exactly three items. Keep descriptions imperative and specific. Respect quiet hours from memory if provided.
@@ -23,30 +34,292 @@ Rules:
 - Prefer 3×90m study blocks/day with 15m breaks, adjust to memory sleep window.
 - If memory missing, use defaults: sleep 23:00–07:00; study_block_minutes 90; break_minutes 15."""
 
+# Preferences the planner prompt refers to; other fields do not change plans
+PLAN_PREFS = {"sleep_start", "sleep_end", "study_block_minutes", "break_minutes"}
+
 
 class PlannerService:
     """Service for parsing user queries into actionable subtasks."""
     
+    def __init__(self):
+        # Identical concurrent queries share one LLM call
+        self._flights = SingleFlight()
+        metrics_registry.register("planner_singleflight", self._flights.stats)
+        
+        # Plans by normalized query and planning prefs, across users
+        self._cache = TTLCache(
+            max_entries=settings.plan_cache_max_entries,
+            ttl_seconds=settings.plan_cache_ttl_seconds,
+            max_bytes=settings.plan_cache_max_bytes
+        )
+        self._store: Optional[SqliteStore] = None
+        if settings.plan_cache_path:
+            self._store = SqliteStore(settings.plan_cache_path)
+            self._warm_cache()
+        self.llm_calls = 0
+        metrics_registry.register("plan_cache", self.cache_stats)
+        
+        # Common query shapes are answered locally without the LLM
+        self.fast_path_hits = 0
+        self.fast_path_misses = 0
+        self.fast_path_confidence = SampleWindow()
+        metrics_registry.register("planner_fast_path", self.fast_path_stats)
+    
     async def parse_query(self, query: str, user_id: str) -> tuple[list[Subtask], str]:
         """Parse a user query into subtasks.
         
+        Queries the intent classifier is confident about are answered
+        locally from a fixed template. Other plans are cached by query
+        (ignoring case and whitespace) and the user's planning
+        preferences; a cached plan is returned with fresh subtask IDs.
+        Concurrent misses for the same key share a single planning call.
+        
         Args:
             query: Natural language query
             user_id: User ID for context
-            
+        
         Returns:
             tuple: (list of Subtask, rationale string)
-            
+        
         Raises:
             PlannerError: If parsing fails
         """
+        fast = self._fast_path(query, user_id)
+        if fast is not None:
+            return fast
+        
+        context = await self._memory_context(user_id)
+        key = self._plan_key(query, context)
+        cached = self._cached_plan(key, user_id)
+        if cached is not None:
+            return cached
+        
+        (subtasks, rationale), shared = await self._flights.do(
+            key,
+            lambda: self._plan_and_cache(key, query, user_id, context)
+        )
+        
+        if shared:
+            log_info(f"Coalesced plan request for user {user_id} with one in flight")
+        
+        # Callers must not share mutable results
+        return [subtask.model_copy() for subtask in subtasks], rationale
+    
+    async def stream_query(
+        self,
+        query: str,
+        user_id: str
+    ) -> AsyncIterator[tuple[Subtask, Optional[str]]]:
+        """Parse a user query, yielding each subtask as soon as it is complete.
+        
+        The planner response is streamed and parsed incrementally. The last
+        subtask is held back until the whole plan is validated, so it always
+        carries the rationale. Cached plans are yielded at once; streamed
+        plans are not coalesced with concurrent requests.
+        
+        Args:
+            query: Natural language query
+            user_id: User ID for context
+        
+        Yields:
+            tuple: (Subtask, rationale if already known)
+        
+        Raises:
+            PlannerError: If the plan is invalid or the stream fails
+        """
+        local = self._fast_path(query, user_id)
+        if local is None:
+            context = await self._memory_context(user_id)
+            key = self._plan_key(query, context)
+            local = self._cached_plan(key, user_id)
+        if local is not None:
+            subtasks, rationale = local
+            for subtask in subtasks:
+                yield subtask, rationale
+            return
+        
+        self.llm_calls += 1
+        log_info(f"Streaming plan for user {user_id}: {query[:50]}...")
+        parser = StreamingObjectParser("subtasks")
+        subtasks: list[Subtask] = []
+        fallback = False
+        try:
+            stream = anthropic_client.stream_text(
+                prompt=query,
+                system_prompt=SYSTEM_PROMPT,
+                context=context,
+                cache=settings.planner_prompt_cache
+            )
+            async with aclosing(stream):
+                async for chunk in stream:
+                    fallback = fallback or isinstance(chunk, MockText)
+                    for task in parser.feed(chunk):
+                        if len(subtasks) == 3:
+                            raise PlannerError("Expected 3 subtasks, got more")
+                        subtasks.append(Subtask(**task))
+                        if len(subtasks) < 3:
+                            yield subtasks[-1].model_copy(), parser.fields.get("rationale")
+                    if parser.done:
+                        break
+            
+            if not parser.done or "rationale" not in parser.fields:
+                raise PlannerError("Invalid response structure from planner")
+            if len(subtasks) != 3:
+                raise PlannerError(f"Expected 3 subtasks, got {len(subtasks)}")
+        
+        except PlannerError:
+            raise
+        except Exception as e:
+            log_info(f"Planning error: {e}")
+            raise PlannerError(f"Failed to parse query: {e}")
+        
+        rationale = parser.fields["rationale"]
+        if fallback:
+            log_info("Not caching mock plan used while Claude is unavailable")
+        else:
+            self._store_plan(key, subtasks, rationale)
+        log_info(f"Plan streamed with {len(subtasks)} subtasks")
+        yield subtasks[-1].model_copy(), rationale
+    
+    def cache_stats(self) -> dict:
+        """Return plan cache counters for the metrics endpoint."""
+        stats = self._cache.stats()
+        stats["llm_calls"] = self.llm_calls
+        stats["llm_calls_avoided"] = self._cache.hits + self._flights.coalesced
+        stats["persistent"] = self._store is not None
+        return stats
+    
+    def speculate(self, query: str) -> Optional[list[Subtask]]:
+        """Guess the plan locally so agents can start before the real plan.
+        
+        Uses the fast-path templates at the lower speculation threshold.
+        The guess is not counted as a fast-path decision.
+        
+        Returns:
+            Optional[list[Subtask]]: Speculative subtasks, or None
+        """
+        match = intent_classifier.classify(query)
+        if match.intent is None or match.confidence < settings.planner_speculation_threshold:
+            return None
+        
+        return self._template_subtasks(match.intent)
+    
+    def fast_path_stats(self) -> dict:
+        """Return fast-path decision counters for the metrics endpoint."""
+        decisions = self.fast_path_hits + self.fast_path_misses
+        return {
+            "threshold": settings.planner_fast_path_threshold,
+            "hits": self.fast_path_hits,
+            "misses": self.fast_path_misses,
+            "hit_ratio": self.fast_path_hits / decisions if decisions else 0.0,
+            "confidence": self.fast_path_confidence.summary()
+        }
+    
+    def _fast_path(self, query: str, user_id: str) -> Optional[tuple[list[Subtask], str]]:
+        """Plan locally if the intent classifier is confident enough, else None."""
+        match = intent_classifier.classify(query)
+        threshold = settings.planner_fast_path_threshold
+        intent_name = match.intent.name if match.intent else "none"
+        self.fast_path_confidence.record(match.confidence)
+        
+        if match.confidence < threshold:
+            self.fast_path_misses += 1
+            log_info(
+                f"Fast path declined for user {user_id}: intent {intent_name} "
+                f"confidence {match.confidence:.2f} < {threshold:.2f}"
+            )
+            return None
+        
+        self.fast_path_hits += 1
+        log_info(
+            f"Fast path planned for user {user_id}: intent {intent_name} "
+            f"confidence {match.confidence:.2f} >= {threshold:.2f}"
+        )
+        return self._template_subtasks(match.intent), match.intent.rationale
+    
+    def _template_subtasks(self, intent: Intent) -> list[Subtask]:
+        """Instantiate an intent's fixed plan with fresh IDs."""
+        return [
+            Subtask(id=generate_id(), agent=agent, description=description)
+            for agent, description in intent.descriptions.items()
+        ]
+    
+    async def _memory_context(self, user_id: str) -> str:
+        """Serialize the user's planning preferences for the prompt."""
+        prefs = await letta_client.get_prefs(user_id)
+        return "User memory:\n" + json.dumps(prefs.model_dump(include=PLAN_PREFS), sort_keys=True)
+    
+    def _plan_key(self, query: str, context: str) -> str:
+        """Cache key: normalized query, planning prefs and the prompt version."""
+        return request_key("plan", SYSTEM_PROMPT, " ".join(query.lower().split()), context)
+    
+    def _cached_plan(self, key: str, user_id: str) -> Optional[tuple[list[Subtask], str]]:
+        """Return a cached plan with fresh subtask IDs, or None."""
+        cached = self._cache.get(key)
+        if cached is None:
+            return None
+        
+        log_info(f"Plan cache hit for user {user_id}")
+        subtasks = [Subtask(**{**task, "id": generate_id()}) for task in cached["subtasks"]]
+        return subtasks, cached["rationale"]
+    
+    async def _plan_and_cache(
+        self,
+        key: str,
+        query: str,
+        user_id: str,
+        context: str
+    ) -> tuple[list[Subtask], str]:
+        """Plan a cache miss and store the result, unless it is the mock fallback."""
+        self.llm_calls += 1
+        subtasks, rationale, fallback = await self._parse_query(query, user_id, context)
+        if fallback:
+            log_info("Not caching mock plan used while Claude is unavailable")
+        else:
+            self._store_plan(key, subtasks, rationale)
+        return subtasks, rationale
+    
+    def _store_plan(self, key: str, subtasks: list[Subtask], rationale: str) -> None:
+        """Cache a validated plan, writing through to the persistent store."""
+        plan = {
+            "subtasks": [subtask.model_dump(mode="json") for subtask in subtasks],
+            "rationale": rationale
+        }
+        self._cache.set(key, plan, size=len(json.dumps(plan)))
+        if self._store is not None:
+            self._store.put(key, plan, self._cache.ttl_seconds)
+    
+    def _warm_cache(self) -> None:
+        """Load unexpired plans from the persistent store."""
+        entries = self._store.load(self._cache.max_entries)
+        for key, plan, ttl in entries:
+            self._cache.set(key, plan, size=len(json.dumps(plan)), ttl_seconds=ttl)
+        log_info(f"Warmed plan cache with {len(entries)} plans from {settings.plan_cache_path}")
+    
+    async def _parse_query(
+        self,
+        query: str,
+        user_id: str,
+        context: str
+    ) -> tuple[list[Subtask], str, bool]:
+        """Call the planner model and validate its subtasks.
+        
+        The system prompt and memory context are sent as cacheable prompt
+        prefixes unless prompt caching is disabled.
+        
+        Returns:
+            tuple: (list of Subtask, rationale, whether the client fell
+                back to its mock response)
+        """
         log_info(f"Planning query for user {user_id}: {query[:50]}...")
         
         try:
             # Call Claude (or mock)
             result = await anthropic_client.complete_json(
                 prompt=query,
-                system_prompt=SYSTEM_PROMPT
+                system_prompt=SYSTEM_PROMPT,
+                context=context,
+                cache=settings.planner_prompt_cache
             )
             
             # Validate response
@@ -61,8 +334,8 @@ class PlannerService:
             rationale = result["rationale"]
             
             log_info(f"Plan created with {len(subtasks)} subtasks")
-            return subtasks, rationale
-            
+            return subtasks, rationale, isinstance(result, MockResponse)
+        
         except Exception as e:
             log_info(f"Planning error: {e}")
             raise PlannerError(f"Failed to parse query: {e}")
@@ -1,13 +1,27 @@
 """Timeline service for merging and managing event blocks."""
-from datetime import datetime, time
+from collections import OrderedDict
 from typing import Optional
-from app.models.domain import EventBlock, MemoryPrefs
-from app.util.logging import log_info
+from app.config import settings
+from app.models.domain import EventBlock, MemoryPrefs, TimelineDelta
+from app.models.compact import CompactBlock, to_compact, from_compact
+from app.services import timeline_batch
+from app.services.availability import AvailabilityIndex, daily_windows
+from app.services.timeline_state import UserTimeline
+from app.util.logging import log_info, log_warning
+
+
+# Work hours as seconds since midnight (08:00–22:00)
+WORK_START = 8 * 3600
+WORK_END = 22 * 3600
 
 
 class TimelineService:
     """Service for timeline management with conflict resolution."""
     
+    def __init__(self):
+        # Merged timeline per user, least recently used first
+        self._timelines: OrderedDict[str, UserTimeline] = OrderedDict()
+    
     def merge_blocks(
         self,
         blocks: list[EventBlock],
@@ -17,93 +31,310 @@ class TimelineService:
         
         Rules:
         1. Never schedule inside [sleep_start, sleep_end)
-        2. Resolve overlaps by shifting forward to next free slot
+        2. Resolve overlaps by shifting forward to next free slot,
+           checked against every block already placed
         3. Keep events within 08:00–22:00
         4. Sort by start time, then agent name
         
+        Blocks are placed whole inside the allowed windows of a day (work
+        hours minus sleep), moving to a later day if needed; blocks too
+        long for any window are skipped.
+        
+        Timestamps are parsed once into compact integer records on entry
+        and only moved blocks are formatted back to ISO strings on exit.
+        
         Args:
             blocks: Raw event blocks from agents
             memory: User preferences
-            
+        
         Returns:
             list[EventBlock]: Merged, conflict-free timeline
         """
         log_info(f"Merging {len(blocks)} blocks")
         
-        # Parse sleep window
+        records = [to_compact(block, order) for order, block in enumerate(blocks)]
+        merged = [from_compact(record) for record in self._merge_records(records, memory)]
+        
+        log_info(f"Merged timeline has {len(merged)} blocks")
+        return merged
+    
+    def merge_batch(
+        self,
+        blocks_by_user: dict[str, list[EventBlock]],
+        memories: dict[str, MemoryPrefs]
+    ) -> dict[str, list[EventBlock]]:
+        """Merge timelines for many users at once.
+        
+        Filtering, sorting and overlap resolution run as array operations
+        grouped by user when numpy is installed, falling back to one
+        ``merge_blocks`` call per user otherwise. Results are identical to
+        calling ``merge_blocks`` for each user.
+        
+        Args:
+            blocks_by_user: Raw event blocks keyed by user ID
+            memories: User preferences keyed by user ID (defaults if missing)
+        
+        Returns:
+            dict[str, list[EventBlock]]: Merged timeline per user
+        """
+        user_ids = list(blocks_by_user)
+        prefs = [memories.get(user_id) or MemoryPrefs(user_id=user_id) for user_id in user_ids]
+        total = sum(len(blocks) for blocks in blocks_by_user.values())
+        log_info(f"Batch merging {total} blocks for {len(user_ids)} users")
+        
+        if not timeline_batch.is_available():
+            log_warning("numpy not installed, batch merge running per user")
+            return {
+                user_id: self.merge_blocks(blocks_by_user[user_id], memory)
+                for user_id, memory in zip(user_ids, prefs)
+            }
+        
+        groups = [blocks_by_user[user_id] for user_id in user_ids]
+        sleep_windows = [
+            (self._parse_time(memory.sleep_start), self._parse_time(memory.sleep_end))
+            for memory in prefs
+        ]
+        longest = [self._new_board(memory).longest for memory in prefs]
+        merged, fallback = timeline_batch.merge_groups(
+            groups, sleep_windows, longest, WORK_START, WORK_END
+        )
+        
+        for index in fallback:
+            merged[index] = self.merge_blocks(groups[index], prefs[index])
+        
+        log_info(f"Batch merge complete ({len(fallback)} users on scalar path)")
+        return dict(zip(user_ids, merged))
+    
+    def rebuild_timeline(
+        self,
+        user_id: str,
+        blocks: list[EventBlock],
+        memory: MemoryPrefs
+    ) -> list[EventBlock]:
+        """Merge blocks from scratch and keep the result for incremental updates.
+        
+        Args:
+            user_id: User ID
+            blocks: Raw event blocks from all agents
+            memory: User preferences
+        
+        Returns:
+            list[EventBlock]: Merged, conflict-free timeline
+        """
+        log_info(f"Rebuilding timeline for user {user_id} from {len(blocks)} blocks")
+        timeline = self._timeline(user_id, memory)
+        timeline.memory = memory
+        return timeline.rebuild(blocks)
+    
+    def update_agent_blocks(
+        self,
+        user_id: str,
+        source_agent: str,
+        blocks: list[EventBlock],
+        memory: MemoryPrefs,
+        timeline: Optional[UserTimeline] = None
+    ) -> TimelineDelta:
+        """Replace one agent's proposals and re-merge only the affected blocks.
+        
+        If the timeline was merged with other preferences, it is first
+        re-merged for ``memory`` and that change is part of the delta.
+        
+        Args:
+            user_id: User ID
+            source_agent: Agent whose proposals are replaced
+            blocks: The agent's new proposals
+            memory: User preferences
+            timeline: Timeline to update instead of the user's stored one
+                (see ``new_timeline``)
+        
+        Returns:
+            TimelineDelta: Blocks added or moved and IDs removed
+        """
+        if timeline is None:
+            timeline = self._timeline(user_id, memory)
+        prefs_delta = timeline.update_memory(memory) if timeline.memory != memory else ([], [])
+        
+        changed, removed_ids = self._combine_deltas(
+            prefs_delta,
+            timeline.replace_proposals(source_agent, blocks)
+        )
+        log_info(
+            f"Re-merged {source_agent} for user {user_id}: "
+            f"{len(changed)} changed, {len(removed_ids)} removed"
+        )
+        return TimelineDelta(user_id=user_id, changed=changed, removed_ids=removed_ids)
+    
+    def new_timeline(self, user_id: str, memory: MemoryPrefs) -> UserTimeline:
+        """Start an empty timeline owned by one run.
+        
+        Concurrent runs for a user each merge into their own timeline;
+        ``commit_timeline`` makes the finished one the user's stored
+        timeline.
+        """
+        return UserTimeline(self, user_id, memory)
+    
+    def commit_timeline(self, timeline: UserTimeline) -> None:
+        """Store a run's timeline as the user's, for later incremental updates."""
+        self._timelines[timeline.user_id] = timeline
+        self._timelines.move_to_end(timeline.user_id)
+        while len(self._timelines) > settings.timeline_state_max_users:
+            self._timelines.popitem(last=False)
+    
+    def update_memory(self, memory: MemoryPrefs) -> Optional[TimelineDelta]:
+        """Re-merge a user's stored timeline after a preferences change.
+        
+        Args:
+            memory: New user preferences
+        
+        Returns:
+            Optional[TimelineDelta]: Changes, or None if no timeline is stored
+        """
+        timeline = self._timelines.get(memory.user_id)
+        if timeline is None:
+            return None
+        
+        changed, removed_ids = timeline.update_memory(memory)
+        log_info(
+            f"Re-merged timeline for user {memory.user_id} after prefs change: "
+            f"{len(changed)} changed, {len(removed_ids)} removed"
+        )
+        return TimelineDelta(user_id=memory.user_id, changed=changed, removed_ids=removed_ids)
+    
+    def get_timeline(self, user_id: str) -> Optional[list[EventBlock]]:
+        """Return a user's stored merged timeline, if any."""
+        timeline = self._timelines.get(user_id)
+        return timeline.blocks() if timeline is not None else None
+    
+    def _combine_deltas(
+        self,
+        first: tuple[list[EventBlock], list[str]],
+        second: tuple[list[EventBlock], list[str]]
+    ) -> tuple[list[EventBlock], list[str]]:
+        """Combine two consecutive ``(changed, removed_ids)`` deltas into one.
+        
+        Entries of the second override the first: a block it removes is
+        no longer changed, and a block it changes is no longer removed.
+        """
+        changed = {block.id: block for block in first[0]}
+        removed_ids = dict.fromkeys(first[1])
+        for block_id in second[1]:
+            changed.pop(block_id, None)
+            removed_ids[block_id] = None
+        for block in second[0]:
+            changed[block.id] = block
+            removed_ids.pop(block.id, None)
+        return list(changed.values()), list(removed_ids)
+    
+    def _timeline(self, user_id: str, memory: MemoryPrefs) -> UserTimeline:
+        """Get or create a user's stored timeline, evicting the oldest if full."""
+        timeline = self._timelines.get(user_id)
+        if timeline is None:
+            timeline = UserTimeline(self, user_id, memory)
+            self._timelines[user_id] = timeline
+            while len(self._timelines) > settings.timeline_state_max_users:
+                self._timelines.popitem(last=False)
+        else:
+            self._timelines.move_to_end(user_id)
+        return timeline
+    
+    def _merge_records(
+        self,
+        records: list[CompactBlock],
+        memory: MemoryPrefs
+    ) -> list[CompactBlock]:
+        """Filter, sort and place compact records for one user."""
+        valid_records = self._filter_records(records, memory)
+        
+        # Sort by start time, then source agent
+        valid_records.sort(key=lambda r: r.sort_key)
+        return self._resolve_overlaps(valid_records, self._new_board(memory))
+    
+    def _filter_records(
+        self,
+        records: list[CompactBlock],
+        memory: MemoryPrefs
+    ) -> list[CompactBlock]:
+        """Drop records starting in the sleep window or outside work hours."""
         sleep_start = self._parse_time(memory.sleep_start)
         sleep_end = self._parse_time(memory.sleep_end)
-        work_start = time(8, 0)
-        work_end = time(22, 0)
+        longest = self._new_board(memory).longest
         
-        # Filter out blocks in sleep window
-        valid_blocks = []
-        for block in blocks:
-            block_time = datetime.fromisoformat(block.start_iso).time()
+        valid_records = []
+        for record in records:
+            block_time = record.time_of_day
             
             # Check if block starts during sleep
             if self._is_in_sleep_window(block_time, sleep_start, sleep_end):
-                log_info(f"Skipping block in sleep window: {block.title}")
+                log_info(f"Skipping block in sleep window: {record.block.title}")
                 continue
             
             # Check if block is in work hours
-            if not (work_start <= block_time <= work_end):
-                log_info(f"Skipping block outside work hours: {block.title}")
+            if not (WORK_START <= block_time <= WORK_END):
+                log_info(f"Skipping block outside work hours: {record.block.title}")
+                continue
+            
+            # Check the block fits in a free window at all
+            if max(record.duration, 1) > longest:
+                log_info(f"Skipping block longer than any free window: {record.block.title}")
                 continue
-                
-            valid_blocks.append(block)
+            
+            valid_records.append(record)
         
-        # Sort by start time, then source agent
-        sorted_blocks = sorted(
-            valid_blocks,
-            key=lambda b: (b.start_iso, b.source_agent)
-        )
+        return valid_records
+    
+    def _resolve_overlaps(
+        self,
+        records: list[CompactBlock],
+        board: AvailabilityIndex
+    ) -> list[CompactBlock]:
+        """Place sorted records, shifting each past every block placed so far.
         
-        # Resolve overlaps
-        merged: list[EventBlock] = []
+        Returns:
+            list[CompactBlock]: Records ordered by final start, then agent
+        """
+        for record in records:
+            self._place(record, board)
         
-        for block in sorted_blocks:
-            if not merged:
-                merged.append(block)
-                continue
-            
-            last_block = merged[-1]
-            last_end = datetime.fromisoformat(last_block.end_iso)
-            current_start = datetime.fromisoformat(block.start_iso)
-            
-            # Check for overlap
-            if current_start < last_end:
-                # Shift block to end of last block
-                duration = datetime.fromisoformat(block.end_iso) - current_start
-                new_start = last_end
-                new_end = new_start + duration
-                
-                # Update block times
-                block.start_iso = new_start.isoformat()
-                block.end_iso = new_end.isoformat()
-                
-                log_info(f"Shifted overlapping block: {block.title}")
-            
-            merged.append(block)
+        # Shifted blocks may land after later ones, so order by final start
+        return sorted(records, key=lambda r: (r.start, r.source_agent))
+    
+    def _new_board(self, memory: MemoryPrefs) -> AvailabilityIndex:
+        """Create an empty placement index limited to the user's free hours."""
+        return AvailabilityIndex(daily_windows(
+            WORK_START,
+            WORK_END,
+            self._parse_time(memory.sleep_start),
+            self._parse_time(memory.sleep_end)
+        ))
+    
+    def _place(self, record: CompactBlock, board: AvailabilityIndex) -> None:
+        """Place a record at the first free allowed slot from its proposed start."""
+        duration = record.duration
+        new_start = board.next_free(record.raw_start, duration)
         
-        log_info(f"Merged timeline has {len(merged)} blocks")
-        return merged
+        if new_start != record.start:
+            record.shift_to(new_start)
+            if record.moved:
+                log_info(f"Shifted overlapping block: {record.block.title}")
+        
+        if duration:
+            board.insert(record.start, record.end, record, record)
     
-    def _parse_time(self, time_str: str) -> time:
-        """Parse HH:MM time string."""
+    def _parse_time(self, time_str: str) -> int:
+        """Parse HH:MM time string into seconds since midnight."""
         try:
             hour, minute = map(int, time_str.split(":"))
-            return time(hour, minute)
+            return hour * 3600 + minute * 60
         except Exception:
-            return time(0, 0)
+            return 0
     
     def _is_in_sleep_window(
         self,
-        check_time: time,
-        sleep_start: time,
-        sleep_end: time
+        check_time: int,
+        sleep_start: int,
+        sleep_end: int
     ) -> bool:
-        """Check if a time falls in the sleep window.
+        """Check if a time of day (in seconds) falls in the sleep window.
         
         Handles overnight sleep (e.g., 23:00 - 07:00).
         """
@@ -117,4 +348,3 @@ class TimelineService:
 
 # Global timeline service instance
 timeline_service = TimelineService()
-
@@ -0,0 +1,266 @@
+"""Per-user merged timeline state with incremental re-merge."""
+from bisect import bisect_left
+from collections import Counter
+from typing import TYPE_CHECKING
+from app.models.domain import EventBlock, MemoryPrefs
+from app.models.compact import CompactBlock, SECONDS_PER_DAY, to_compact, from_compact
+from app.services.interval_index import IntervalIndex
+
+if TYPE_CHECKING:
+    from app.services.timeline import TimelineService
+
+
+class UserTimeline:
+    """A user's merged timeline that can be re-merged from a delta.
+    
+    Valid records are kept in merge order together with the placement
+    index and, per position, the latest end placed before it. A delta only
+    replays merge order from the first changed position and stops as soon
+    as no changed placement can reach a later block, so small edits cost
+    roughly the size of the change instead of the whole timeline.
+    """
+    
+    def __init__(self, service: "TimelineService", user_id: str, memory: MemoryPrefs):
+        self.user_id = user_id
+        self.memory = memory
+        self._service = service
+        self._proposals: dict[str, list[CompactBlock]] = {}
+        self._valid: set[CompactBlock] = set()
+        self._records: list[CompactBlock] = []
+        self._keys: list[tuple[int, str, int]] = []
+        # Per position: latest end placed by any earlier record
+        self._frontier: list[int] = []
+        self._board: IntervalIndex = service._new_board(memory)
+        self._next_order = 0
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    def blocks(self) -> list[EventBlock]:
+        """Return the merged timeline ordered by start, then agent."""
+        placed = sorted(self._records, key=lambda r: (r.start, r.source_agent))
+        return [from_compact(record) for record in placed]
+    
+    def rebuild(self, blocks: list[EventBlock]) -> list[EventBlock]:
+        """Replace all proposals and merge from scratch."""
+        self._proposals = {}
+        for record in self._compact(blocks):
+            self._proposals.setdefault(record.source_agent, []).append(record)
+        
+        self._merge_all()
+        return self.blocks()
+    
+    def _merge_all(self) -> None:
+        """Merge all stored proposals from scratch."""
+        valid_records = self._service._filter_records(self._all_proposals(), self.memory)
+        valid_records.sort(key=lambda r: r.sort_key)
+        self._board = self._service._new_board(self.memory)
+        
+        self._valid = set(valid_records)
+        self._records = valid_records
+        self._keys = [record.sort_key for record in valid_records]
+        self._frontier = []
+        frontier = 0
+        for record in valid_records:
+            self._frontier.append(frontier)
+            self._service._place(record, self._board)
+            frontier = max(frontier, record.end)
+    
+    def replace_proposals(
+        self,
+        source_agent: str,
+        blocks: list[EventBlock]
+    ) -> tuple[list[EventBlock], list[str]]:
+        """Swap one agent's proposals and re-resolve only what they affect.
+        
+        Returns:
+            tuple: (blocks added or moved, IDs of blocks removed)
+        """
+        previous = self._proposals.get(source_agent, [])
+        proposals = self._compact(blocks)
+        
+        # Re-proposed blocks that did not change keep their placed records.
+        # Ties on start are ordered by arrival, so only unambiguous starts
+        # can be reused without changing merge order.
+        starts = Counter(record.raw_start for record in proposals)
+        unchanged = {record.block.id: record for record in previous}
+        fresh = []
+        for i, record in enumerate(proposals):
+            old = unchanged.get(record.block.id)
+            if old is not None and old.block == record.block and starts[record.raw_start] == 1:
+                proposals[i] = old
+            else:
+                fresh.append(record)
+        
+        kept = set(proposals)
+        self._proposals[source_agent] = proposals
+        
+        removed = [record for record in previous if record in self._valid and record not in kept]
+        added = self._service._filter_records(fresh, self.memory)
+        changed, removed_ids = self._apply(removed, added)
+        # A block re-proposed as a fresh record is still on the timeline
+        changed_ids = {block.id for block in changed}
+        return changed, [block_id for block_id in removed_ids if block_id not in changed_ids]
+    
+    def update_memory(self, memory: MemoryPrefs) -> tuple[list[EventBlock], list[str]]:
+        """Apply changed preferences, re-resolving blocks whose filter result flips.
+        
+        Returns:
+            tuple: (blocks added or moved, IDs of blocks removed)
+        """
+        if self._service._new_board(memory).windows != self._board.windows:
+            return self._remerge(memory)
+        
+        self.memory = memory
+        valid_now = set(self._service._filter_records(self._all_proposals(), memory))
+        
+        removed = [record for record in self._records if record not in valid_now]
+        added = [record for record in valid_now if record not in self._valid]
+        return self._apply(removed, added)
+    
+    def _remerge(self, memory: MemoryPrefs) -> tuple[list[EventBlock], list[str]]:
+        """Merge from scratch for new free hours and diff against the old placement.
+        
+        Changing the allowed windows can move blocks on every day, so there
+        is no smaller region to replay.
+        """
+        previous = {record: (record.start, record.end) for record in self._records}
+        self.memory = memory
+        for record in self._all_proposals():
+            record.shift_to(record.raw_start)
+        self._merge_all()
+        
+        changed = [
+            from_compact(record) for record in self._records
+            if previous.get(record) != (record.start, record.end)
+        ]
+        removed_ids = [record.block.id for record in previous if record not in self._valid]
+        return changed, removed_ids
+    
+    def _compact(self, blocks: list[EventBlock]) -> list[CompactBlock]:
+        """Parse blocks, numbering them in arrival order for stable ties."""
+        records = [to_compact(block, self._next_order + i) for i, block in enumerate(blocks)]
+        self._next_order += len(blocks)
+        return records
+    
+    def _all_proposals(self) -> list[CompactBlock]:
+        return [record for records in self._proposals.values() for record in records]
+    
+    def _apply(
+        self,
+        removed: list[CompactBlock],
+        added: list[CompactBlock]
+    ) -> tuple[list[EventBlock], list[str]]:
+        """Apply a delta one proposed day at a time.
+        
+        Every step leaves an exact merge of the proposals seen so far, so
+        splitting is always safe, and it keeps an edit on day 1 and another
+        on day 30 from replaying every block in between.
+        """
+        days: dict[int, tuple[list[CompactBlock], list[CompactBlock]]] = {}
+        for record in removed:
+            days.setdefault(record.raw_start // SECONDS_PER_DAY, ([], []))[0].append(record)
+        for record in added:
+            days.setdefault(record.raw_start // SECONDS_PER_DAY, ([], []))[1].append(record)
+        
+        changed: dict[CompactBlock, None] = {}
+        removed_ids: list[str] = []
+        for day in sorted(days):
+            day_removed, day_added = days[day]
+            # An earlier step may have moved a block this step removes
+            for record in day_removed:
+                changed.pop(record, None)
+            changed.update(dict.fromkeys(self._apply_day(day_removed, day_added)))
+            removed_ids.extend(record.block.id for record in day_removed)
+        
+        return [from_compact(record) for record in changed], removed_ids
+    
+    def _apply_day(
+        self,
+        removed: list[CompactBlock],
+        added: list[CompactBlock]
+    ) -> list[CompactBlock]:
+        """Replay merge order from the first change until placements converge.
+        
+        Returns:
+            list[CompactBlock]: Records added or placed differently
+        """
+        for record in added:
+            record.shift_to(record.raw_start)
+        added.sort(key=lambda r: r.sort_key)
+        removed_set = set(removed)
+        
+        delta_keys = [record.sort_key for record in removed + added]
+        first_key = min(delta_keys)
+        last_key = max(delta_keys)
+        position = bisect_left(self._keys, first_key)
+        
+        # Only prefix blocks still running at the first change can collide
+        scratch = self._service._new_board(self.memory)
+        frontier = self._frontier[position] if position < len(self._frontier) else (
+            max(self._frontier[-1], self._records[-1].end) if self._records else 0
+        )
+        for start, end, record in self._board.overlapping(first_key[0], frontier):
+            if record.sort_key < first_key:
+                scratch.insert(start, end, record, record)
+        
+        # Removed blocks free their old slots; later blocks may move into them
+        dirty_end = max((record.end for record in removed), default=0)
+        old_placements = {}
+        replayed: list[CompactBlock] = []
+        replayed_frontier: list[int] = []
+        changed: list[CompactBlock] = list(added)
+        
+        old_index = position
+        added_index = 0
+        while True:
+            while old_index < len(self._records) and self._records[old_index] in removed_set:
+                old_index += 1
+            take_old = old_index < len(self._records)
+            take_added = added_index < len(added)
+            if not take_old and not take_added:
+                break
+            
+            if take_old and (not take_added or self._keys[old_index] < added[added_index].sort_key):
+                record = self._records[old_index]
+                # Converged: nothing that changed reaches this block or later
+                if record.sort_key > last_key and dirty_end <= record.raw_start:
+                    break
+                old_index += 1
+                old_placements[record] = (record.start, record.end)
+            else:
+                record = added[added_index]
+                added_index += 1
+            
+            replayed_frontier.append(frontier)
+            self._service._place(record, scratch)
+            frontier = max(frontier, record.end)
+            replayed.append(record)
+            
+            if record in old_placements and old_placements[record] != (record.start, record.end):
+                changed.append(record)
+                dirty_end = max(dirty_end, old_placements[record][1], record.end)
+            elif record not in old_placements:
+                dirty_end = max(dirty_end, record.end)
+        
+        # Commit placements to the main index: clear old slots, then fill new ones
+        for record in removed:
+            if record in self._board:
+                self._board.remove(record)
+        for record in changed:
+            if record in self._board:
+                self._board.remove(record)
+        for record in changed:
+            if record.duration:
+                self._board.insert(record.start, record.end, record, record)
+        
+        self._records[position:old_index] = replayed
+        self._keys[position:old_index] = [record.sort_key for record in replayed]
+        self._frontier[position:old_index] = replayed_frontier
+        # Later entries stay valid: changed ends all lie before the block we stopped at
+        resume = position + len(replayed)
+        if resume < len(self._frontier):
+            self._frontier[resume] = frontier
+        self._valid.difference_update(removed)
+        self._valid.update(added)
+        return changed
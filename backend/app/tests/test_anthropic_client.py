@@ -0,0 +1,86 @@
+"""Tests for the Anthropic client prompt caching."""
+import asyncio
+import json
+import pytest
+from app.adapters.anthropic_client import AnthropicClient, anthropic_client
+from app.adapters.letta_client import letta_client
+from app.models.domain import MemoryPrefs
+from app.services.planner import PlannerService, SYSTEM_PROMPT
+
+
+async def start_messages_stand_in(bodies: list, usage: dict):
+    """Serve Messages API responses on localhost, recording request bodies."""
+    plan = anthropic_client._mock_response("Plan my week")
+    
+    async def handle(reader, writer):
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = next(
+            int(line.split(b":")[1]) for line in headers.split(b"\r\n")
+            if line.lower().startswith(b"content-length")
+        )
+        bodies.append(json.loads(await reader.readexactly(length)))
+        
+        body = json.dumps({
+            "content": [{"type": "text", "text": json.dumps(plan)}],
+            "usage": usage
+        }).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+            + f"content-length: {len(body)}\r\nconnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+    
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/v1"
+
+
+@pytest.mark.asyncio
+async def test_cacheable_system_prompt_and_usage_recorded():
+    """Test cache breakpoints are sent and cache token usage is counted."""
+    bodies = []
+    server, url = await start_messages_stand_in(bodies, {
+        "input_tokens": 20,
+        "output_tokens": 200,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 1500
+    })
+    client = AnthropicClient()
+    client.api_key = "test-key"
+    client.base_url = url
+    
+    async with server:
+        await client.complete_json("Plan my week", "Be a planner", context="User memory:\n{}", cache=True)
+        await client.complete_json("Plan my week", "Be a planner")
+    
+    cached, uncached = bodies
+    assert cached["system"] == [
+        {"type": "text", "text": "Be a planner", "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "User memory:\n{}", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert uncached["system"] == [{"type": "text", "text": "Be a planner"}]
+    
+    stats = client.usage_stats()
+    assert stats["requests"] == 2
+    assert stats["cache_hits"] == 2
+    assert stats["cache_read_input_tokens"] == 3000
+    assert stats["cache_read_ratio"] == pytest.approx(3000 / 3040)
+
+
+@pytest.mark.asyncio
+async def test_planner_caches_system_prompt_and_memory_by_default(monkeypatch):
+    """Test the planner sends its prompt and the user's memory as cacheable prefixes."""
+    bodies = []
+    server, url = await start_messages_stand_in(bodies, {"input_tokens": 10, "output_tokens": 100})
+    monkeypatch.setattr(anthropic_client, "api_key", "test-key")
+    monkeypatch.setattr(anthropic_client, "base_url", url)
+    await letta_client.upsert_prefs(MemoryPrefs(user_id="prompt_cache_user", sleep_start="22:30"))
+    
+    async with server:
+        await PlannerService().parse_query("Plan my lab reports", "prompt_cache_user")
+    
+    prompt, memory = bodies[0]["system"]
+    assert prompt == {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+    assert memory["cache_control"] == {"type": "ephemeral"}
+    assert '"sleep_start": "22:30"' in memory["text"]
@@ -0,0 +1,201 @@
+"""Tests for buffered Elasticsearch log shipping."""
+import asyncio
+import json
+import pytest
+from app.adapters.elastic_logger import ElasticLogger
+from app.util.http import http_pool
+from app.util.spool import SegmentSpool
+
+
+async def start_bulk_stand_in(bodies: list, status: int = 200, down: list = None):
+    """Serve a minimal ``_bulk`` endpoint on localhost, recording request bodies.
+    
+    While ``down`` holds a truthy value, requests get a 503 and are not recorded.
+    """
+    async def handle(reader, writer):
+        while True:
+            try:
+                headers = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            length = next(
+                int(line.split(b":")[1]) for line in headers.split(b"\r\n")
+                if line.lower().startswith(b"content-length")
+            )
+            body = await reader.readexactly(length)
+            code = 503 if down and down[0] else status
+            if code == status:
+                bodies.append((headers.split(b" ")[1].decode(), body))
+            body = b'{"errors": false, "items": []}'
+            writer.write(
+                f"HTTP/1.1 {code} OK\r\ncontent-type: application/json\r\n".encode()
+                + f"content-length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        writer.close()
+    
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+@pytest.fixture(autouse=True)
+async def close_connections():
+    """Close pooled connections so stand-in handlers finish with the test."""
+    yield
+    await http_pool.close()
+
+
+def make_logger(monkeypatch, url: str, **overrides) -> ElasticLogger:
+    monkeypatch.setattr("app.adapters.elastic_logger.settings.elastic_url", url)
+    for name, value in overrides.items():
+        monkeypatch.setattr(f"app.adapters.elastic_logger.settings.elastic_{name}", value)
+    return ElasticLogger()
+
+
+@pytest.mark.asyncio
+async def test_events_are_shipped_in_ndjson_batches(monkeypatch):
+    """Test that events are batched by size and the rest flushed on shutdown."""
+    bodies = []
+    server, url = await start_bulk_stand_in(bodies)
+    logger = make_logger(monkeypatch, url, batch_size=10, flush_interval_seconds=30.0)
+    
+    async with server:
+        for i in range(25):
+            await logger.log_event("INFO", f"event {i}", trace_id="trace_1", n=i)
+        await logger.shutdown()
+    
+    assert [path for path, _ in bodies] == ["/_bulk"] * 3
+    lines = [json.loads(line) for _, body in bodies for line in body.decode().splitlines()]
+    actions, docs = lines[::2], lines[1::2]
+    assert all(action == {"index": {"_index": "taskweave-logs"}} for action in actions)
+    assert [doc["n"] for doc in docs] == list(range(25))
+    assert docs[0]["message"] == "event 0" and docs[0]["trace_id"] == "trace_1"
+    
+    stats = logger.stats()
+    assert (stats["shipped"], stats["batches"], stats["queue_depth"]) == (25, 3, 0)
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_after_interval(monkeypatch):
+    """Test that a quiet logger still ships within the flush interval."""
+    bodies = []
+    server, url = await start_bulk_stand_in(bodies)
+    logger = make_logger(monkeypatch, url, flush_interval_seconds=0.05)
+    
+    async with server:
+        await logger.log_event("INFO", "lonely")
+        await asyncio.sleep(0.3)
+        assert len(bodies) == 1
+        await logger.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_without_blocking(monkeypatch):
+    """Test the drop policy and failure accounting."""
+    bodies = []
+    server, url = await start_bulk_stand_in(bodies, status=503)
+    logger = make_logger(monkeypatch, url, queue_max_size=3, flush_interval_seconds=30.0)
+    
+    async with server:
+        for i in range(5):
+            await logger.log_event("INFO", f"event {i}")
+        assert logger.dropped == 2
+        await logger.shutdown()
+    
+    assert len(bodies) == 1
+    assert (logger.shipped, logger.failed) == (0, 3)
+
+
+def test_spool_segments_cap_and_restart(tmp_path):
+    """Test segment rollover, replay bookkeeping, the size cap and reopening."""
+    spool = SegmentSpool(str(tmp_path), max_bytes=60, segment_bytes=19)
+    for i in range(6):
+        spool.append([f"record-{i}", f"record-{i}b"])
+    
+    # 19-byte segments hold one append each; the cap keeps the newest three
+    assert (spool.segments, spool.dropped_segments) == (3, 3)
+    segment_id, lines = spool.head()
+    assert lines == ["record-3", "record-3b"]
+    spool.replace(segment_id, lines[1:])
+    spool.append(["record-6"])
+    
+    reopened = SegmentSpool(str(tmp_path), max_bytes=60, segment_bytes=19)
+    records = []
+    while reopened.pending:
+        segment_id, lines = reopened.head()
+        records.extend(lines)
+        reopened.remove(segment_id)
+    assert records == ["record-3b", "record-4", "record-4b", "record-5", "record-5b", "record-6"]
+
+
+@pytest.mark.asyncio
+async def test_outage_is_spooled_and_replayed_in_order(monkeypatch, tmp_path):
+    """Test that events logged during an outage are delivered in order after it."""
+    bodies = []
+    down = [True]
+    server, url = await start_bulk_stand_in(bodies, down=down)
+    logger = make_logger(
+        monkeypatch,
+        url,
+        batch_size=4,
+        flush_interval_seconds=0.02,
+        retry_max_seconds=0.05,
+        spool_path=str(tmp_path)
+    )
+    
+    async with server:
+        for i in range(10):
+            await logger.log_event("INFO", f"event {i}", trace_id=f"trace_{i % 2}", n=i)
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        assert not bodies and logger.stats()["spool_segments"] > 0
+        
+        down[0] = False
+        for i in range(10, 14):
+            await logger.log_event("INFO", f"event {i}", trace_id=f"trace_{i % 2}", n=i)
+        await asyncio.sleep(0.3)
+        await logger.shutdown()
+    
+    docs = [json.loads(line) for _, body in bodies for line in body.decode().splitlines()[1::2]]
+    assert [doc["n"] for doc in docs] == list(range(14))
+    stats = logger.stats()
+    # Events logged right after recovery queue up behind the spool
+    assert (stats["spooled"], stats["replayed"], stats["failed"]) == (14, 14, 0)
+    assert stats["spool_segments"] == 0 and not list(tmp_path.iterdir())
+
+
+@pytest.mark.asyncio
+async def test_spool_errors_drop_the_batch_and_keep_shipping(monkeypatch, tmp_path):
+    """Test that a failing spool write does not stop the shipper."""
+    bodies = []
+    down = [True]
+    server, url = await start_bulk_stand_in(bodies, down=down)
+    logger = make_logger(
+        monkeypatch,
+        url,
+        batch_size=2,
+        flush_interval_seconds=0.02,
+        retry_max_seconds=0.02,
+        spool_path=str(tmp_path)
+    )
+    
+    def disk_full(lines):
+        raise OSError(28, "No space left on device")
+    
+    monkeypatch.setattr(logger._spool, "append", disk_full)
+    async with server:
+        for i in range(2):
+            await logger.log_event("INFO", f"event {i}", n=i)
+        await asyncio.sleep(0.1)
+        assert not logger._shipper.done()
+        
+        down[0] = False
+        for i in range(2, 4):
+            await logger.log_event("INFO", f"event {i}", n=i)
+        await logger.shutdown()
+    
+    docs = [json.loads(line) for _, body in bodies for line in body.decode().splitlines()[1::2]]
+    assert [doc["n"] for doc in docs] == [2, 3]
+    stats = logger.stats()
+    assert (stats["errors"], stats["failed"], stats["shipped"]) == (1, 2, 2)
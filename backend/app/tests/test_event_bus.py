@@ -0,0 +1,211 @@
+"""Tests for queued event bus delivery."""
+import asyncio
+import json
+import pytest
+from app.models.events import ServerEvent, EventType
+from app.services.event_bus import EventBus, OverflowPolicy
+
+
+def log_event(n: int) -> ServerEvent:
+    return ServerEvent(type=EventType.AGENT_LOG, payload={"n": n}, trace_id="trace_1")
+
+
+def timeline_event(user_id: str, n: int) -> ServerEvent:
+    return ServerEvent(type=EventType.TIMELINE_UPDATE, payload={"user_id": user_id, "n": n})
+
+
+class BlockedHandler:
+    """Handler that records events but waits until released."""
+    
+    def __init__(self):
+        self.received = []
+        self.release = asyncio.Event()
+    
+    async def __call__(self, event: ServerEvent) -> None:
+        await self.release.wait()
+        self.received.append(event.payload["n"])
+
+
+@pytest.mark.asyncio
+async def test_publish_does_not_wait_for_slow_subscribers():
+    """Test that a stuck subscriber delays neither the publisher nor others."""
+    bus = EventBus()
+    slow = BlockedHandler()
+    fast = []
+    
+    async def record(event):
+        fast.append(event.payload["n"])
+    
+    subscriptions = [bus.attach(slow), bus.attach(record, [EventType.AGENT_LOG])]
+    for n in range(3):
+        await asyncio.wait_for(bus.publish(log_event(n)), 0.05)
+    await asyncio.sleep(0.01)
+    
+    assert fast == [0, 1, 2] and slow.received == []
+    assert bus.stats()["queue_depth"] == 2
+    for subscription in subscriptions:
+        bus.detach(subscription)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("policy, expected, dropped", [
+    (OverflowPolicy.DROP_OLDEST, [2, 3, 4], 2),
+    (OverflowPolicy.DROP_NEWEST, [0, 1, 2], 2),
+])
+async def test_drop_policies(policy, expected, dropped):
+    """Test which events survive a full queue."""
+    bus = EventBus()
+    handler = BlockedHandler()
+    subscription = bus.attach(handler, max_queue_size=3, policy=policy)
+    
+    # publish never yields, so the drain task has taken nothing yet
+    for n in range(5):
+        await bus.publish(log_event(n))
+    handler.release.set()
+    await asyncio.sleep(0.01)
+    
+    assert handler.received == expected
+    assert (subscription.dropped, subscription.max_depth) == (dropped, 3)
+    bus.detach(subscription)
+    assert bus.stats()["dropped"] == dropped
+
+
+@pytest.mark.asyncio
+async def test_coalesce_replaces_superseded_timelines():
+    """Test that a newer full timeline replaces the queued one for the same user."""
+    bus = EventBus()
+    handler = BlockedHandler()
+    subscription = bus.attach(handler, max_queue_size=2, policy=OverflowPolicy.COALESCE)
+    
+    for event in [timeline_event("alice", 0), timeline_event("bob", 1), timeline_event("alice", 2)]:
+        await bus.publish(event)
+    handler.release.set()
+    await asyncio.sleep(0.01)
+    
+    assert handler.received == [1, 2]
+    assert (subscription.coalesced, subscription.dropped) == (1, 0)
+    bus.detach(subscription)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_drops_the_subscriber():
+    """Test that an overflowing subscriber is detached and notified."""
+    bus = EventBus()
+    handler = BlockedHandler()
+    closed = asyncio.Event()
+    
+    async def on_disconnect():
+        closed.set()
+    
+    subscription = bus.attach(
+        handler,
+        max_queue_size=2,
+        policy=OverflowPolicy.DISCONNECT,
+        on_disconnect=on_disconnect
+    )
+    for n in range(4):
+        await bus.publish(log_event(n))
+    await asyncio.wait_for(closed.wait(), 0.5)
+    
+    assert subscription.closed
+    stats = bus.stats()
+    assert (stats["subscriptions"], stats["disconnected"], stats["dropped"]) == (0, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_scoped_subscriptions_receive_only_matching_events():
+    """Test user, trace and type scopes."""
+    bus = EventBus()
+    received = {}
+    
+    def recorder(name):
+        async def record(event):
+            received.setdefault(name, []).append(event.payload["n"])
+        return record
+    
+    subscriptions = [
+        bus.attach(recorder("alice"), user_id="alice"),
+        bus.attach(recorder("bob"), user_id="bob"),
+        bus.attach(recorder("alice_trace"), user_id="alice", trace_id="trace_a"),
+        bus.attach(recorder("jobs"), event_types=[EventType.JOB_STATUS]),
+        bus.attach(recorder("all"))
+    ]
+    events = [
+        ServerEvent(type=EventType.AGENT_LOG, payload={"n": 0}, user_id="alice", trace_id="trace_a"),
+        ServerEvent(type=EventType.AGENT_LOG, payload={"n": 1}, user_id="bob", trace_id="trace_a"),
+        ServerEvent(type=EventType.JOB_STATUS, payload={"n": 2}, user_id="alice", trace_id="trace_b"),
+        ServerEvent(type=EventType.ERROR, payload={"n": 3})
+    ]
+    for event in events:
+        await bus.publish(event)
+    await asyncio.sleep(0.01)
+    
+    assert received == {
+        "alice": [0, 2],
+        "bob": [1],
+        "alice_trace": [0],
+        "jobs": [2],
+        "all": [0, 1, 2, 3]
+    }
+    
+    bus.rescope(subscriptions[1], event_types=[EventType.ERROR])
+    await bus.publish(events[1])
+    await bus.publish(events[3])
+    await asyncio.sleep(0.01)
+    assert received["bob"] == [1, 3]
+    for subscription in subscriptions:
+        bus.detach(subscription)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_serializes_each_event_once(monkeypatch):
+    """Test that every connection gets the same cached frame."""
+    from app.router import websocket
+    
+    calls = []
+    original = ServerEvent.model_dump_json
+    
+    def counting_dump_json(self, **kwargs):
+        calls.append(self.type)
+        return original(self, **kwargs)
+    
+    monkeypatch.setattr(ServerEvent, "model_dump_json", counting_dump_json)
+    
+    class Connection:
+        def __init__(self):
+            self.frames = []
+        
+        async def send_text(self, text):
+            self.frames.append(text)
+    
+    connections = [Connection() for _ in range(3)]
+    monkeypatch.setattr(websocket, "active_connections", set(connections))
+    event = timeline_event("alice", 1)
+    await websocket.broadcast_event(event)
+    await websocket.broadcast_event(event)
+    
+    assert len(calls) == 1
+    assert all(connection.frames == [event.encoded()] * 2 for connection in connections)
+    assert json.loads(event.encoded())["payload"]["n"] == 1
+    assert json.loads(event.model_copy(update={"trace_id": "other"}).encoded())["trace_id"] == "other"
+
+
+@pytest.mark.asyncio
+async def test_batching_subscriber_receives_bursts_in_one_call():
+    """Test that events queued within the batch window arrive together."""
+    bus = EventBus()
+    batches = []
+    
+    async def record(events):
+        batches.append([event.payload["n"] for event in events])
+    
+    subscription = bus.attach(record, batch_seconds=0.02)
+    for n in range(5):
+        await bus.publish(log_event(n))
+    await asyncio.sleep(0.05)
+    await bus.publish(log_event(5))
+    await asyncio.sleep(0.05)
+    
+    assert batches == [[0, 1, 2, 3, 4], [5]]
+    bus.detach(subscription)
+    assert bus.stats()["batches"] == 2
@@ -0,0 +1,69 @@
+"""Tests for WebSocket frame encodings."""
+import json
+import zlib
+import pytest
+from app.models.events import ServerEvent, EventType
+from app.services import event_frames
+from app.services.event_frames import FrameEncoder, FLAG_DEFLATE, FLAG_PLAIN
+
+
+def log_event(n: int) -> ServerEvent:
+    return ServerEvent(type=EventType.AGENT_LOG, payload={"n": n}, trace_id="trace_1")
+
+
+def timeline_event(blocks: int) -> ServerEvent:
+    return ServerEvent(
+        type=EventType.TIMELINE_UPDATE,
+        payload={"user_id": "alice", "blocks": [{"id": f"evt_{i}", "title": "Study"} for i in range(blocks)]}
+    )
+
+
+def test_json_frames_single_and_batched():
+    """Test text frames hold one event, or an array when batching."""
+    events = [log_event(0), log_event(1)]
+    assert FrameEncoder().encode(events) == [events[0].encoded(), events[1].encoded()]
+    
+    frames = FrameEncoder(batched=True).encode(events)
+    assert [event["payload"]["n"] for event in json.loads(frames[0])] == [0, 1]
+    assert json.loads(FrameEncoder(batched=True).encode(events[:1])[0])[0]["payload"] == {"n": 0}
+
+
+def test_large_events_get_their_own_deflated_frame():
+    """Test large events split a batch, are compressed, and are cached per event."""
+    encoder = FrameEncoder(batched=True, compress=True, large_bytes=1024)
+    large = timeline_event(100)
+    frames = encoder.encode([log_event(0), log_event(1), large, log_event(2)])
+    
+    assert len(frames) == 3
+    assert [event["payload"]["n"] for event in json.loads(frames[0])] == [0, 1]
+    assert frames[1][:1] == FLAG_DEFLATE
+    assert len(frames[1]) < len(large.encoded())
+    assert json.loads(zlib.decompress(frames[1][1:])) == [json.loads(large.encoded())]
+    assert json.loads(frames[2])[0]["payload"] == {"n": 2}
+    assert FrameEncoder(batched=True, compress=True, large_bytes=1024).encode([large])[0] is frames[1]
+    
+    # Without compression the large event is still sent on its own
+    frames = FrameEncoder(large_bytes=1024).encode([large])
+    assert frames == [large.encoded()]
+    assert event_frames.frame_encoder_stats()["compressed"] >= 1
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        FrameEncoder("xml")
+
+
+def test_msgpack_frames():
+    """Test binary MessagePack frames, batched into one array."""
+    msgpack = pytest.importorskip("msgpack")
+    events = [log_event(n) for n in range(20)]
+    frame = FrameEncoder("msgpack").encode(events[:1])[0]
+    assert frame[:1] == FLAG_PLAIN
+    assert msgpack.unpackb(frame[1:])["payload"] == {"n": 0}
+    
+    frames = FrameEncoder("msgpack", batched=True).encode(events)
+    assert len(frames) == 1
+    frame = frames[0]
+    unpacked = msgpack.unpackb(frame[1:])
+    assert [event["payload"]["n"] for event in unpacked] == list(range(20))
+    assert unpacked[0]["type"] == "AGENT_LOG"
@@ -0,0 +1,90 @@
+"""Tests for event sequence numbers and replay."""
+import asyncio
+import pytest
+from app.models.events import ServerEvent, EventType
+from app.services.event_bus import EventBus, OverflowPolicy
+from app.services.event_replay import ReplayBuffer
+
+
+def event(n: int, user_id: str = "alice", trace_id: str = "trace_1") -> ServerEvent:
+    return ServerEvent(type=EventType.AGENT_LOG, payload={"n": n}, user_id=user_id, trace_id=trace_id)
+
+
+@pytest.mark.asyncio
+async def test_publish_numbers_events_and_replays_by_scope():
+    """Test that seq increases and replay returns only missed events in scope."""
+    bus = EventBus()
+    events = [
+        event(0),
+        event(1, trace_id="trace_2"),
+        event(2, user_id="bob", trace_id="trace_3"),
+        event(3)
+    ]
+    for item in events:
+        await bus.publish(item)
+    
+    seqs = [item.seq for item in events]
+    assert seqs == sorted(seqs) and len(set(seqs)) == 4
+    assert f'"seq":{seqs[0]}' in events[0].encoded()
+    
+    missed, complete = bus.replay(seqs[0], user_id="alice")
+    assert [item.payload["n"] for item in missed] == [1, 3]
+    assert complete
+    missed, _ = bus.replay(seqs[0], trace_id="trace_1")
+    assert [item.payload["n"] for item in missed] == [3]
+    missed, _ = bus.replay(seqs[0], event_types=[EventType.TIMELINE_UPDATE])
+    assert missed == []
+    assert bus.stats()["replay"]["events"] == 4
+
+
+def test_eviction_is_reported_as_incomplete():
+    """Test the byte budget and per-key cap evict the oldest events."""
+    sample = event(0)
+    sample.seq = 0
+    buffer = ReplayBuffer(max_bytes=len(sample.encoded()) * 3, max_events_per_key=2)
+    for seq in range(1, 5):
+        item = event(seq, user_id="alice" if seq < 4 else "bob", trace_id=f"trace_{seq % 2}")
+        item.seq = seq
+        buffer.add(item)
+    
+    assert buffer.stats()["events"] == 3
+    assert buffer.evicted == 1
+    missed, complete = buffer.replay(0)
+    assert [item.seq for item in missed] == [2, 3, 4]
+    assert not complete
+    missed, complete = buffer.replay(1)
+    assert complete
+    
+    # Alice's ring holds at most two events
+    missed, complete = buffer.replay(1, user_id="alice")
+    assert [item.seq for item in missed] == [2, 3]
+    assert complete
+    _, complete = buffer.replay(0, user_id="alice")
+    assert not complete
+    missed, complete = buffer.replay(0, user_id="bob")
+    assert [item.seq for item in missed] == [4]
+    assert complete
+
+
+@pytest.mark.parametrize("policy", [OverflowPolicy.DROP_OLDEST, OverflowPolicy.DISCONNECT])
+@pytest.mark.asyncio
+async def test_replay_is_not_limited_by_the_live_queue(policy):
+    """Test that a replay longer than the queue is delivered whole, before live events."""
+    bus = EventBus()
+    for n in range(10):
+        await bus.publish(event(n))
+    received = []
+    
+    async def record(item):
+        received.append(item.payload["n"])
+    
+    subscription = bus.attach(record, max_queue_size=4, policy=policy, user_id="alice")
+    missed, complete = bus.replay(0, user_id="alice")
+    subscription.prefill(missed)
+    await bus.publish(event(10))
+    await asyncio.sleep(0.01)
+    
+    assert complete
+    assert received == list(range(10)) + [10]
+    assert not subscription.closed
+    bus.detach(subscription)
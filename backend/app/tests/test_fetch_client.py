@@ -0,0 +1,78 @@
+"""Tests for the Fetch AI client proposal cache."""
+from datetime import datetime, timedelta
+import pytest
+from app.adapters.fetch_client import FetchClient, fetch_client
+from app.adapters.letta_client import letta_client
+from app.models.domain import Subtask, AgentType, MemoryPrefs
+from app.util.cache import TTLCache
+from app.util.ids import generate_id
+
+
+def make_subtask(description: str = "Create study blocks") -> Subtask:
+    return Subtask(id=generate_id(), agent=AgentType.STUDY_AGENT, description=description)
+
+
+@pytest.mark.asyncio
+async def test_proposal_cache_hits_and_rebases_to_planning_day(monkeypatch):
+    """Test that cached proposals are reused, moved to today's plan and re-keyed."""
+    client = FetchClient()
+    memory = MemoryPrefs(user_id="cache_user")
+    
+    first = await client.propose_plan(make_subtask(), memory)
+    again = await client.propose_plan(make_subtask("  create STUDY blocks "), memory)
+    
+    assert client._cache.hits == 1
+    assert [b.start_iso for b in again] == [b.start_iso for b in first]
+    assert not {b.id for b in again} & {b.id for b in first}
+    
+    # A day later the same proposal is served for the new planning day
+    next_day = client._planning_day() + timedelta(days=1)
+    monkeypatch.setattr(client, "_planning_day", lambda: next_day)
+    later = await client.propose_plan(make_subtask(), memory)
+    
+    assert client._cache.hits == 2
+    assert [datetime.fromisoformat(b.start_iso) for b in later] == [
+        datetime.fromisoformat(b.start_iso) + timedelta(days=1) for b in first
+    ]
+    
+    # Different preferences miss
+    await client.propose_plan(make_subtask(), memory.model_copy(update={"study_block_minutes": 60}))
+    assert client._cache.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_prefs_upsert_invalidates_user_proposals():
+    """Test that saving preferences drops that user's cached proposals only."""
+    memory = MemoryPrefs(user_id="invalidate_user")
+    other = MemoryPrefs(user_id="other_user")
+    await fetch_client.propose_plan(make_subtask(), memory)
+    await fetch_client.propose_plan(make_subtask(), other)
+    
+    await letta_client.upsert_prefs(memory)
+    
+    misses = fetch_client._cache.misses
+    await fetch_client.propose_plan(make_subtask(), memory)
+    await fetch_client.propose_plan(make_subtask(), other)
+    assert fetch_client._cache.misses == misses + 1
+
+
+def test_ttl_cache_expiry_and_bounds():
+    """Test TTL expiry, LRU eviction by count and by size."""
+    now = [0.0]
+    cache = TTLCache(max_entries=3, ttl_seconds=10, max_bytes=100, clock=lambda: now[0])
+    
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=10)
+    cache.set("c", 3, size=10)
+    assert cache.get("a") == 1
+    cache.set("d", 4, size=10)
+    assert cache.get("b") is None  # least recently used
+    
+    cache.set("e", 5, size=80)
+    assert cache.get("c") is None  # evicted to stay within max_bytes
+    assert cache.bytes == 100
+    assert cache.get("e") == 5 and cache.get("d") == 4
+    
+    now[0] = 11
+    assert cache.get("e") is None
+    assert cache.stats()["expirations"] == 1
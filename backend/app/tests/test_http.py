@@ -0,0 +1,74 @@
+"""Tests for the shared HTTP client pool."""
+import asyncio
+import pytest
+from app.adapters.anthropic_client import AnthropicClient
+from app.util.http import HTTPClientPool, http_pool
+
+
+async def start_keepalive_stand_in(connections: list):
+    """Serve Messages API responses on localhost, keeping connections open."""
+    body = (
+        b'{"content": [{"type": "text", "text": "{\\"ok\\": true}"}], '
+        b'"usage": {"input_tokens": 1, "output_tokens": 1}}'
+    )
+    
+    async def handle(reader, writer):
+        connections.append(writer)
+        while True:
+            try:
+                headers = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            length = next(
+                int(line.split(b":")[1]) for line in headers.split(b"\r\n")
+                if line.lower().startswith(b"content-length")
+            )
+            await reader.readexactly(length)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+                + f"content-length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        writer.close()
+    
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/v1"
+
+
+@pytest.mark.asyncio
+async def test_adapter_requests_reuse_pooled_connections():
+    """Test that sequential calls share one keep-alive connection and are counted."""
+    connections = []
+    server, url = await start_keepalive_stand_in(connections)
+    client = AnthropicClient()
+    client.api_key = "test-key"
+    client.base_url = url
+    
+    async with server:
+        for _ in range(5):
+            assert await client.complete_json("ping", "Reply with JSON") == {"ok": True}
+        
+        host = url.rsplit("/", 1)[0]
+        stats = http_pool.stats()["hosts"][host]
+        assert len(connections) == 1
+        assert stats["requests"] == 5
+        assert stats["connections"] == 1 and stats["idle"] == 1
+        
+        await http_pool.close()
+    
+    assert host not in http_pool.stats()["hosts"]
+
+
+@pytest.mark.asyncio
+async def test_pool_keeps_one_client_per_host():
+    """Test that hosts get separate clients and paths share one."""
+    pool = HTTPClientPool()
+    
+    first = pool.client("https://api.example.com/v1")
+    assert pool.client("https://api.example.com/other") is first
+    assert pool.client("https://logs.example.com") is not first
+    assert set(pool.stats()["hosts"]) == {"https://api.example.com", "https://logs.example.com"}
+    
+    await pool.close()
+    assert pool.stats()["hosts"] == {}
@@ -0,0 +1,118 @@
+"""Tests for background job mode."""
+import asyncio
+import pytest
+from httpx import AsyncClient
+from app.main import app
+from app.config import settings
+from app.models.domain import Subtask, AgentType, JobStatus, JobPriority
+from app.services.jobs import job_service
+from app.services.orchestrator import orchestrator_service
+from app.util.errors import JobError
+from app.util.ids import generate_id
+
+
+@pytest.fixture(autouse=True)
+async def stop_workers():
+    """Stop the pool before this test's event loop closes."""
+    yield
+    await job_service.shutdown()
+
+
+def make_subtask(description: str) -> Subtask:
+    return Subtask(id=generate_id(), agent=AgentType.STUDY_AGENT, description=description)
+
+
+async def wait_for_job(job_id: str, timeout: float = 5.0):
+    """Poll until a job finishes."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        job = job_service.get(job_id)
+        if job.status in (JobStatus.SUCCEEDED, JobStatus.FAILED):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+@pytest.mark.asyncio
+async def test_async_run_returns_job_then_status():
+    """Test async run queues a job whose result is available from the status endpoint."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/agents/run?async=true",
+            json={
+                "user_id": "job_user",
+                "subtasks": [make_subtask("Create study blocks").model_dump()],
+                "trace_id": "job_trace"
+            }
+        )
+        
+        assert response.status_code == 202
+        data = response.json()
+        assert data["status"] == "queued"
+        assert data["trace_id"] == "job_trace"
+        
+        await wait_for_job(data["job_id"])
+        response = await client.get(f"/api/jobs/{data['job_id']}")
+        
+        assert response.status_code == 200
+        job = response.json()["job"]
+        assert job["status"] == "succeeded"
+        assert len(job["timeline"]) > 0
+        
+        response = await client.get("/api/jobs/missing")
+        assert response.status_code == 404
+        
+        response = await client.get("/api/metrics")
+        jobs = response.json()["metrics"]["jobs"]
+        assert jobs["succeeded"] >= 1
+        assert jobs["wait_seconds"]["count"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_interactive_jobs_run_before_batch(monkeypatch):
+    """Test queued interactive jobs overtake queued batch jobs."""
+    monkeypatch.setattr(settings, "job_workers", 1)
+    started = []
+    release = asyncio.Event()
+    
+    async def fake_execute(user_id, subtasks, trace_id, failure_policy=None):
+        started.append(subtasks[0].description)
+        await release.wait()
+        return []
+    
+    monkeypatch.setattr(orchestrator_service, "execute_subtasks", fake_execute)
+    
+    blocker = await job_service.submit("u", [make_subtask("blocker")], "t")
+    await asyncio.sleep(0.01)
+    batch = await job_service.submit("u", [make_subtask("batch")], "t", priority=JobPriority.BATCH)
+    interactive = await job_service.submit("u", [make_subtask("interactive")], "t")
+    release.set()
+    
+    for job in (blocker, batch, interactive):
+        await wait_for_job(job.id)
+    assert started == ["blocker", "interactive", "batch"]
+
+
+@pytest.mark.asyncio
+async def test_submit_rejects_when_queue_full(monkeypatch):
+    """Test a full queue rejects new jobs instead of growing."""
+    monkeypatch.setattr(settings, "job_workers", 1)
+    monkeypatch.setattr(settings, "job_queue_max_size", 1)
+    release = asyncio.Event()
+    
+    async def fake_execute(user_id, subtasks, trace_id, failure_policy=None):
+        await release.wait()
+        return []
+    
+    monkeypatch.setattr(orchestrator_service, "execute_subtasks", fake_execute)
+    
+    running = await job_service.submit("u", [make_subtask("running")], "t")
+    await asyncio.sleep(0.01)
+    queued = await job_service.submit("u", [make_subtask("queued")], "t")
+    with pytest.raises(JobError):
+        await job_service.submit("u", [make_subtask("rejected")], "t")
+    
+    release.set()
+    for job in (running, queued):
+        assert (await wait_for_job(job.id)).status == JobStatus.SUCCEEDED
@@ -0,0 +1,49 @@
+"""Tests for structured logging."""
+import json
+import logging
+import pytest
+from app.util import logging as app_logging
+from app.util.logging import log_info, log_warning, start_background_logging, stop_background_logging
+
+
+def entries(caplog) -> list[dict]:
+    return [json.loads(record.getMessage()) for record in caplog.records]
+
+
+def test_entries_keep_json_format_and_skip_disabled_levels(caplog, monkeypatch):
+    """Test the JSON fields, and that disabled levels build nothing."""
+    caplog.set_level(logging.WARNING, logger="taskweave")
+    
+    def fail(*args):
+        raise AssertionError("entry built below the active level")
+    
+    monkeypatch.setattr(app_logging, "LogEntry", fail)
+    log_info("dropped", trace_id="trace_1")
+    monkeypatch.undo()
+    log_warning("kept", trace_id="trace_1", block_id="evt_1", agent=None)
+    
+    [entry] = entries(caplog)
+    assert list(entry) == ["timestamp", "level", "message", "trace_id", "block_id"]
+    assert (entry["level"], entry["message"], entry["block_id"]) == ("WARNING", "kept", "evt_1")
+
+
+def test_background_writer_preserves_order(caplog):
+    """Test that queued entries are all written, in order, on stop."""
+    caplog.set_level(logging.INFO, logger="taskweave")
+    start_background_logging(max_queue_size=1000)
+    try:
+        for i in range(200):
+            log_info(f"event {i}", n=i)
+        assert app_logging.logging_stats()["background"]
+    finally:
+        stop_background_logging()
+    
+    assert [entry["n"] for entry in entries(caplog)] == list(range(200))
+    assert not app_logging.logging_stats()["background"]
+
+
+@pytest.mark.skipif(app_logging.orjson is None, reason="orjson not installed")
+def test_orjson_encoder_matches_json():
+    """Test that both encoders produce the same document."""
+    entry = {"timestamp": "2025-01-06T08:00:00", "message": "héllo", "count": 3, "ratio": 0.5}
+    assert json.loads(app_logging._encode_orjson(entry)) == json.loads(app_logging._encode_json(entry))
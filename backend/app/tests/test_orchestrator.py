@@ -1,7 +1,16 @@
 """Tests for orchestrator service."""
+import asyncio
+import time
 import pytest
+from app.adapters.anthropic_client import anthropic_client
+from app.adapters.fetch_client import fetch_client
+from app.config import settings
+from app.models.events import EventType
+from app.services.event_bus import event_bus
 from app.services.orchestrator import orchestrator_service
-from app.models.domain import Subtask, AgentType
+from app.services.planner import planner_service
+from app.models.domain import Subtask, AgentType, FailurePolicy
+from app.util.errors import OrchestratorError
 from app.util.ids import generate_id
 
 
@@ -59,3 +68,337 @@ async def test_execute_subtasks_produces_no_overlaps():
         next_start = timeline[i + 1].start_iso
         assert current_end <= next_start, "Found overlapping blocks"
 
+
+def make_subtasks() -> list[Subtask]:
+    """One subtask per agent type."""
+    return [
+        Subtask(id=generate_id(), agent=agent, description=f"Work for {agent.value}")
+        for agent in AgentType
+    ]
+
+
+@pytest.mark.asyncio
+async def test_execute_subtasks_runs_agents_concurrently(monkeypatch):
+    """Test that run latency is the slowest agent, not the sum."""
+    original = fetch_client.propose_plan
+    
+    async def slow_propose(subtask, memory):
+        await asyncio.sleep(0.2)
+        return await original(subtask, memory)
+    
+    monkeypatch.setattr(fetch_client, "propose_plan", slow_propose)
+    
+    started = time.perf_counter()
+    timeline = await orchestrator_service.execute_subtasks("test_user", make_subtasks(), "test_trace")
+    elapsed = time.perf_counter() - started
+    
+    assert len(timeline) > 0
+    assert elapsed < 0.5
+
+
+@pytest.mark.asyncio
+async def test_execute_subtasks_failure_policies(monkeypatch):
+    """Test drop, retry and fail handling of a failing or hanging agent."""
+    original = fetch_client.propose_plan
+    calls = {"meal_agent": 0}
+    
+    async def flaky_propose(subtask, memory):
+        if subtask.agent == AgentType.CALENDAR_AGENT:
+            await asyncio.sleep(10)
+        if subtask.agent == AgentType.MEAL_AGENT:
+            calls["meal_agent"] += 1
+            if calls["meal_agent"] == 1:
+                raise RuntimeError("agent unavailable")
+        return await original(subtask, memory)
+    
+    monkeypatch.setattr(fetch_client, "propose_plan", flaky_propose)
+    monkeypatch.setattr(settings, "agent_timeout_seconds", 0.1)
+    
+    # Drop: the hanging calendar agent and the failing meal agent are left out
+    timeline = await orchestrator_service.execute_subtasks(
+        "test_user", make_subtasks(), "test_trace", FailurePolicy.DROP
+    )
+    assert {block.source_agent for block in timeline} == {"study_agent"}
+    
+    # Retry: the meal agent succeeds on its second attempt
+    calls["meal_agent"] = 0
+    timeline = await orchestrator_service.execute_subtasks(
+        "test_user", make_subtasks()[:2], "test_trace", FailurePolicy.RETRY
+    )
+    assert {block.source_agent for block in timeline} == {"study_agent", "meal_agent"}
+    
+    # Fail, or retry without success: the timeout fails the whole run
+    for policy in (FailurePolicy.FAIL, FailurePolicy.RETRY):
+        with pytest.raises(OrchestratorError):
+            await orchestrator_service.execute_subtasks(
+                "test_user", make_subtasks(), "test_trace", policy
+            )
+
+
+@pytest.mark.asyncio
+async def test_stream_subtasks_publishes_progressive_updates(monkeypatch):
+    """Test that streaming yields a timeline per agent, then the full merge."""
+    original = fetch_client.propose_plan
+    delays = {AgentType.STUDY_AGENT: 0.3, AgentType.MEAL_AGENT: 0.0, AgentType.CALENDAR_AGENT: 0.1}
+    
+    async def staggered_propose(subtask, memory):
+        await asyncio.sleep(delays[subtask.agent])
+        return await original(subtask, memory)
+    
+    monkeypatch.setattr(fetch_client, "propose_plan", staggered_propose)
+    subtasks = make_subtasks()
+    
+    started = time.perf_counter()
+    updates = []
+    async for update in orchestrator_service.stream_subtasks("stream_user", subtasks, "test_trace"):
+        updates.append((time.perf_counter() - started, update))
+    
+    assert [update.seq for _, update in updates] == [1, 2, 3, 4]
+    assert [update.final for _, update in updates] == [False, False, False, True]
+    
+    # The fastest agent's blocks arrive well before the slowest agent finishes
+    first_at, first = updates[0]
+    assert first_at < 0.2
+    assert {block["source_agent"] for block in first.blocks} == {"meal_agent"}
+    
+    expected = await orchestrator_service.execute_subtasks("batch_user", subtasks, "test_trace")
+    final = updates[-1][1]
+    assert [(b["title"], b["start_iso"], b["end_iso"]) for b in final.blocks] == [
+        (b.title, b.start_iso, b.end_iso) for b in expected
+    ]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_streamed_runs_keep_their_own_timelines(monkeypatch):
+    """Test that two streamed runs for one user do not mix or wipe each other's blocks."""
+    from app.services.timeline import timeline_service
+    
+    original = fetch_client.propose_plan
+    
+    async def staggered_propose(subtask, memory):
+        await asyncio.sleep(0.05 if subtask.agent == AgentType.MEAL_AGENT else 0.1)
+        return await original(subtask, memory)
+    
+    monkeypatch.setattr(fetch_client, "propose_plan", staggered_propose)
+    subtasks = make_subtasks()
+    
+    async def run(agents, trace_id):
+        chosen = [subtask for subtask in subtasks if subtask.agent in agents]
+        return [update async for update in orchestrator_service.stream_subtasks("shared_user", chosen, trace_id)]
+    
+    first, second = await asyncio.gather(
+        run({AgentType.STUDY_AGENT, AgentType.CALENDAR_AGENT}, "trace_a"),
+        run({AgentType.MEAL_AGENT}, "trace_b")
+    )
+    
+    def agents(updates):
+        return {block["source_agent"] for update in updates for block in update.blocks}
+    
+    assert agents(first) == {"study_agent", "calendar_agent"}
+    assert agents(second) == {"meal_agent"}
+    assert first[-1].final and first[-1].blocks
+    # The run that finished last is the stored timeline
+    stored = timeline_service.get_timeline("shared_user")
+    assert [block.model_dump() for block in stored] == first[-1].blocks
+
+
+@pytest.mark.asyncio
+async def test_execute_subtasks_coalesces_identical_concurrent_runs(monkeypatch):
+    """Test that identical concurrent runs share one set of agent calls."""
+    original = fetch_client.propose_plan
+    calls = []
+    
+    async def slow_propose(subtask, memory):
+        calls.append(subtask.agent)
+        await asyncio.sleep(0.05)
+        return await original(subtask, memory)
+    
+    monkeypatch.setattr(fetch_client, "propose_plan", slow_propose)
+    subtasks = make_subtasks()
+    resubmitted = [subtask.model_copy(update={"id": generate_id()}) for subtask in subtasks]
+    
+    first, second = await asyncio.gather(
+        orchestrator_service.execute_subtasks("coalesce_user", subtasks, "trace_a"),
+        orchestrator_service.execute_subtasks("coalesce_user", resubmitted, "trace_b")
+    )
+    
+    assert len(calls) == len(subtasks)
+    assert [b.model_dump() for b in first] == [b.model_dump() for b in second]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_runs_publish_agent_logs_under_every_trace(monkeypatch):
+    """Test that a caller joining a run still sees its agent progress under its own trace."""
+    original = fetch_client.propose_plan
+    
+    async def slow_propose(subtask, memory):
+        await asyncio.sleep(0.05)
+        return await original(subtask, memory)
+    
+    published = []
+    
+    async def capture(event):
+        published.append(event)
+    
+    monkeypatch.setattr(fetch_client, "propose_plan", slow_propose)
+    monkeypatch.setattr(event_bus, "publish", capture)
+    subtasks = make_subtasks()
+    
+    await asyncio.gather(
+        orchestrator_service.execute_subtasks("joined_user", subtasks, "trace_a"),
+        orchestrator_service.execute_subtasks("joined_user", subtasks, "trace_b")
+    )
+    
+    logs = [event for event in published if event.type == EventType.AGENT_LOG]
+    by_trace = {
+        trace: [(event.payload["agent"], event.payload["message"]) for event in logs if event.trace_id == trace]
+        for trace in ("trace_a", "trace_b")
+    }
+    assert by_trace["trace_a"]
+    assert by_trace["trace_a"] == by_trace["trace_b"]
+    assert len(logs) == 2 * len(by_trace["trace_a"])
+
+
+@pytest.mark.asyncio
+async def test_different_runs_can_share_a_trace(monkeypatch):
+    """Test that two distinct runs under one trace both finish and log once each."""
+    original = fetch_client.propose_plan
+    
+    async def slow_propose(subtask, memory):
+        await asyncio.sleep(0.05)
+        return await original(subtask, memory)
+    
+    published = []
+    
+    async def capture(event):
+        published.append(event)
+    
+    monkeypatch.setattr(fetch_client, "propose_plan", slow_propose)
+    monkeypatch.setattr(event_bus, "publish", capture)
+    subtasks = make_subtasks()
+    
+    first, second = await asyncio.gather(
+        orchestrator_service.execute_subtasks("shared_trace_user", subtasks[:1], "trace_t"),
+        orchestrator_service.execute_subtasks("shared_trace_user", subtasks[1:], "trace_t")
+    )
+    
+    assert first and second
+    logs = [event for event in published if event.type == EventType.AGENT_LOG]
+    assert {event.trace_id for event in logs} == {"trace_t"}
+    # A start and a finish per agent, none duplicated across the two runs
+    assert len(logs) == 2 * len(subtasks)
+
+
+@pytest.mark.asyncio
+async def test_plan_and_execute_overlaps_planning_with_speculative_agents(monkeypatch):
+    """Test that agents guessed from the query run while the planner is in flight."""
+    original_complete = anthropic_client.complete_json
+    original_propose = fetch_client.propose_plan
+    proposed = []
+    
+    async def slow_complete(prompt, system_prompt, **kwargs):
+        await asyncio.sleep(0.2)
+        return await original_complete(prompt=prompt, system_prompt=system_prompt, **kwargs)
+    
+    async def slow_propose(subtask, memory):
+        proposed.append(subtask.agent)
+        await asyncio.sleep(0.2)
+        return await original_propose(subtask, memory)
+    
+    # Time only the simulated latency, not a real upstream round trip
+    monkeypatch.setattr(anthropic_client, "api_key", None)
+    monkeypatch.setattr(anthropic_client, "complete_json", slow_complete)
+    monkeypatch.setattr(fetch_client, "propose_plan", slow_propose)
+    kept = orchestrator_service.speculation_kept
+    
+    # Below the fast-path threshold, so Claude (mocked) plans for real
+    started = time.perf_counter()
+    subtasks, rationale, timeline = await orchestrator_service.plan_and_execute(
+        "Organize my study schedule",
+        "speculation_user",
+        "test_trace"
+    )
+    elapsed = time.perf_counter() - started
+    
+    assert len(subtasks) == 3 and rationale and len(timeline) > 0
+    # The guess matched the plan: every agent ran once, in parallel with planning
+    assert sorted(proposed) == sorted(AgentType)
+    assert orchestrator_service.speculation_kept - kept == 3
+    assert elapsed < 0.35
+
+
+@pytest.mark.asyncio
+async def test_plan_and_execute_redoes_only_mismatched_subtasks(monkeypatch):
+    """Test that speculative agents missing from the plan are cancelled and replaced."""
+    guess = planner_service.speculate("Organize my study schedule")
+    plan = [subtask.model_copy() for subtask in guess]
+    plan[1] = plan[1].model_copy(update={"description": "Cook vegetarian dinners"})
+    original_propose = fetch_client.propose_plan
+    finished = []
+    
+    async def fixed_plan(query, user_id):
+        await asyncio.sleep(0.05)
+        return plan, "Custom plan"
+    
+    async def slow_propose(subtask, memory):
+        await asyncio.sleep(0.1)
+        finished.append(subtask.description)
+        return await original_propose(subtask, memory)
+    
+    monkeypatch.setattr(planner_service, "parse_query", fixed_plan)
+    monkeypatch.setattr(fetch_client, "propose_plan", slow_propose)
+    before = orchestrator_service.speculation_stats()
+    
+    subtasks, _, _ = await orchestrator_service.plan_and_execute(
+        "Organize my study schedule",
+        "speculation_user",
+        "test_trace"
+    )
+    
+    after = orchestrator_service.speculation_stats()
+    assert subtasks == plan
+    assert sorted(finished) == sorted(subtask.description for subtask in plan)
+    assert after["kept"] - before["kept"] == 2
+    assert after["redone"] - before["redone"] == 1
+
+
+@pytest.mark.asyncio
+async def test_plan_and_execute_keeps_guesses_the_planner_reworded(monkeypatch):
+    """Test that a plan worded differently from the template still keeps the guessed agents."""
+    guess = planner_service.speculate("Organize my study schedule")
+    reworded = {
+        AgentType.STUDY_AGENT: "Build a weekly study plan covering algorithms practice",
+        AgentType.MEAL_AGENT: "Plan healthy meals for the week",
+        AgentType.CALENDAR_AGENT: "Block out study sessions on the calendar"
+    }
+    plan = [
+        subtask.model_copy(update={"id": generate_id(), "description": reworded[subtask.agent]})
+        for subtask in guess
+    ]
+    original_propose = fetch_client.propose_plan
+    proposed = []
+    
+    async def fixed_plan(query, user_id):
+        await asyncio.sleep(0.05)
+        return plan, "Custom plan"
+    
+    async def slow_propose(subtask, memory):
+        proposed.append(subtask.description)
+        await asyncio.sleep(0.1)
+        return await original_propose(subtask, memory)
+    
+    monkeypatch.setattr(planner_service, "parse_query", fixed_plan)
+    monkeypatch.setattr(fetch_client, "propose_plan", slow_propose)
+    before = orchestrator_service.speculation_stats()
+    
+    subtasks, _, timeline = await orchestrator_service.plan_and_execute(
+        "Organize my study schedule",
+        "speculation_user",
+        "test_trace"
+    )
+    
+    after = orchestrator_service.speculation_stats()
+    assert subtasks == plan and timeline
+    assert sorted(proposed) == sorted(subtask.description for subtask in guess)
+    assert after["kept"] - before["kept"] == 3
+    assert after["redone"] - before["redone"] == 0
@@ -1,7 +1,19 @@
 """Tests for planner service."""
+import asyncio
+import json
 import pytest
-from app.services.planner import planner_service
-from app.models.domain import AgentType
+from app.adapters.anthropic_client import anthropic_client
+from app.adapters.letta_client import letta_client
+from app.config import settings
+from app.services.planner import PlannerService, planner_service
+from app.models.domain import AgentType, MemoryPrefs
+from app.util.errors import PlannerError
+from app.util.json_stream import StreamingObjectParser
+
+
+async def claude_stand_in(prompt, system_prompt, **kwargs):
+    """A planner answer as Claude would return it (a plain dict, not the mock)."""
+    return dict(anthropic_client._mock_response(prompt))
 
 
 @pytest.mark.asyncio
@@ -45,3 +57,249 @@ async def test_parse_query_provides_descriptions():
         assert len(subtask.description) > 10
         assert subtask.id is not None
 
+
+@pytest.mark.asyncio
+async def test_parse_query_coalesces_identical_concurrent_requests(monkeypatch):
+    """Test that concurrent identical queries share one planner call."""
+    monkeypatch.setattr(settings, "planner_fast_path_threshold", 1.01)
+    original = anthropic_client.complete_json
+    calls = []
+    
+    async def slow_complete(prompt, system_prompt, **kwargs):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return await original(prompt=prompt, system_prompt=system_prompt, **kwargs)
+    
+    monkeypatch.setattr(anthropic_client, "complete_json", slow_complete)
+    before = planner_service._flights.coalesced
+    
+    results = await asyncio.gather(
+        planner_service.parse_query("Plan my finals week", "coalesce_user"),
+        planner_service.parse_query("  plan my   FINALS week ", "coalesce_user"),
+        planner_service.parse_query("Plan my finals week", "coalesce_user")
+    )
+    
+    assert len(calls) == 1
+    assert planner_service._flights.coalesced - before == 2
+    assert results[0][0] == results[1][0]
+    assert results[0][0][0] is not results[1][0][0]
+
+
+@pytest.mark.asyncio
+async def test_plan_cache_serves_fresh_ids_per_prefs(monkeypatch):
+    """Test that repeated queries hit the plan cache with fresh subtask IDs."""
+    monkeypatch.setattr(settings, "planner_fast_path_threshold", 1.01)
+    calls = []
+    
+    async def counting_complete(prompt, system_prompt, **kwargs):
+        calls.append(prompt)
+        return await claude_stand_in(prompt, system_prompt, **kwargs)
+    
+    monkeypatch.setattr(anthropic_client, "complete_json", counting_complete)
+    planner = PlannerService()
+    
+    first, rationale = await planner.parse_query("Help me study for my midterm", "cache_user_a")
+    again, cached_rationale = await planner.parse_query("help me  STUDY for my midterm", "cache_user_b")
+    
+    assert len(calls) == 1
+    assert cached_rationale == rationale
+    assert [s.description for s in again] == [s.description for s in first]
+    assert not {s.id for s in again} & {s.id for s in first}
+    
+    # Planning preferences are part of the key; unrelated ones are not
+    await letta_client.upsert_prefs(MemoryPrefs(user_id="cache_user_c", dietary="vegan"))
+    await planner.parse_query("Help me study for my midterm", "cache_user_c")
+    assert len(calls) == 1
+    
+    await letta_client.upsert_prefs(MemoryPrefs(user_id="cache_user_d", sleep_start="22:00"))
+    await planner.parse_query("Help me study for my midterm", "cache_user_d")
+    assert len(calls) == 2
+    
+    stats = planner.cache_stats()
+    assert stats["llm_calls"] == 2
+    assert stats["llm_calls_avoided"] == 2
+    assert stats["hit_ratio"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_plan_cache_survives_restart_with_persistent_store(monkeypatch, tmp_path):
+    """Test that a new planner warms its cache from the persistent store."""
+    monkeypatch.setattr(settings, "planner_fast_path_threshold", 1.01)
+    monkeypatch.setattr(settings, "plan_cache_path", str(tmp_path / "plans.db"))
+    monkeypatch.setattr(anthropic_client, "complete_json", claude_stand_in)
+    first, rationale = await PlannerService().parse_query("Plan my project sprint", "persist_user")
+    
+    async def no_llm(prompt, system_prompt, **kwargs):
+        raise AssertionError("planner called the LLM on a warm cache")
+    
+    monkeypatch.setattr(anthropic_client, "complete_json", no_llm)
+    restarted = PlannerService()
+    again, cached_rationale = await restarted.parse_query("plan my project sprint", "persist_user")
+    
+    assert cached_rationale == rationale
+    assert [s.agent for s in again] == [s.agent for s in first]
+    assert restarted.cache_stats()["persistent"] is True
+
+
+@pytest.mark.asyncio
+async def test_mock_fallback_plans_are_not_cached(monkeypatch, tmp_path):
+    """Test that a plan from the mock fallback is neither cached nor persisted."""
+    monkeypatch.setattr(settings, "planner_fast_path_threshold", 1.01)
+    monkeypatch.setattr(settings, "plan_cache_path", str(tmp_path / "plans.db"))
+    monkeypatch.setattr(anthropic_client, "api_key", None)
+    planner = PlannerService()
+    
+    subtasks, _ = await planner.parse_query("Plan my project sprint", "fallback_user")
+    assert len(subtasks) == 3
+    async for _ in planner.stream_query("Plan my thesis writing", "fallback_user"):
+        pass
+    
+    assert planner.cache_stats()["entries"] == 0
+    assert planner.cache_stats()["llm_calls"] == 2
+    assert PlannerService().cache_stats()["entries"] == 0
+
+
+def sse_event(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def start_sse_stand_in(text: str, pause_after: int, finished: asyncio.Event):
+    """Serve one Messages API stream of ``text`` on localhost.
+    
+    The first ``pause_after`` characters are sent at once; the rest follows
+    a pause, after which ``finished`` is set.
+    """
+    async def handle(reader, writer):
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = next(
+            int(line.split(b":")[1]) for line in headers.split(b"\r\n")
+            if line.lower().startswith(b"content-length")
+        )
+        await reader.readexactly(length)
+        
+        writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\nconnection: close\r\n\r\n")
+        writer.write(sse_event("message_start", {
+            "type": "message_start",
+            "message": {"usage": {"input_tokens": 12, "cache_read_input_tokens": 400}}
+        }))
+        for part in (text[:pause_after], text[pause_after:]):
+            for i in range(0, len(part), 7):
+                writer.write(sse_event("content_block_delta", {
+                    "type": "content_block_delta",
+                    "delta": {"type": "text_delta", "text": part[i:i + 7]}
+                }))
+            await writer.drain()
+            await asyncio.sleep(0.2)
+        writer.write(sse_event("message_delta", {"type": "message_delta", "usage": {"output_tokens": 150}}))
+        writer.write(sse_event("message_stop", {"type": "message_stop"}))
+        finished.set()
+        await writer.drain()
+        writer.close()
+    
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def test_streaming_parser_yields_items_across_chunk_boundaries():
+    """Test that array items are decoded as soon as they close, whatever the chunking."""
+    doc = {
+        "rationale": 'Braces } and "quotes" inside strings',
+        "subtasks": [{"id": str(i), "agent": "study_agent", "description": "a, [b] {c}"} for i in range(3)]
+    }
+    text = "```json\n" + json.dumps(doc) + "\n```"
+    
+    parser = StreamingObjectParser("subtasks")
+    items = []
+    for char in text:
+        items.extend(parser.feed(char))
+        if len(items) == 1:
+            assert parser.fields == {"rationale": doc["rationale"]}
+    
+    assert items == doc["subtasks"]
+    assert parser.done
+    assert parser.result() == doc
+
+
+@pytest.mark.asyncio
+async def test_stream_query_yields_subtasks_before_stream_ends(monkeypatch):
+    """Test that subtasks arrive while the SSE stream is still open."""
+    plan = anthropic_client._mock_response("Plan my thesis writing")
+    text = json.dumps(plan)
+    first_end = text.index("}") + 1
+    finished = asyncio.Event()
+    server = await start_sse_stand_in(text, first_end, finished)
+    port = server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(anthropic_client, "api_key", "test-key")
+    monkeypatch.setattr(anthropic_client, "base_url", f"http://127.0.0.1:{port}/v1")
+    
+    loop = asyncio.get_running_loop()
+    received = []
+    async with server:
+        async for subtask, rationale in PlannerService().stream_query("Plan my thesis writing", "sse_user"):
+            received.append((subtask, rationale, loop.time()))
+        assert not finished.is_set()
+    
+    assert [s.description for s, _, _ in received] == [t["description"] for t in plan["subtasks"]]
+    assert all(rationale == plan["rationale"] for _, rationale, _ in received)
+    # The first subtask was yielded before the stand-in sent the rest
+    assert received[1][2] - received[0][2] >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_stream_query_rejects_incomplete_plan(monkeypatch):
+    """Test that a plan with too few subtasks raises."""
+    async def short_stream(prompt, system_prompt, **kwargs):
+        yield json.dumps({"rationale": "r", "subtasks": [
+            {"id": "1", "agent": "study_agent", "description": "Study"}
+        ]})
+    
+    monkeypatch.setattr(anthropic_client, "stream_text", short_stream)
+    with pytest.raises(PlannerError):
+        async for _ in PlannerService().stream_query("Plan a short week", "short_user"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_fast_path_skips_llm_for_confident_intents(monkeypatch):
+    """Test that confident intents are planned locally and others go to the LLM."""
+    original = anthropic_client.complete_json
+    calls = []
+    
+    async def counting_complete(prompt, system_prompt, **kwargs):
+        calls.append(prompt)
+        return await original(prompt=prompt, system_prompt=system_prompt, **kwargs)
+    
+    monkeypatch.setattr(anthropic_client, "complete_json", counting_complete)
+    planner = PlannerService()
+    
+    first, rationale = await planner.parse_query("Help me study for my midterm", "fast_user")
+    again, _ = await planner.parse_query("Help me study for my midterm", "fast_user")
+    
+    assert calls == []
+    assert [s.agent for s in first] == [AgentType.STUDY_AGENT, AgentType.MEAL_AGENT, AgentType.CALENDAR_AGENT]
+    assert "exam" in rationale
+    assert not {s.id for s in again} & {s.id for s in first}
+    
+    # Mixed intents are ambiguous and unknown words lower confidence
+    await planner.parse_query("I need to study for exams and finish my coding project", "fast_user")
+    await planner.parse_query("Plan my thesis writing", "fast_user")
+    assert len(calls) == 2
+    
+    stats = planner.fast_path_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert stats["threshold"] == settings.planner_fast_path_threshold
+
+
+def test_mock_plans_use_the_fast_path_templates():
+    """Test that the mock answer plans the matched intent's template."""
+    from app.services.intent import INTENTS
+    
+    for intent, query in zip(INTENTS, ["Help me revise for my exam", "Debug my hackathon project"]):
+        plan = anthropic_client._mock_response(query)
+        assert plan["rationale"] == intent.rationale
+        assert [(s["agent"], s["description"]) for s in plan["subtasks"]] == [
+            (agent.value, description) for agent, description in intent.descriptions.items()
+        ]
+    
+    general = anthropic_client._mock_response("Plan my thesis writing")
+    assert general["rationale"] not in {intent.rationale for intent in INTENTS}
+    assert len(general["subtasks"]) == 3
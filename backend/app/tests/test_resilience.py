@@ -0,0 +1,220 @@
+"""Tests for upstream retries, circuit breaking and hedging."""
+import asyncio
+import httpx
+import pytest
+from app.main import app
+from app.util.errors import UpstreamUnavailableError
+from app.util.resilience import CircuitBreaker, Resilience, resilience_registry
+
+
+def status_error(status: int, headers: dict = None) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://upstream.test/v1/messages")
+    response = httpx.Response(status, request=request, headers=headers)
+    return httpx.HTTPStatusError(f"{status}", request=request, response=response)
+
+
+def make_resilience(name: str, **kwargs) -> Resilience:
+    kwargs.setdefault("backoff_base", 0.0)
+    kwargs.setdefault("hedge", False)
+    return Resilience(name, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def forget_test_upstreams():
+    """Keep test upstreams out of health output for other tests."""
+    yield
+    for name in [name for name in resilience_registry if name.startswith("test_")]:
+        del resilience_registry[name]
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_then_succeeds():
+    """Test that retryable statuses are retried and client errors are not."""
+    resilience = make_resilience("test_retry", max_retries=2)
+    outcomes = [status_error(503), status_error(429, {"retry-after": "0"}), "ok"]
+    
+    async def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    
+    assert await resilience.call(flaky) == "ok"
+    assert resilience.retries == 2
+    
+    calls = []
+    
+    async def bad_request():
+        calls.append(1)
+        raise status_error(400)
+    
+    with pytest.raises(httpx.HTTPStatusError):
+        await resilience.call(bad_request)
+    assert len(calls) == 1
+    assert resilience.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_fails_fast_and_recovers():
+    """Test open -> fail fast -> half-open trial -> closed."""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10, clock=lambda: now[0])
+    resilience = make_resilience("test_breaker", max_retries=0, breaker=breaker)
+    calls = []
+    
+    async def down():
+        calls.append(1)
+        raise httpx.ConnectError("refused")
+    
+    for _ in range(3):
+        with pytest.raises(httpx.ConnectError):
+            await resilience.call(down)
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    with pytest.raises(UpstreamUnavailableError):
+        await resilience.call(down)
+    assert len(calls) == 3
+    
+    now[0] = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    
+    async def up():
+        return "ok"
+    
+    assert await resilience.call(up) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert resilience.stats()["opened"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_over_slow_first_attempt(monkeypatch):
+    """Test that a request slower than p95 gets a second attempt that can win."""
+    monkeypatch.setattr("app.util.resilience.settings.upstream_hedge_min_samples", 5)
+    resilience = make_resilience("test_hedge", hedge=True)
+    for _ in range(5):
+        resilience.latency.record(0.02)
+    delays = [1.0, 0.0]
+    
+    async def request():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+    
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert await resilience.call(request) == 0.0
+    assert loop.time() - started < 0.5
+    assert (resilience.hedged, resilience.hedge_wins) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_health_reports_breaker_state():
+    """Test that an open circuit shows up in health output."""
+    resilience = make_resilience("test_health", max_retries=0)
+    resilience.breaker.failure_threshold = 1
+    
+    async def down():
+        raise httpx.ConnectError("refused")
+    
+    with pytest.raises(httpx.ConnectError):
+        await resilience.call(down)
+    
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/health")
+    
+    data = response.json()
+    assert data["status"] == "degraded"
+    assert data["breakers"]["test_health"] == "open"
+    assert data["breakers"]["anthropic"] == "closed"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_does_not_leave_breaker_half_open():
+    """Test that a cancelled half-open trial lets the next call try again."""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: now[0])
+    resilience = make_resilience("test_cancel", max_retries=0, breaker=breaker)
+    
+    async def down():
+        raise httpx.ConnectError("refused")
+    
+    with pytest.raises(httpx.ConnectError):
+        await resilience.call(down)
+    now[0] = 10
+    
+    async def hang():
+        await asyncio.sleep(10)
+    
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(resilience.call(hang), 0.01)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    
+    async def up():
+        return "ok"
+    
+    assert await resilience.call(up) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    
+    # A trial that is never given back is replaced after the reset window
+    breaker.record_failure()
+    now[0] = 20
+    assert breaker.allow()
+    assert not breaker.allow()
+    now[0] = 30
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_health_is_degraded_while_half_open():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: now[0])
+    make_resilience("test_half_open", breaker=breaker)
+    breaker.record_failure()
+    now[0] = 10
+    
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/health")
+    
+    data = response.json()
+    assert data["breakers"]["test_half_open"] == "half_open"
+    assert data["status"] == "degraded"
+
+
+@pytest.mark.asyncio
+async def test_stream_text_ends_every_trial(monkeypatch):
+    """Test that a streamed trial closes, re-opens or releases the breaker."""
+    from app.adapters.anthropic_client import anthropic_client
+    
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: now[0])
+    monkeypatch.setattr(anthropic_client, "_resilience", make_resilience("test_stream", breaker=breaker))
+    monkeypatch.setattr(anthropic_client, "api_key", "test-key")
+    statuses = []
+    
+    async def handler(request):
+        status = statuses.pop(0)
+        if status is None:
+            await asyncio.sleep(10)
+        return httpx.Response(status, request=request)
+    
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr("app.adapters.anthropic_client.http_pool.client", lambda base_url: client)
+    
+    async def trial(status):
+        statuses.append(status)
+        breaker.record_failure()
+        now[0] += 10
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        return "".join([chunk async for chunk in anthropic_client.stream_text("plan", "system")])
+    
+    # The upstream refusing the request still shows it is up
+    assert await trial(400)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert await trial(503)
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(trial(None), 0.05)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    await client.aclose()
@@ -1,7 +1,11 @@
 """Tests for API routes."""
 import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
 from httpx import AsyncClient
 from app.main import app
+from app.models.events import EventType
+from app.services.event_bus import event_bus
 
 
 @pytest.mark.asyncio
@@ -37,6 +41,51 @@ async def test_plan_endpoint():
         assert "trace_id" in data
 
 
+@pytest.mark.asyncio
+async def test_plan_stream_publishes_each_subtask():
+    """Test streamed plan publishes PLAN_SUBTASK events before PLAN_COMPLETE."""
+    seen = []
+    
+    async def record(event):
+        seen.append(event)
+    
+    event_bus.subscribe(EventType.PLAN_SUBTASK, record)
+    event_bus.subscribe(EventType.PLAN_COMPLETE, record)
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/api/plan",
+                json={"user_id": "stream_plan_user", "query": "Plan my exam week", "stream": True}
+            )
+    finally:
+        event_bus.unsubscribe(EventType.PLAN_SUBTASK, record)
+        event_bus.unsubscribe(EventType.PLAN_COMPLETE, record)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [event.type for event in seen] == [EventType.PLAN_SUBTASK] * 3 + [EventType.PLAN_COMPLETE]
+    assert [event.payload["subtask"]["id"] for event in seen[:3]] == [s["id"] for s in data["subtasks"]]
+    assert seen[2].payload["rationale"] == data["rationale"]
+
+
+@pytest.mark.asyncio
+async def test_plan_run_endpoint():
+    """Test combined plan and run endpoint."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/plan/run",
+            json={"user_id": "plan_run_user", "query": "Help me prepare for exams"}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["subtasks"]) == 3
+        assert len(data["timeline"]) > 0
+        
+        response = await client.get("/api/metrics")
+        assert response.json()["metrics"]["speculation"]["keep_rate"] > 0
+
+
 @pytest.mark.asyncio
 async def test_memory_get_endpoint():
     """Test memory retrieval endpoint."""
@@ -98,6 +147,41 @@ async def test_agents_run_endpoint():
         assert isinstance(data["timeline"], list)
 
 
+@pytest.mark.asyncio
+async def test_agents_run_stream_then_replan_endpoint():
+    """Test streamed agents run followed by an incremental re-plan."""
+    subtask = {
+        "id": "test_id_1",
+        "agent": "study_agent",
+        "description": "Create study blocks"
+    }
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/agents/run",
+            json={
+                "user_id": "stream_user",
+                "subtasks": [subtask],
+                "trace_id": "test_trace",
+                "stream": True
+            }
+        )
+        
+        assert response.status_code == 200
+        timeline = response.json()["timeline"]
+        assert len(timeline) > 0
+        
+        response = await client.post(
+            "/api/agents/replan",
+            json={"user_id": "stream_user", "subtask": subtask, "trace_id": "test_trace"}
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        # Fresh proposals replace every previous study block
+        assert set(data["removed_ids"]) == {block["id"] for block in timeline}
+        assert len(data["changed"]) == len(timeline)
+
+
 @pytest.mark.asyncio
 async def test_calendar_apply_endpoint():
     """Test calendar apply endpoint."""
@@ -116,3 +200,83 @@ async def test_calendar_apply_endpoint():
         assert "applied_count" in data
         assert data["dry_run"] is True
 
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    """Test metrics endpoint exposes coalescing counters."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/metrics")
+        
+        assert response.status_code == 200
+        metrics = response.json()["metrics"]
+        assert set(metrics["planner_singleflight"]) == {"in_flight", "executed", "coalesced"}
+        assert "orchestrator_singleflight" in metrics
+
+
+def test_websocket_filters_events_by_user_and_trace():
+    """Test query-param scoping and the subscribe message on /ws/events."""
+    def spawn(client, user_id, trace_id):
+        response = client.post(
+            "/api/agents/spawn",
+            json={"user_id": user_id, "subtasks": [], "trace_id": trace_id}
+        )
+        assert response.status_code == 200
+    
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/events?user_id=alice&types=AGENTS_SPAWNED") as alice, \
+                client.websocket_connect("/ws/events?user_id=bob") as bob:
+            spawn(client, "alice", "trace_1")
+            spawn(client, "bob", "trace_2")
+            assert alice.receive_json()["trace_id"] == "trace_1"
+            assert bob.receive_json()["trace_id"] == "trace_2"
+            
+            alice.send_json({"action": "subscribe", "user_id": "alice", "trace_id": "trace_4"})
+            alice.send_json({"action": "subscribe", "types": ["NOT_A_TYPE"]})
+            assert alice.receive_json()["type"] == "ERROR"
+            spawn(client, "alice", "trace_3")
+            spawn(client, "alice", "trace_4")
+            event = alice.receive_json()
+            assert (event["type"], event["trace_id"], event["user_id"]) == ("AGENTS_SPAWNED", "trace_4", "alice")
+
+
+def test_websocket_replays_missed_events_on_reconnect():
+    """Test that last_seq replays events published while disconnected."""
+    def spawn(client, trace_id):
+        response = client.post(
+            "/api/agents/spawn",
+            json={"user_id": "carol", "subtasks": [], "trace_id": trace_id}
+        )
+        assert response.status_code == 200
+    
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/events?user_id=carol&types=AGENTS_SPAWNED") as ws:
+            spawn(client, "trace_a")
+            last_seq = ws.receive_json()["seq"]
+        
+        spawn(client, "trace_b")
+        spawn(client, "trace_c")
+        with client.websocket_connect(
+            f"/ws/events?user_id=carol&types=AGENTS_SPAWNED&last_seq={last_seq}"
+        ) as ws:
+            spawn(client, "trace_d")
+            received = [ws.receive_json() for _ in range(3)]
+            assert [event["trace_id"] for event in received] == ["trace_b", "trace_c", "trace_d"]
+            assert received[0]["seq"] > last_seq
+
+
+def test_websocket_batches_and_compresses_frames():
+    """Test negotiated batching, compression, and rejected encodings."""
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/events?user_id=dave&types=AGENTS_SPAWNED&batch_ms=100&compress=deflate") as ws:
+            for trace_id in ("trace_x", "trace_y"):
+                response = client.post(
+                    "/api/agents/spawn",
+                    json={"user_id": "dave", "subtasks": [], "trace_id": trace_id}
+                )
+                assert response.status_code == 200
+            batch = ws.receive_json()
+            assert [event["trace_id"] for event in batch] == ["trace_x", "trace_y"]
+        
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect("/ws/events?encoding=xml") as ws:
+                ws.receive_text()
@@ -0,0 +1,213 @@
+"""Tests for timeline service."""
+from datetime import datetime, timedelta
+from app.services.interval_index import IntervalIndex
+from app.services.timeline import timeline_service
+from app.models.domain import EventBlock, MemoryPrefs
+from app.util.ids import generate_id
+
+
+BASE = datetime(2025, 1, 6, 8, 0)
+
+
+def make_block(start_minutes: int, duration: int, agent: str = "study_agent") -> EventBlock:
+    """Build a block starting ``start_minutes`` after 08:00 on the base day."""
+    start = BASE + timedelta(minutes=start_minutes)
+    return EventBlock(
+        id=generate_id("evt_"),
+        title=f"Block at {start_minutes}",
+        start_iso=start.isoformat(),
+        end_iso=(start + timedelta(minutes=duration)).isoformat(),
+        source_agent=agent
+    )
+
+
+def assert_no_overlaps(timeline: list[EventBlock]) -> None:
+    """Assert blocks are sorted and pairwise disjoint."""
+    for current, following in zip(timeline, timeline[1:]):
+        assert current.end_iso <= following.start_iso, "Found overlapping blocks"
+
+
+def test_interval_index_next_free_skips_adjacent_runs():
+    """Test that free-slot lookup jumps over back-to-back intervals."""
+    index = IntervalIndex()
+    index.insert(0, 10, "a")
+    index.insert(10, 20, "b")
+    index.insert(25, 30, "c")
+    
+    assert index.next_free(0, 5) == 20
+    assert index.next_free(0, 6) == 30
+    assert index.next_free(21, 4) == 21
+    assert [item for _, _, item in index.overlapping(5, 26)] == [None, None, None]
+    
+    index.remove("b")
+    assert index.next_free(0, 10) == 10
+    assert index.is_free(10, 20)
+
+
+def test_merge_resolves_long_block_overlapping_several_later_blocks():
+    """Test that a long block pushes every block it covers."""
+    memory = MemoryPrefs(user_id="test_user")
+    blocks = [
+        make_block(0, 240),
+        make_block(30, 30, "meal_agent"),
+        make_block(60, 30, "calendar_agent"),
+        make_block(300, 30),
+    ]
+    
+    timeline = timeline_service.merge_blocks(blocks, memory)
+    
+    assert len(timeline) == 4
+    assert_no_overlaps(timeline)
+    assert timeline[1].start_iso == (BASE + timedelta(minutes=240)).isoformat()
+    assert timeline[3].start_iso == (BASE + timedelta(minutes=300)).isoformat()
+
+
+def test_merge_large_multi_week_timeline():
+    """Test that tens of thousands of blocks merge without overlaps."""
+    memory = MemoryPrefs(user_id="test_user")
+    blocks = [
+        make_block((i // 30) * 1440 + (i % 30) * 25, 15 + i % 20)
+        for i in range(20000)
+    ]
+    
+    timeline = timeline_service.merge_blocks(blocks, memory)
+    
+    assert len(timeline) == len(blocks)
+    assert_no_overlaps(timeline)
+
+
+def test_merge_keeps_unmoved_blocks_and_timezone_of_moved_ones():
+    """Test that only shifted blocks are rebuilt, keeping their UTC offset."""
+    memory = MemoryPrefs(user_id="test_user")
+    first = EventBlock(
+        id="evt_first",
+        title="First",
+        start_iso="2025-01-06T09:00:00+02:00",
+        end_iso="2025-01-06T10:00:00+02:00",
+        source_agent="study_agent"
+    )
+    second = first.model_copy(update={"id": "evt_second", "source_agent": "meal_agent"})
+    
+    timeline = timeline_service.merge_blocks([first, second], memory)
+    
+    assert timeline[0] is second
+    assert timeline[1].start_iso == "2025-01-06T10:00:00+02:00"
+    assert timeline[1].end_iso == "2025-01-06T11:00:00+02:00"
+    assert first.start_iso == "2025-01-06T09:00:00+02:00"
+
+
+def test_merge_batch_matches_per_user_merge():
+    """Test that batch merging gives the same timelines as merge_blocks."""
+    blocks_by_user = {
+        f"user_{u}": [
+            make_block((i // 8) * 1440 + (i * 37 + u * 11) % 900 - 60, (i * 13 + u) % 70,
+                       ["study_agent", "meal_agent", "calendar_agent"][i % 3])
+            for i in range(40)
+        ]
+        for u in range(25)
+    }
+    memories = {
+        "user_3": MemoryPrefs(user_id="user_3", sleep_start="21:00", sleep_end="09:00"),
+        "user_4": MemoryPrefs(user_id="user_4", sleep_start="12:00", sleep_end="13:00"),
+    }
+    
+    batch = timeline_service.merge_batch(blocks_by_user, memories)
+    
+    for user_id, blocks in blocks_by_user.items():
+        memory = memories.get(user_id) or MemoryPrefs(user_id=user_id)
+        expected = timeline_service.merge_blocks(blocks, memory)
+        assert [b.model_dump() for b in batch[user_id]] == [b.model_dump() for b in expected]
+
+
+def test_incremental_replace_matches_full_merge():
+    """Test that replacing one agent's proposals gives the full-merge result."""
+    memory = MemoryPrefs(user_id="incremental_user")
+    study = [make_block(day * 1440 + i * 50, 45) for day in range(30) for i in range(10)]
+    meals = [make_block(day * 1440 + 240, 60, "meal_agent") for day in range(30)]
+    timeline_service.rebuild_timeline("incremental_user", study + meals, memory)
+    
+    # Move one day's lunch so it collides with study blocks
+    new_meals = list(meals)
+    new_meals[12] = make_block(12 * 1440 + 100, 60, "meal_agent")
+    delta = timeline_service.update_agent_blocks("incremental_user", "meal_agent", new_meals, memory)
+    
+    expected = timeline_service.merge_blocks(study + new_meals, memory)
+    result = timeline_service.get_timeline("incremental_user")
+    assert [b.model_dump() for b in result] == [b.model_dump() for b in expected]
+    
+    # Only day 12 is re-resolved; the other 29 lunches are not re-sent
+    assert delta.removed_ids == [meals[12].id]
+    assert new_meals[12].id in {block.id for block in delta.changed}
+    assert all(block.start_iso.startswith("2025-01-18") for block in delta.changed)
+    
+    # Moving the sleep window drops early blocks without touching the rest
+    late_riser = MemoryPrefs(user_id="incremental_user", sleep_start="23:00", sleep_end="09:00")
+    delta = timeline_service.update_memory(late_riser)
+    
+    expected = timeline_service.merge_blocks(study + new_meals, late_riser)
+    result = timeline_service.get_timeline("incremental_user")
+    assert [b.model_dump() for b in result] == [b.model_dump() for b in expected]
+    assert len(delta.removed_ids) == 60
+    assert not delta.changed
+
+
+def apply_delta(timeline: list[EventBlock], delta) -> list[EventBlock]:
+    """Apply a delta the way a client does: changes first, then removals."""
+    blocks = {block.id: block for block in timeline}
+    blocks.update((block.id, block) for block in delta.changed)
+    for block_id in delta.removed_ids:
+        del blocks[block_id]
+    return sorted(blocks.values(), key=lambda b: (b.start_iso, b.source_agent))
+
+
+def test_replace_with_shared_starts_does_not_remove_kept_blocks():
+    """Test that re-proposed blocks sharing a start are moved, never removed."""
+    memory = MemoryPrefs(user_id="shared_start_user")
+    study = [make_block(i * 50, 45) for i in range(6)]
+    meals = [make_block(240, 60, "meal_agent"), make_block(240, 30, "meal_agent")]
+    before = timeline_service.rebuild_timeline("shared_start_user", study + meals, memory)
+    
+    delta = timeline_service.update_agent_blocks("shared_start_user", "meal_agent", meals, memory)
+    
+    result = timeline_service.get_timeline("shared_start_user")
+    assert not set(delta.removed_ids) & {block.id for block in delta.changed}
+    assert [b.model_dump() for b in apply_delta(before, delta)] == [b.model_dump() for b in result]
+
+
+def test_replace_under_new_prefs_includes_the_prefs_change():
+    """Test that a re-plan delta also carries blocks moved by changed prefs."""
+    memory = MemoryPrefs(user_id="stale_prefs_user")
+    study = [make_block(day * 1440 + i * 50, 45) for day in range(3) for i in range(10)]
+    meals = [make_block(day * 1440 + 240, 60, "meal_agent") for day in range(3)]
+    before = timeline_service.rebuild_timeline("stale_prefs_user", study + meals, memory)
+    
+    # The stored timeline was merged with the old prefs
+    late_riser = MemoryPrefs(user_id="stale_prefs_user", sleep_start="23:00", sleep_end="09:00")
+    new_meals = [make_block(day * 1440 + 100, 60, "meal_agent") for day in range(3)]
+    delta = timeline_service.update_agent_blocks("stale_prefs_user", "meal_agent", new_meals, late_riser)
+    
+    expected = timeline_service.merge_blocks(study + new_meals, late_riser)
+    assert [b.model_dump() for b in timeline_service.get_timeline("stale_prefs_user")] == [
+        b.model_dump() for b in expected
+    ]
+    assert not set(delta.removed_ids) & {block.id for block in delta.changed}
+    assert [b.model_dump() for b in apply_delta(before, delta)] == [b.model_dump() for b in expected]
+
+
+def test_merge_shifts_blocks_into_free_hours_only():
+    """Test that shifted blocks skip the sleep window and roll over past 22:00."""
+    memory = MemoryPrefs(user_id="test_user", sleep_start="12:00", sleep_end="13:00")
+    blocks = [
+        make_block(180, 60),                  # 11:00-12:00
+        make_block(200, 30, "meal_agent"),    # 11:20, pushed past lunch-time sleep
+        make_block(780, 90),                  # 21:00-22:30, too late to finish today
+        make_block(0, 900),                   # 15h, longer than any free window
+    ]
+    
+    timeline = timeline_service.merge_blocks(blocks, memory)
+    
+    assert [(b.title, b.start_iso, b.end_iso) for b in timeline] == [
+        ("Block at 180", "2025-01-06T11:00:00", "2025-01-06T12:00:00"),
+        ("Block at 200", "2025-01-06T13:00:00", "2025-01-06T13:30:00"),
+        ("Block at 780", "2025-01-07T08:00:00", "2025-01-07T09:30:00"),
+    ]
@@ -0,0 +1,170 @@
+"""In-memory LRU cache with TTL and memory bound, plus an optional disk store."""
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after a time-to-live.
+    
+    Entries are evicted least recently used first once either the entry
+    count or the total of the caller-supplied entry sizes exceeds its
+    bound. Entries can carry a tag (e.g. a user ID) so that everything
+    derived from the same source can be dropped at once.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        max_bytes: int,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        # key -> (value, expires_at, size, tag), least recently used first
+        self._entries: OrderedDict[Hashable, tuple[Any, float, int, Optional[Hashable]]] = OrderedDict()
+        self._tags: dict[Hashable, set[Hashable]] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a live entry and mark it recently used, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        if entry[1] <= self._clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+    
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        size: int = 1,
+        tag: Optional[Hashable] = None,
+        ttl_seconds: Optional[float] = None
+    ) -> None:
+        """Insert or replace an entry, evicting as needed to stay in bounds.
+        
+        Entries larger than the whole memory bound are not stored.
+        ``ttl_seconds`` overrides the cache's TTL for this entry.
+        """
+        if key in self._entries:
+            self._remove(key)
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (value, self._clock() + ttl, size, tag)
+        self.bytes += size
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+        
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+    
+    def invalidate_tag(self, tag: Hashable) -> int:
+        """Drop every entry carrying ``tag``.
+        
+        Returns:
+            int: Number of entries removed
+        """
+        keys = self._tags.get(tag, set()).copy()
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+        return len(keys)
+    
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        self._entries.clear()
+        self._tags.clear()
+        self.bytes = 0
+    
+    def stats(self) -> dict[str, Any]:
+        """Return counters for the metrics endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+    
+    def _remove(self, key: Hashable) -> None:
+        _, _, size, tag = self._entries.pop(key)
+        self.bytes -= size
+        if tag is not None:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+
+class SqliteStore:
+    """Write-through disk copy of a cache so a warm cache survives restarts.
+    
+    Values are stored as JSON with a wall-clock expiry. The in-memory
+    cache stays authoritative for reads; the store is only read once, to
+    warm it at startup.
+    """
+    
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+    
+    def load(self, limit: int) -> list[tuple[str, Any, float]]:
+        """Drop expired rows and return up to ``limit`` of the freshest live ones.
+        
+        Returns:
+            list: (key, value, remaining TTL), soonest-expiring first
+        """
+        now = self._clock()
+        self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, value, expires_at FROM entries ORDER BY expires_at DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [(key, json.loads(value), expires_at - now) for key, value, expires_at in reversed(rows)]
+    
+    def put(self, key: str, value: Any, ttl_seconds: float) -> None:
+        """Insert or replace a row."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), self._clock() + ttl_seconds)
+        )
+        self._db.commit()
+    
+    def close(self) -> None:
+        self._db.close()
@@ -21,6 +21,16 @@ class OrchestratorError(TaskWeaveError):
     pass
 
 
+class JobError(TaskWeaveError):
+    """Error submitting or running a background job."""
+    pass
+
+
+class UpstreamUnavailableError(TaskWeaveError):
+    """An upstream API is failing fast because its circuit is open."""
+    pass
+
+
 class MemoryError(TaskWeaveError):
     """Error accessing or updating memory."""
     pass
@@ -0,0 +1,113 @@
+"""Shared pooled HTTP clients for upstream APIs."""
+import asyncio
+import importlib.util
+from typing import Optional
+from urllib.parse import urlsplit
+import httpx
+from app.config import settings
+from app.util.logging import log_info, log_warning
+from app.util.metrics import metrics_registry
+
+
+class HTTPClientPool:
+    """One keep-alive ``httpx.AsyncClient`` per upstream host.
+    
+    Adapters call ``client(base_url)`` instead of opening a client per
+    request, so connections (and TLS sessions) are reused across calls.
+    Each host gets its own connection pool with the configured limits,
+    so a slow upstream cannot take every connection. The app lifespan
+    closes the pool; clients are created lazily on first use, and again
+    if the event loop changes (e.g. between tests).
+    """
+    
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._requests: dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.http2 = settings.http2
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            log_warning("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+            self.http2 = False
+        metrics_registry.register("http_pool", self.stats)
+    
+    def client(self, base_url: str) -> httpx.AsyncClient:
+        """Return the pooled client for the host of ``base_url``.
+        
+        Args:
+            base_url: Any URL on the upstream host
+        
+        Returns:
+            httpx.AsyncClient: Shared client; do not close it
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections belong to the loop that opened them
+            self._clients = {}
+            self._loop = loop
+        
+        parts = urlsplit(base_url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        client = self._clients.get(host)
+        if client is None:
+            client = self._new_client(host)
+            self._clients[host] = client
+        return client
+    
+    async def close(self) -> None:
+        """Close every pooled connection."""
+        clients = list(self._clients.values())
+        self._clients = {}
+        if self._loop is not asyncio.get_running_loop():
+            # Opened on a loop that has since closed; nothing left to close
+            return
+        for client in clients:
+            await client.aclose()
+        if clients:
+            log_info(f"Closed HTTP pools for {len(clients)} hosts")
+    
+    def stats(self) -> dict:
+        """Return per-host pool utilization for the metrics endpoint."""
+        hosts = {}
+        for host, client in self._clients.items():
+            connections = self._connections(client)
+            idle = sum(1 for connection in connections if connection.is_idle())
+            hosts[host] = {
+                "requests": self._requests.get(host, 0),
+                "connections": len(connections),
+                "active": len(connections) - idle,
+                "idle": idle,
+                "utilization": (len(connections) - idle) / settings.http_max_connections
+            }
+        return {
+            "http2": self.http2,
+            "max_connections_per_host": settings.http_max_connections,
+            "hosts": hosts
+        }
+    
+    def _new_client(self, host: str) -> httpx.AsyncClient:
+        """Create a client with the configured limits and timeouts."""
+        async def count_request(request: httpx.Request) -> None:
+            self._requests[host] = self._requests.get(host, 0) + 1
+        
+        return httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry_seconds
+            ),
+            timeout=httpx.Timeout(
+                settings.http_timeout_seconds,
+                connect=settings.http_connect_timeout_seconds
+            ),
+            event_hooks={"request": [count_request]}
+        )
+    
+    def _connections(self, client: httpx.AsyncClient) -> list:
+        """Open connections of a client's pool (empty if not inspectable)."""
+        pool = getattr(client._transport, "_pool", None)
+        return list(getattr(pool, "connections", []))
+
+
+# Global HTTP client pool
+http_pool = HTTPClientPool()
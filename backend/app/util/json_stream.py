@@ -0,0 +1,109 @@
+"""Incremental JSON parsing for streamed model output."""
+import json
+from typing import Any, Optional
+
+
+class StreamingObjectParser:
+    """Pull complete items out of one array of a JSON object as text arrives.
+    
+    Text is fed in arbitrary chunks. Each object in the top-level array
+    under ``array_key`` is decoded as soon as its closing brace arrives,
+    and completed top-level scalar fields (e.g. a rationale) are exposed
+    in ``fields``. Scanning is linear: every character is looked at once.
+    Text before the opening brace (e.g. a code fence) is ignored.
+    """
+    
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.fields: dict[str, Any] = {}
+        self.done = False
+        self._buffer = ""
+        self._pos = 0
+        # Open containers: (bracket, key it is the value of, start offset)
+        self._stack: list[tuple[str, Optional[str], int]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._root_start: Optional[int] = None
+        self._root_end = 0
+    
+    def feed(self, text: str) -> list[Any]:
+        """Consume a chunk of text.
+        
+        Returns:
+            list: Array items completed by this chunk, in order
+        
+        Raises:
+            ValueError: If a completed item or field is not valid JSON
+        """
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        
+        for i in range(self._pos, len(buffer)):
+            if self.done:
+                break
+            c = buffer[i]
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = buffer[self._string_start:i + 1]
+                continue
+            
+            if c == '"':
+                if not self._stack:
+                    continue
+                self._in_string = True
+                self._string_start = i
+            elif c == ":" and self._stack and self._stack[-1][0] == "{":
+                self._key = json.loads(self._last_string)
+                if len(self._stack) == 1:
+                    self._value_start = i + 1
+            elif c in "{[":
+                if c == "{" and not self._stack:
+                    self._root_start = i
+                key = self._key if self._stack and self._stack[-1][0] == "{" else None
+                self._stack.append((c, key, i))
+                self._key = None
+                self._value_start = None
+            elif c in "}]":
+                if not self._stack:
+                    continue
+                if c == "}" and len(self._stack) == 1:
+                    self._end_field(buffer[self._value_start:i] if self._value_start is not None else "")
+                _, _, start = self._stack.pop()
+                if len(self._stack) == 2 and self._stack[1][:2] == ("[", self.array_key) and c == "}":
+                    items.append(json.loads(buffer[start:i + 1]))
+                if not self._stack:
+                    self.done = True
+                    self._root_end = i + 1
+            elif c == "," and len(self._stack) == 1:
+                self._end_field(buffer[self._value_start:i] if self._value_start is not None else "")
+        
+        self._pos = len(buffer)
+        return items
+    
+    def result(self) -> Any:
+        """Decode the whole object once it is complete.
+        
+        Raises:
+            ValueError: If the object has not been closed yet
+        """
+        if not self.done:
+            raise ValueError("JSON object is incomplete")
+        return json.loads(self._buffer[self._root_start:self._root_end])
+    
+    def _end_field(self, raw: str) -> None:
+        """Record a finished top-level scalar field."""
+        if self._key is not None and raw.strip():
+            self.fields[self._key] = json.loads(raw)
+        self._key = None
+        self._value_start = None
@@ -1,17 +1,165 @@
 """Structured logging utilities."""
+import atexit
 import json
 import logging
+import queue
+import threading
+import time
 from datetime import datetime
 from typing import Any, Optional
+from app.config import settings
+from app.util.metrics import metrics_registry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure root logger
 logging.basicConfig(
-    level=logging.INFO,
+    level=settings.log_level.upper(),
     format='%(message)s'
 )
 
 logger = logging.getLogger("taskweave")
 
+LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL
+}
+
+
+def _encode_json(entry: dict) -> str:
+    return json.dumps(entry)
+
+
+def _encode_orjson(entry: dict) -> str:
+    return orjson.dumps(entry, default=str).decode()
+
+
+class LogEntry:
+    """A structured log message, encoded to JSON only when a handler writes it.
+    
+    Passed to the stdlib logger as the message, so ``str(entry)`` runs in
+    the handler: on the calling thread normally, or on the writer thread
+    when background logging is on. The text is cached, so several
+    handlers encode it once. Field values should not be mutated after
+    logging.
+    """
+    
+    __slots__ = ("created", "level", "message", "trace_id", "fields", "_text")
+    
+    encode = staticmethod(_encode_json)
+    
+    def __init__(
+        self,
+        level: str,
+        message: str,
+        trace_id: Optional[str],
+        fields: dict[str, Any]
+    ):
+        self.created = time.time()
+        self.level = level
+        self.message = message
+        self.trace_id = trace_id
+        self.fields = fields
+        self._text: Optional[str] = None
+    
+    def __str__(self) -> str:
+        if self._text is not None:
+            return self._text
+        
+        log_entry = {
+            "timestamp": datetime.utcfromtimestamp(self.created).isoformat(),
+            "level": self.level,
+            "message": self.message,
+            "trace_id": self.trace_id,
+            **self.fields
+        }
+        
+        # Remove None values
+        log_entry = {k: v for k, v in log_entry.items() if v is not None}
+        self._text = self.encode(log_entry)
+        return self._text
+
+
+class BackgroundWriter:
+    """Writer thread that turns queued entries into log records.
+    
+    Callers only build a ``LogEntry`` and put it on a queue; creating
+    the stdlib record, encoding JSON and running handlers all happen on
+    the writer thread. The queue is bounded: entries arriving while it
+    is full are dropped and counted.
+    """
+    
+    def __init__(self, max_queue_size: int):
+        self.max_queue_size = max(max_queue_size, 1)
+        self.dropped = 0
+        self._entries: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, levelno: int, entry: "LogEntry") -> None:
+        if self._entries.qsize() >= self.max_queue_size:
+            self.dropped += 1
+            return
+        self._entries.put((levelno, entry))
+    
+    def stop(self) -> None:
+        """Write everything queued, then end the thread."""
+        self._entries.put(None)
+        self._thread.join()
+    
+    def stats(self) -> dict:
+        return {
+            "background": True,
+            "queue_depth": self._entries.qsize(),
+            "dropped": self.dropped
+        }
+    
+    def _run(self) -> None:
+        while True:
+            item = self._entries.get()
+            if item is None:
+                return
+            levelno, entry = item
+            record = logger.makeRecord(logger.name, levelno, "", 0, entry, (), None)
+            record.created = entry.created
+            logger.handle(record)
+
+
+_writer: Optional[BackgroundWriter] = None
+
+
+def start_background_logging(max_queue_size: int = 10000) -> None:
+    """Write structured log messages on a background thread (idempotent).
+    
+    Args:
+        max_queue_size: Entries buffered before dropping
+    """
+    global _writer
+    if _writer is None:
+        _writer = BackgroundWriter(max_queue_size)
+        atexit.register(stop_background_logging)
+
+
+def stop_background_logging() -> None:
+    """Flush queued entries and write on the calling thread again."""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
+def logging_stats() -> dict:
+    """Return background writer queue stats."""
+    if _writer is None:
+        return {"background": False, "queue_depth": 0, "dropped": 0}
+    return _writer.stats()
+
 
 def log_json(
     level: str,
@@ -21,38 +169,51 @@ def log_json(
 ) -> None:
     """Log a structured JSON message.
     
+    Returns immediately if the level is disabled; otherwise the JSON is
+    built when the record is written.
+    
     Args:
         level: Log level (INFO, WARNING, ERROR, etc.)
         message: Log message
         trace_id: Optional trace ID for request tracking
         **kwargs: Additional fields to include in the log
     """
-    log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
-        "level": level,
-        "message": message,
-        "trace_id": trace_id,
-        **kwargs
-    }
+    levelno = LEVELS.get(level) or LEVELS.get(level.upper(), logging.INFO)
+    if not logger.isEnabledFor(levelno):
+        return
     
-    # Remove None values
-    log_entry = {k: v for k, v in log_entry.items() if v is not None}
-    
-    log_method = getattr(logger, level.lower(), logger.info)
-    log_method(json.dumps(log_entry))
+    entry = LogEntry(level, message, trace_id, kwargs)
+    if _writer is not None:
+        _writer.submit(levelno, entry)
+    else:
+        logger.log(levelno, entry)
 
 
 def log_info(message: str, trace_id: Optional[str] = None, **kwargs: Any) -> None:
     """Log an info message."""
-    log_json("INFO", message, trace_id, **kwargs)
+    if logger.isEnabledFor(logging.INFO):
+        log_json("INFO", message, trace_id, **kwargs)
 
 
 def log_warning(message: str, trace_id: Optional[str] = None, **kwargs: Any) -> None:
     """Log a warning message."""
-    log_json("WARNING", message, trace_id, **kwargs)
+    if logger.isEnabledFor(logging.WARNING):
+        log_json("WARNING", message, trace_id, **kwargs)
 
 
 def log_error(message: str, trace_id: Optional[str] = None, **kwargs: Any) -> None:
     """Log an error message."""
-    log_json("ERROR", message, trace_id, **kwargs)
+    if logger.isEnabledFor(logging.ERROR):
+        log_json("ERROR", message, trace_id, **kwargs)
+
+
+if settings.log_json_encoder == "orjson":
+    if orjson is not None:
+        LogEntry.encode = staticmethod(_encode_orjson)
+    else:
+        log_warning("LOG_JSON_ENCODER=orjson but orjson is not installed, using json")
+
+if settings.log_background:
+    start_background_logging(settings.log_queue_max_size)
 
+metrics_registry.register("logging", logging_stats)
@@ -0,0 +1,51 @@
+"""In-process metrics registry."""
+from collections import deque
+from typing import Any, Callable
+
+
+class MetricsRegistry:
+    """Collects named stats providers for the metrics endpoint."""
+    
+    def __init__(self):
+        self._sources: dict[str, Callable[[], dict[str, Any]]] = {}
+    
+    def register(self, name: str, source: Callable[[], dict[str, Any]]) -> None:
+        """Register (or replace) a provider returning a dict of stats."""
+        self._sources[name] = source
+    
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Return current stats from every provider."""
+        return {name: source() for name, source in self._sources.items()}
+
+
+class SampleWindow:
+    """Recent samples of a measurement (e.g. a latency) with summary stats."""
+    
+    def __init__(self, max_samples: int = 1024):
+        self._samples: deque[float] = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+    
+    def record(self, value: float) -> None:
+        """Add a sample."""
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+    
+    def summary(self) -> dict[str, float]:
+        """Return count and mean over all samples, percentiles over recent ones."""
+        recent = sorted(self._samples)
+        if not recent:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "p50": recent[len(recent) // 2],
+            "p95": recent[min(int(len(recent) * 0.95), len(recent) - 1)],
+            "max": recent[-1]
+        }
+
+
+# Global metrics registry instance
+metrics_registry = MetricsRegistry()
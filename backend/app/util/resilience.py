@@ -0,0 +1,257 @@
+"""Retries, circuit breaking and hedging for upstream API calls."""
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+import httpx
+from app.config import settings
+from app.util.errors import UpstreamUnavailableError
+from app.util.logging import log_info, log_warning
+from app.util.metrics import metrics_registry, SampleWindow
+
+T = TypeVar("T")
+
+# Status codes worth retrying: timeouts, rate limits, overload, gateway errors
+RETRYABLE_STATUSES = frozenset({408, 409, 425, 429, 500, 502, 503, 504, 529})
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Check whether an upstream error is transient."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUSES
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial -> closed.
+    
+    While open, calls fail fast instead of waiting on a degraded upstream.
+    After ``reset_seconds`` a single trial call is let through; its
+    outcome closes or re-opens the circuit. A trial that ends without an
+    outcome (cancelled) must be given back with ``release``; one that
+    is never given back is replaced after another ``reset_seconds``.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_seconds: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self.opened = 0
+        self.rejected = 0
+    
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self._state
+    
+    def allow(self) -> bool:
+        """Check whether a call may go upstream now."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            now = self._clock()
+            if not self._trial_in_flight or now - self._trial_started >= self.reset_seconds:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = True
+                self._trial_started = now
+                return True
+        self.rejected += 1
+        return False
+    
+    def release(self) -> None:
+        """Let another trial through after one ended without an outcome."""
+        if self._state == self.HALF_OPEN:
+            self._trial_in_flight = False
+    
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+    
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.opened += 1
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+class Resilience:
+    """Retry with backoff, circuit breaker and optional hedging for one upstream.
+    
+    Wrap each upstream call in ``call``. Transient failures (see
+    ``is_retryable``) are retried with full-jitter exponential backoff,
+    honouring ``Retry-After``; every failed attempt counts towards the
+    breaker. With hedging on, a second attempt starts if the first has
+    not answered within the recent p95 latency, and the first response
+    wins. Streaming callers that cannot replay a call can use ``allow``,
+    ``record_*`` and ``release`` directly to share the breaker; every
+    allowed call must end in exactly one of them.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        rng: Optional[random.Random] = None
+    ):
+        self.name = name
+        self.max_retries = settings.upstream_max_retries if max_retries is None else max_retries
+        self.backoff_base = settings.upstream_backoff_base_seconds if backoff_base is None else backoff_base
+        self.backoff_max = settings.upstream_backoff_max_seconds if backoff_max is None else backoff_max
+        self.hedge = settings.upstream_hedge if hedge is None else hedge
+        self.breaker = breaker or CircuitBreaker(
+            settings.breaker_failure_threshold,
+            settings.breaker_reset_seconds
+        )
+        self._rng = rng or random.Random()
+        self.latency = SampleWindow()
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        metrics_registry.register(f"resilience_{name}", self.stats)
+        resilience_registry[name] = self
+    
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn`` with retries, breaker and hedging.
+        
+        Raises:
+            UpstreamUnavailableError: If the circuit is open
+            Exception: The last error once retries are exhausted, or the
+                first non-retryable error
+        """
+        for attempt in range(self.max_retries + 1):
+            if not self.allow():
+                raise UpstreamUnavailableError(f"{self.name} circuit is open")
+            
+            started = time.monotonic()
+            try:
+                result = await self._attempt(fn)
+            except asyncio.CancelledError:
+                self.release()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # The upstream answered; the request itself is wrong
+                    self.breaker.record_success()
+                    raise
+                self.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                self.retries += 1
+                log_warning(
+                    f"{self.name} attempt {attempt + 1} failed ({e!r}), retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+            
+            self.record_success(time.monotonic() - started)
+            return result
+    
+    def allow(self) -> bool:
+        """Check the breaker before an upstream call."""
+        return self.breaker.allow()
+    
+    def release(self) -> None:
+        """End a call that was cancelled before it had an outcome."""
+        self.breaker.release()
+    
+    def record_success(self, latency: Optional[float] = None) -> None:
+        if latency is not None:
+            self.latency.record(latency)
+        self.breaker.record_success()
+    
+    def record_failure(self) -> None:
+        was_open = self.breaker.state == CircuitBreaker.OPEN
+        self.breaker.record_failure()
+        if not was_open and self.breaker.state == CircuitBreaker.OPEN:
+            log_warning(f"{self.name} circuit opened")
+    
+    def stats(self) -> dict:
+        """Return breaker state and retry/hedge counters."""
+        return {
+            "state": self.breaker.state,
+            "opened": self.breaker.opened,
+            "rejected": self.breaker.rejected,
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "latency_seconds": self.latency.summary()
+        }
+    
+    async def _attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """One attempt, hedged with a second request if it runs long."""
+        delay = self._hedge_delay()
+        if delay is None:
+            return await fn()
+        
+        first = asyncio.create_task(fn())
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        
+        self.hedged += 1
+        log_info(f"{self.name} hedging a request slower than {delay:.2f}s")
+        second = asyncio.create_task(fn())
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """Recent p95 latency, once enough calls have been seen."""
+        if not self.hedge or self.latency.count < settings.upstream_hedge_min_samples:
+            return None
+        return self.latency.summary()["p95"]
+    
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """Full-jitter exponential backoff, at least any Retry-After."""
+        delay = self._rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if isinstance(error, httpx.HTTPStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after and retry_after.replace(".", "", 1).isdigit():
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+        return delay
+
+
+# Resilience wrappers by upstream name, for health output
+resilience_registry: dict[str, Resilience] = {}
+
+
+def breaker_states() -> dict[str, str]:
+    """Return the circuit state of every upstream."""
+    return {name: resilience.breaker.state for name, resilience in resilience_registry.items()}
@@ -0,0 +1,61 @@
+"""Single-flight coalescing of concurrent identical calls."""
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def request_key(*parts: Any) -> str:
+    """Hash request parts into a stable key (dict order does not matter)."""
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Share one in-flight computation among concurrent callers with the same key.
+    
+    The first caller for a key starts the computation; callers arriving
+    while it runs await the same result (or exception) instead of starting
+    their own. The computation is shielded, so a caller that gives up does
+    not cancel it for the others.
+    """
+    
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Run ``fn`` for ``key``, or join the run already in flight.
+        
+        Args:
+            key: Normalized request key
+            fn: Coroutine factory computing the result
+        
+        Returns:
+            tuple: (result, whether it was shared from another caller's run)
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+            return await asyncio.shield(call), True
+        
+        call = asyncio.ensure_future(fn())
+        self._calls[key] = call
+        self.executed += 1
+        call.add_done_callback(lambda _: self._forget(key, call))
+        return await asyncio.shield(call), False
+    
+    def stats(self) -> dict[str, int]:
+        """Return counters for the metrics endpoint."""
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced
+        }
+    
+    def _forget(self, key: str, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,95 @@
+"""Append-only on-disk spool for records awaiting delivery."""
+import os
+from pathlib import Path
+from typing import Optional
+
+
+class SegmentSpool:
+    """FIFO of text lines stored in numbered segment files.
+    
+    Records are appended to the newest segment; a segment is sealed once
+    it reaches ``segment_bytes`` or when it is handed out for replay, so
+    files being replayed are never written to. Total size is capped at
+    ``max_bytes`` by deleting the oldest segments. Only one segment is
+    ever read into memory. Segments found on disk at startup are kept,
+    so records survive a restart.
+    
+    Calls block on disk I/O; async callers should run them in a thread.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int, segment_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.segment_bytes = max(min(segment_bytes, max_bytes), 1)
+        self._sizes: dict[int, int] = {
+            int(path.stem): path.stat().st_size
+            for path in sorted(self.directory.glob("*.ndjson"))
+            if path.stem.isdigit()
+        }
+        self._next_id = max(self._sizes, default=0) + 1
+        self._open_id: Optional[int] = None
+        self.dropped_segments = 0
+    
+    @property
+    def pending(self) -> bool:
+        """Whether any records are waiting."""
+        return bool(self._sizes)
+    
+    @property
+    def size_bytes(self) -> int:
+        return sum(self._sizes.values())
+    
+    @property
+    def segments(self) -> int:
+        return len(self._sizes)
+    
+    def append(self, lines: list[str]) -> None:
+        """Append records (one line each), dropping the oldest segments over the cap."""
+        data = "".join(f"{line}\n" for line in lines).encode()
+        if self._open_id is None or self._sizes[self._open_id] >= self.segment_bytes:
+            self._open_id = self._next_id
+            self._next_id += 1
+            self._sizes[self._open_id] = 0
+        
+        with open(self._path(self._open_id), "ab") as segment:
+            segment.write(data)
+        self._sizes[self._open_id] += len(data)
+        
+        while self.size_bytes > self.max_bytes and len(self._sizes) > 1:
+            self.remove(min(self._sizes))
+            self.dropped_segments += 1
+    
+    def head(self) -> Optional[tuple[int, list[str]]]:
+        """Seal and return the oldest segment as (segment ID, records)."""
+        if not self._sizes:
+            return None
+        
+        segment_id = min(self._sizes)
+        if segment_id == self._open_id:
+            self._open_id = None
+        with open(self._path(segment_id), "rb") as segment:
+            return segment_id, segment.read().decode().splitlines()
+    
+    def replace(self, segment_id: int, lines: list[str]) -> None:
+        """Rewrite a sealed segment with the records still undelivered."""
+        path = self._path(segment_id)
+        data = "".join(f"{line}\n" for line in lines).encode()
+        temp = path.with_suffix(".tmp")
+        with open(temp, "wb") as segment:
+            segment.write(data)
+        os.replace(temp, path)
+        self._sizes[segment_id] = len(data)
+    
+    def remove(self, segment_id: int) -> None:
+        """Delete a segment once its records are delivered."""
+        self._sizes.pop(segment_id, None)
+        if segment_id == self._open_id:
+            self._open_id = None
+        try:
+            os.remove(self._path(segment_id))
+        except FileNotFoundError:
+            pass
+    
+    def _path(self, segment_id: int) -> Path:
+        return self.directory / f"{segment_id:010d}.ndjson"
@@ -0,0 +1,132 @@
+"""Measure CPU per broadcast with per-connection vs shared serialization.
+
+Simulated clients record the frame they would send. The event is a
+TIMELINE_UPDATE with a few hundred blocks, sent to every client both
+through ``broadcast_event`` and through queued EventBus subscribers.
+
+Usage:
+    python -m benchmarks.bench_broadcast [clients] [blocks] [broadcasts]
+"""
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from app.models.events import ServerEvent, EventType
+from app.router import websocket
+from app.services.event_bus import EventBus
+
+
+class FakeWebSocket:
+    """Stands in for a connection; counts bytes it would write."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_text(self, text: str) -> None:
+        self.sent += len(text)
+
+
+def timeline_event(blocks: int) -> ServerEvent:
+    base = datetime(2025, 1, 6, 8, 0)
+    return ServerEvent(
+        type=EventType.TIMELINE_UPDATE,
+        payload={
+            "user_id": "user_1",
+            "blocks": [
+                {
+                    "id": f"evt_{i:05d}",
+                    "title": f"Study block {i}",
+                    "start_iso": (base + timedelta(minutes=30 * i)).isoformat(),
+                    "end_iso": (base + timedelta(minutes=30 * i + 25)).isoformat(),
+                    "source_agent": "study_agent",
+                    "notes": "Review lecture notes and practice problems"
+                }
+                for i in range(blocks)
+            ]
+        },
+        trace_id="trace_bench",
+        user_id="user_1"
+    )
+
+
+async def previous_broadcast(event: ServerEvent) -> None:
+    """broadcast_event as it was: serialize for every connection."""
+    for connection in list(websocket.active_connections):
+        await connection.send_text(event.model_dump_json())
+
+
+def cpu_ms(broadcasts: int, blocks: int, run) -> float:
+    started = time.process_time()
+    for _ in range(broadcasts):
+        # A fresh event each time, as every publish is a new event
+        asyncio.get_event_loop().run_until_complete(run(timeline_event(blocks)))
+    return (time.process_time() - started) / broadcasts * 1000
+
+
+class BusClients:
+    """Queued EventBus subscribers sending to the fake connections."""
+
+    def __init__(self, clients: list[FakeWebSocket], encode_once: bool):
+        self.bus = EventBus()
+        self.clients = clients
+        self.encode_once = encode_once
+        self.subscriptions = []
+        self.remaining = 0
+        self.done: asyncio.Event = None
+
+    async def attach(self) -> None:
+        self.subscriptions = [self.bus.attach(self._sender(client)) for client in self.clients]
+
+    async def fanout(self, event: ServerEvent) -> None:
+        self.remaining = len(self.clients)
+        self.done = asyncio.Event()
+        await self.bus.publish(event)
+        await self.done.wait()
+
+    def _sender(self, client: FakeWebSocket):
+        async def send(event: ServerEvent) -> None:
+            await client.send_text(event.encoded() if self.encode_once else event.model_dump_json())
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.done.set()
+        return send
+
+
+def main() -> None:
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    blocks = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    broadcasts = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    logging.getLogger("taskweave").setLevel(logging.WARNING)
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+    fakes = [FakeWebSocket() for _ in range(clients)]
+    websocket.active_connections.update(fakes)
+    frame = len(timeline_event(blocks).encoded())
+
+    per_client = BusClients(fakes, encode_once=False)
+    once = BusClients(fakes, encode_once=True)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(per_client.attach())
+    loop.run_until_complete(once.attach())
+
+    rows = [
+        ("broadcast_event, per client", cpu_ms(broadcasts, blocks, previous_broadcast)),
+        ("broadcast_event, encode once", cpu_ms(broadcasts, blocks, websocket.broadcast_event)),
+        ("event bus, per client", cpu_ms(broadcasts, blocks, per_client.fanout)),
+        ("event bus, encode once", cpu_ms(broadcasts, blocks, once.fanout))
+    ]
+    websocket.active_connections.difference_update(fakes)
+    for group in (per_client, once):
+        for subscription in group.subscriptions:
+            group.bus.detach(subscription)
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+
+    print(f"clients={clients} blocks={blocks} frame={frame} bytes")
+    for name, cost in rows:
+        print(f"{name:30} {cost:9.1f} ms CPU per broadcast")
+
+
+if __name__ == "__main__":
+    main()
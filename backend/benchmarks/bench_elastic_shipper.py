@@ -0,0 +1,98 @@
+"""Benchmark buffered bulk log shipping against one POST per event.
+
+Both run against a local stand-in HTTP server that acknowledges every
+request, so the numbers measure client-side overhead, not Elasticsearch.
+
+Usage:
+    python -m benchmarks.bench_elastic_shipper [events]
+"""
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime
+from app.adapters.elastic_logger import ElasticLogger
+from app.config import settings
+from app.util.http import http_pool
+
+
+async def start_stand_in() -> tuple[asyncio.AbstractServer, str, list]:
+    """Acknowledge every request on a keep-alive connection."""
+    requests = []
+
+    async def handle(reader, writer):
+        while True:
+            try:
+                headers = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            length = next(
+                int(line.split(b":")[1]) for line in headers.split(b"\r\n")
+                if line.lower().startswith(b"content-length")
+            )
+            await reader.readexactly(length)
+            requests.append(length)
+            body = b'{"errors": false, "items": []}'
+            writer.write(
+                b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+                + f"content-length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}", requests
+
+
+async def per_event(url: str, events: int) -> float:
+    """The previous behaviour: one awaited ``_doc`` POST per event."""
+    client = http_pool.client(url)
+    started = time.perf_counter()
+    for i in range(events):
+        await client.post(
+            f"{url}/{settings.elastic_index}/_doc",
+            json={
+                "timestamp": datetime.utcnow().isoformat(),
+                "level": "INFO",
+                "message": f"event {i}",
+                "trace_id": "trace_bench"
+            },
+            timeout=5.0
+        )
+    return time.perf_counter() - started
+
+
+async def buffered(url: str, events: int) -> tuple[float, float]:
+    """Caller time to enqueue every event, and time until all are shipped."""
+    settings.elastic_url = url
+    shipper = ElasticLogger()
+    started = time.perf_counter()
+    for i in range(events):
+        await shipper.log_event("INFO", f"event {i}", trace_id="trace_bench")
+    enqueue_seconds = time.perf_counter() - started
+    await shipper.shutdown()
+    return enqueue_seconds, time.perf_counter() - started
+
+
+async def main() -> None:
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for name in ("taskweave", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    server, url, requests = await start_stand_in()
+
+    async with server:
+        loop_seconds = await per_event(url, events)
+        loop_requests = len(requests)
+        requests.clear()
+        enqueue_seconds, shipped_seconds = await buffered(url, events)
+        await http_pool.close()
+
+    print(f"events={events} batch_size={settings.elastic_batch_size}")
+    print(f"POST per event:      {loop_seconds * 1000:9.1f} ms  {events / loop_seconds:10.0f} events/s  {loop_requests} requests")
+    print(f"bulk shipper:        {shipped_seconds * 1000:9.1f} ms  {events / shipped_seconds:10.0f} events/s  {len(requests)} requests")
+    print(f"caller enqueue time: {enqueue_seconds * 1000:9.1f} ms  {enqueue_seconds / events * 1e6:10.1f} us/event")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
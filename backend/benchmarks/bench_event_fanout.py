@@ -0,0 +1,71 @@
+"""Benchmark event fan-out to many WebSocket subscribers.
+
+Simulates connections as queued EventBus subscribers whose handler
+encodes the event, like a WebSocket send. Compares every client
+subscribed to everything (the previous behaviour) with clients scoped
+to their own user_id.
+
+Usage:
+    python -m benchmarks.bench_event_fanout [connections] [events]
+"""
+import asyncio
+import logging
+import sys
+import time
+from app.models.events import ServerEvent, EventType
+from app.services.event_bus import EventBus
+
+
+async def run(connections: int, events: int, scoped: bool) -> tuple[float, float, int]:
+    """Return publish time, time until delivered, and deliveries."""
+    bus = EventBus()
+    delivered = 0
+    expected = events if scoped else events * connections
+    done = asyncio.Event()
+
+    async def send(event: ServerEvent) -> None:
+        nonlocal delivered
+        event.model_dump_json()
+        delivered += 1
+        if delivered == expected:
+            done.set()
+
+    subscriptions = [
+        bus.attach(send, user_id=f"user_{i}" if scoped else None, max_queue_size=events)
+        for i in range(connections)
+    ]
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    for n in range(events):
+        await bus.publish(ServerEvent(
+            type=EventType.TIMELINE_UPDATE,
+            payload={"user_id": f"user_{n * 7919 % connections}", "blocks": [], "incremental": True},
+            trace_id=f"trace_{n}",
+            user_id=f"user_{n * 7919 % connections}"
+        ))
+    publish_seconds = time.perf_counter() - started
+    await done.wait()
+    delivered_seconds = time.perf_counter() - started
+
+    for subscription in subscriptions:
+        bus.detach(subscription)
+    return publish_seconds, delivered_seconds, delivered
+
+
+async def main() -> None:
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    logging.getLogger("taskweave").setLevel(logging.WARNING)
+
+    print(f"connections={connections} events={events}")
+    for name, scoped in (("unscoped (everyone)", False), ("scoped by user_id", True)):
+        publish_seconds, delivered_seconds, delivered = await run(connections, events, scoped)
+        print(
+            f"{name:20} publish {publish_seconds / events * 1e6:9.1f} us/event  "
+            f"delivered in {delivered_seconds * 1000:8.1f} ms  ({delivered} sends)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""Measure per-call cost of structured logging.
+
+Compares the previous log_json (dict, timestamp and json.dumps on every
+call, even below the level) with the current one: synchronous, with the
+background writer thread, and with orjson. Output goes to a file so the
+terminal is not part of the measurement.
+
+Usage:
+    python -m benchmarks.bench_logging [calls]
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Optional
+from app.util import logging as app_logging
+from app.util.logging import log_info, logger
+
+
+def previous_log_json(
+    level: str,
+    message: str,
+    trace_id: Optional[str] = None,
+    **kwargs: Any
+) -> None:
+    """log_json as it was before the level check and deferred encoding."""
+    log_entry = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "level": level,
+        "message": message,
+        "trace_id": trace_id,
+        **kwargs
+    }
+    log_entry = {k: v for k, v in log_entry.items() if v is not None}
+    log_method = getattr(logger, level.lower(), logger.info)
+    log_method(json.dumps(log_entry))
+
+
+def previous_log_info(message: str, trace_id: Optional[str] = None, **kwargs: Any) -> None:
+    previous_log_json("INFO", message, trace_id, **kwargs)
+
+
+def per_call_us(log: Callable[..., None], calls: int) -> float:
+    started = time.perf_counter()
+    for i in range(calls):
+        log("Skipping block in sleep window", "trace_bench", block=i, agent="study_agent")
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main() -> None:
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    root = logging.getLogger()
+    with tempfile.TemporaryDirectory() as directory:
+        handler = logging.FileHandler(os.path.join(directory, "bench.log"))
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        root.handlers = [handler]
+
+        rows = []
+        logger.setLevel(logging.WARNING)
+        rows.append(("below level, previous", per_call_us(previous_log_info, calls)))
+        rows.append(("below level, current", per_call_us(log_info, calls)))
+
+        logger.setLevel(logging.INFO)
+        rows.append(("written, previous", per_call_us(previous_log_info, calls)))
+        rows.append(("written, current sync", per_call_us(log_info, calls)))
+
+        app_logging.start_background_logging(calls)
+        rows.append(("written, background thread", per_call_us(log_info, calls)))
+        started = time.perf_counter()
+        app_logging.stop_background_logging()
+        drain = time.perf_counter() - started
+
+        if app_logging.orjson is not None:
+            app_logging.LogEntry.encode = staticmethod(app_logging._encode_orjson)
+            rows.append(("written, current sync + orjson", per_call_us(log_info, calls)))
+            app_logging.start_background_logging(calls)
+            rows.append(("written, background + orjson", per_call_us(log_info, calls)))
+            app_logging.stop_background_logging()
+
+        handler.close()
+
+    print(f"calls={calls}")
+    for name, cost in rows:
+        print(f"{name:32} {cost:6.2f} us/call")
+    print(f"writer thread drain after background run: {drain * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark batch timeline merge against a loop of merge_blocks calls.
+
+Usage:
+    python -m benchmarks.bench_timeline_batch [users] [blocks_per_user]
+"""
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from app.models.domain import EventBlock, MemoryPrefs
+from app.services import timeline_batch
+from app.services.timeline import timeline_service
+from app.util.ids import generate_id
+
+AGENTS = ["study_agent", "meal_agent", "calendar_agent"]
+
+
+def build_blocks(users: int, per_user: int) -> dict[str, list[EventBlock]]:
+    """Generate three days of overlapping agent proposals per user."""
+    base = datetime(2025, 1, 6, 8, 0)
+    blocks_by_user = {}
+    for u in range(users):
+        blocks = []
+        for i in range(per_user):
+            start = base + timedelta(days=i % 3, minutes=(i * 47 + u * 7) % 780)
+            blocks.append(EventBlock(
+                id=generate_id("evt_"),
+                title=f"Block {i}",
+                start_iso=start.isoformat(),
+                end_iso=(start + timedelta(minutes=15 + i % 75)).isoformat(),
+                source_agent=AGENTS[i % 3]
+            ))
+        blocks_by_user[f"user_{u}"] = blocks
+    return blocks_by_user
+
+
+def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    # Keep per-block log lines out of the measurement
+    logging.getLogger("taskweave").setLevel(logging.WARNING)
+
+    blocks_by_user = build_blocks(users, per_user)
+    memories = {user_id: MemoryPrefs(user_id=user_id) for user_id in blocks_by_user}
+
+    started = time.perf_counter()
+    looped = {
+        user_id: timeline_service.merge_blocks(blocks, memories[user_id])
+        for user_id, blocks in blocks_by_user.items()
+    }
+    loop_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = timeline_service.merge_batch(blocks_by_user, memories)
+    batch_seconds = time.perf_counter() - started
+
+    identical = all(
+        [b.model_dump() for b in batched[user_id]] == [b.model_dump() for b in looped[user_id]]
+        for user_id in blocks_by_user
+    )
+
+    print(f"users={users} blocks_per_user={per_user} numpy={timeline_batch.is_available()}")
+    print(f"loop of merge_blocks: {loop_seconds * 1000:9.1f} ms")
+    print(f"merge_batch:          {batch_seconds * 1000:9.1f} ms")
+    print(f"speedup:              {loop_seconds / batch_seconds:9.2f}x")
+    print(f"identical results:    {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Load test of WebSocket frame modes during a simulated agent run.
+
+Each simulated client is a queued EventBus subscriber that encodes
+frames the way ``/ws/events`` does and counts the frames (one send, so
+one write syscall, each) and bytes it would write. The run publishes
+bursts of small AGENT_LOG events, a few milliseconds apart, with a full
+TIMELINE_UPDATE after every few bursts.
+
+Usage:
+    python -m benchmarks.bench_ws_frames [clients] [bursts] [burst_size] [blocks]
+"""
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from app.config import settings
+from app.models.events import ServerEvent, EventType
+from app.services import event_frames
+from app.services.event_bus import EventBus
+from app.services.event_frames import FrameEncoder
+
+
+MODES = [
+    ("json", 0, False),
+    ("json", 20, False),
+    ("json", 0, True),
+    ("json", 20, True),
+    ("msgpack", 20, False),
+    ("msgpack", 20, True)
+]
+
+
+def agent_log(n: int) -> ServerEvent:
+    return ServerEvent(
+        type=EventType.AGENT_LOG,
+        payload={"agent": "study_agent", "message": f"Scheduled study block {n}", "level": "info"},
+        trace_id="trace_bench",
+        user_id="user_1"
+    )
+
+
+def timeline_event(blocks: int) -> ServerEvent:
+    base = datetime(2025, 1, 6, 8, 0)
+    return ServerEvent(
+        type=EventType.TIMELINE_UPDATE,
+        payload={
+            "user_id": "user_1",
+            "blocks": [
+                {
+                    "id": f"evt_{i:05d}",
+                    "title": f"Study block {i}",
+                    "start_iso": (base + timedelta(minutes=30 * i)).isoformat(),
+                    "end_iso": (base + timedelta(minutes=30 * i + 25)).isoformat(),
+                    "source_agent": "study_agent",
+                    "notes": "Review lecture notes and practice problems"
+                }
+                for i in range(blocks)
+            ]
+        },
+        trace_id="trace_bench",
+        user_id="user_1"
+    )
+
+
+class Client:
+    """Counts what one connection would write."""
+    
+    def __init__(self, encoder: FrameEncoder):
+        self.encoder = encoder
+        self.frames = 0
+        self.bytes = 0
+        self.events = 0
+    
+    async def send_events(self, events: list[ServerEvent]) -> None:
+        for frame in self.encoder.encode(events):
+            self.frames += 1
+            self.bytes += len(frame)
+        self.events += len(events)
+    
+    async def send_event(self, event: ServerEvent) -> None:
+        await self.send_events([event])
+
+
+async def run(mode, clients: int, bursts: int, burst_size: int, blocks: int) -> dict:
+    encoding, batch_ms, compress = mode
+    bus = EventBus()
+    fakes = []
+    subscriptions = []
+    for _ in range(clients):
+        client = Client(FrameEncoder(
+            encoding,
+            batched=batch_ms > 0,
+            compress=compress,
+            large_bytes=settings.ws_large_frame_bytes
+        ))
+        fakes.append(client)
+        subscriptions.append(bus.attach(
+            client.send_events if batch_ms else client.send_event,
+            max_queue_size=4096,
+            batch_seconds=batch_ms / 1000
+        ))
+    
+    published = 0
+    started = time.process_time()
+    for burst in range(bursts):
+        for _ in range(burst_size):
+            await bus.publish(agent_log(published))
+            published += 1
+        if burst % 5 == 4:
+            await bus.publish(timeline_event(blocks))
+            published += 1
+        await asyncio.sleep(0.005)
+    while any(client.events < published for client in fakes):
+        await asyncio.sleep(0.005)
+    cpu = time.process_time() - started
+    
+    for subscription in subscriptions:
+        bus.detach(subscription)
+    return {
+        "frames": sum(client.frames for client in fakes) / clients,
+        "bytes": sum(client.bytes for client in fakes) / clients,
+        "cpu_ms": cpu * 1000,
+        "events": published
+    }
+
+
+def main() -> None:
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    bursts = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    burst_size = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    blocks = int(sys.argv[4]) if len(sys.argv) > 4 else 300
+    logging.getLogger("taskweave").setLevel(logging.WARNING)
+    
+    print(f"clients={clients} bursts={bursts} burst_size={burst_size} blocks={blocks}")
+    for mode in MODES:
+        encoding, batch_ms, compress = mode
+        if not event_frames.is_available(encoding):
+            print(f"{encoding:8} skipped (not installed)")
+            continue
+        # Best of three, as the CPU time is noisy
+        result = min(
+            (asyncio.run(run(mode, clients, bursts, burst_size, blocks)) for _ in range(3)),
+            key=lambda item: item["cpu_ms"]
+        )
+        name = f"{encoding} batch={batch_ms}ms{' deflate' if compress else ''}"
+        print(
+            f"{name:28} {result['frames']:7.0f} frames/client "
+            f"{result['bytes'] / 1024:8.1f} KiB/client "
+            f"{result['cpu_ms']:8.0f} ms CPU ({result['events']} events)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,7 @@ import type {
   AgentLogPayload,
   TimelineUpdatePayload,
   ErrorPayload,
+  PlanSubtaskPayload,
 } from './lib/types'
 
 const USER_ID = 'demo_user_1'
@@ -91,8 +92,23 @@ export default function App() {
 
       case 'TIMELINE_UPDATE':
         const timelinePayload = event.payload as TimelineUpdatePayload
-        setTimeline(timelinePayload.blocks)
-        addLog('System', `Timeline updated with ${timelinePayload.blocks.length} events`)
+        if (timelinePayload.incremental) {
+          // Only changed blocks are sent; patch them into the current timeline
+          const removed = new Set(timelinePayload.removed_ids ?? [])
+          const changed = new Map(timelinePayload.blocks.map((block) => [block.id, block]))
+          setTimeline((prev) => {
+            // A streamed run starts from an empty timeline
+            const base = timelinePayload.seq === 1 ? [] : prev
+            const kept = base.filter((block) => !removed.has(block.id) && !changed.has(block.id))
+            return [...kept, ...changed.values()].sort((a, b) =>
+              a.start_iso.localeCompare(b.start_iso) || a.source_agent.localeCompare(b.source_agent)
+            )
+          })
+          addLog('System', `Timeline patched: ${changed.size} changed, ${removed.size} removed`)
+        } else {
+          setTimeline(timelinePayload.blocks)
+          addLog('System', `Timeline updated with ${timelinePayload.blocks.length} events`)
+        }
         break
 
       case 'ERROR':
@@ -101,6 +117,11 @@ export default function App() {
         showToast(errorPayload.message, 'error')
         break
 
+      case 'PLAN_SUBTASK':
+        const subtaskPayload = event.payload as PlanSubtaskPayload
+        addLog(subtaskPayload.subtask.agent, subtaskPayload.subtask.description)
+        break
+
       case 'PLAN_COMPLETE':
         addLog('System', 'Planning complete')
         break
@@ -121,6 +142,9 @@ export default function App() {
 
   // WebSocket connection
   const { isConnected } = useWebSocket({
+    userId: USER_ID,
+    batchMs: 50,
+    compress: true,
     onEvent: handleWebSocketEvent,
     onConnect: () => {
       addLog('System', 'Connected to server')
@@ -164,26 +188,16 @@ export default function App() {
     )
 
     try {
-      // Step 1: Plan
-      addLog('System', 'Parsing intent with Claude...')
-      const planResponse = await apiClient.plan({
+      // Plan and run agents in one call; agents start while Claude plans
+      addLog('System', 'Parsing intent and coordinating agents...')
+      const response = await apiClient.planAndRun({
         user_id: USER_ID,
         query,
-        dry_run: true,
-      })
-
-      addLog('Planner', planResponse.rationale)
-
-      // Step 2: Run agents
-      addLog('System', 'Coordinating agents...')
-      const agentResponse = await apiClient.runAgents({
-        user_id: USER_ID,
-        subtasks: planResponse.subtasks,
-        trace_id: planResponse.trace_id,
       })
 
-      setTimeline(agentResponse.timeline)
-      addLog('System', `Generated ${agentResponse.timeline.length} event blocks`)
+      addLog('Planner', response.rationale)
+      setTimeline(response.timeline)
+      addLog('System', `Generated ${response.timeline.length} event blocks`)
 
       setAgents((prev) =>
         prev.map((agent) => ({ ...agent, status: 'complete' }))
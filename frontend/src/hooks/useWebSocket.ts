@@ -10,14 +10,40 @@ const WS_URL =
   'ws://localhost:8000'
 
 interface UseWebSocketOptions {
+  /** Only receive events for this user */
+  userId?: string
+  /** Receive events published within this many ms in one frame */
+  batchMs?: number
+  /** Ask the server to deflate large frames (e.g. full timelines) */
+  compress?: boolean
   onEvent?: (event: ServerEvent) => void
   onConnect?: () => void
   onDisconnect?: () => void
   autoReconnect?: boolean
 }
 
+/**
+ * Decode a frame to JSON text. Binary frames start with a flag byte:
+ * 1 if the rest is deflated, else 0.
+ */
+async function decodeFrame(data: string | ArrayBuffer): Promise<string> {
+  if (typeof data === 'string') {
+    return data
+  }
+  const bytes = new Uint8Array(data)
+  const body = bytes.subarray(1)
+  if (bytes[0] !== 1) {
+    return new TextDecoder().decode(body)
+  }
+  const stream = new Blob([body]).stream().pipeThrough(new DecompressionStream('deflate'))
+  return new Response(stream).text()
+}
+
 export function useWebSocket(options: UseWebSocketOptions = {}) {
   const {
+    userId,
+    batchMs,
+    compress,
     onEvent,
     onConnect,
     onDisconnect,
@@ -28,10 +54,21 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
   const ws = useRef<WebSocket | null>(null)
   const reconnectTimeout = useRef<number>()
   const shouldReconnect = useRef(autoReconnect)
+  // Seq of the newest event received, sent on reconnect to replay missed ones
+  const lastSeq = useRef<number>()
 
   const connect = useCallback(() => {
     try {
-      const socket = new WebSocket(`${WS_URL}/ws/events`)
+      const params = new URLSearchParams()
+      if (userId) params.set('user_id', userId)
+      if (lastSeq.current !== undefined) params.set('last_seq', String(lastSeq.current))
+      if (batchMs) params.set('batch_ms', String(batchMs))
+      if (compress) params.set('compress', 'deflate')
+      const query = params.toString() ? `?${params}` : ''
+      const socket = new WebSocket(`${WS_URL}/ws/events${query}`)
+      socket.binaryType = 'arraybuffer'
+      // Deflated frames decode asynchronously; chain them to keep order
+      let decoding = Promise.resolve()
 
       socket.onopen = () => {
         console.log('WebSocket connected')
@@ -40,12 +77,21 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
       }
 
       socket.onmessage = (event) => {
-        try {
-          const serverEvent: ServerEvent = JSON.parse(event.data)
-          onEvent?.(serverEvent)
-        } catch (error) {
-          console.error('Failed to parse WebSocket message:', error)
-        }
+        decoding = decoding
+          .then(() => decodeFrame(event.data))
+          .then((text) => {
+            const parsed = JSON.parse(text)
+            const serverEvents: ServerEvent[] = Array.isArray(parsed) ? parsed : [parsed]
+            for (const serverEvent of serverEvents) {
+              if (serverEvent.seq !== undefined) {
+                lastSeq.current = serverEvent.seq
+              }
+              onEvent?.(serverEvent)
+            }
+          })
+          .catch((error) => {
+            console.error('Failed to parse WebSocket message:', error)
+          })
       }
 
       socket.onerror = (error) => {
@@ -70,7 +116,7 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
     } catch (error) {
       console.error('Failed to create WebSocket connection:', error)
     }
-  }, [onEvent, onConnect, onDisconnect])
+  }, [userId, batchMs, compress, onEvent, onConnect, onDisconnect])
 
   const disconnect = useCallback(() => {
     shouldReconnect.current = false
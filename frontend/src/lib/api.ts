@@ -5,6 +5,8 @@
 import type {
   PlanRequest,
   PlanResponse,
+  PlanRunRequest,
+  PlanRunResponse,
   AgentRunRequest,
   AgentRunResponse,
   MemoryGetResponse,
@@ -57,6 +59,13 @@ class APIClient {
     })
   }
 
+  async planAndRun(request: PlanRunRequest): Promise<PlanRunResponse> {
+    return this.request<PlanRunResponse>('/api/plan/run', {
+      method: 'POST',
+      body: JSON.stringify(request),
+    })
+  }
+
   // Agents
   async runAgents(request: AgentRunRequest): Promise<AgentRunResponse> {
     return this.request<AgentRunResponse>('/api/agents/run', {
@@ -17,9 +17,11 @@ export enum EventType {
   AGENT_LOG = 'AGENT_LOG',
   TIMELINE_UPDATE = 'TIMELINE_UPDATE',
   ERROR = 'ERROR',
+  PLAN_SUBTASK = 'PLAN_SUBTASK',
   PLAN_COMPLETE = 'PLAN_COMPLETE',
   AGENTS_SPAWNED = 'AGENTS_SPAWNED',
   AGENTS_COMPLETE = 'AGENTS_COMPLETE',
+  JOB_STATUS = 'JOB_STATUS',
 }
 
 export interface Subtask {
@@ -50,6 +52,7 @@ export interface PlanRequest {
   user_id: string
   query: string
   dry_run: boolean
+  stream?: boolean
 }
 
 export interface PlanResponse {
@@ -58,10 +61,23 @@ export interface PlanResponse {
   trace_id: string
 }
 
+export interface PlanRunRequest {
+  user_id: string
+  query: string
+}
+
+export interface PlanRunResponse {
+  subtasks: Subtask[]
+  rationale: string
+  timeline: EventBlock[]
+  trace_id: string
+}
+
 export interface AgentRunRequest {
   user_id: string
   subtasks: Subtask[]
   trace_id: string
+  stream?: boolean
 }
 
 export interface AgentRunResponse {
@@ -99,6 +115,8 @@ export interface ServerEvent {
   type: EventType
   payload: any
   trace_id?: string
+  user_id?: string
+  seq?: number
 }
 
 export interface AgentLogPayload {
@@ -110,6 +128,22 @@ export interface AgentLogPayload {
 export interface TimelineUpdatePayload {
   user_id: string
   blocks: EventBlock[]
+  removed_ids?: string[]
+  incremental?: boolean
+  seq?: number
+  final?: boolean
+}
+
+export interface PlanSubtaskPayload {
+  subtask: Subtask
+  index: number
+  rationale?: string | null
+}
+
+export interface JobStatusPayload {
+  job_id: string
+  status: 'queued' | 'running' | 'succeeded' | 'failed'
+  error?: string | null
 }
 
 export interface ErrorPayload {